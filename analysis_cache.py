@@ -0,0 +1,146 @@
+"""
+[Analysis Cache]
+Persistent cache for vision analysis results (GeminiAnalyzer.analyze_page).
+
+Regenerating a page re-sends the same images and text, so the multimodal
+call is answered from a local SQLite table instead. The key covers
+everything the answer depends on:
+
+    sha256( prompt version | model | image content hashes | normalized title | normalized body )
+
+Image hashes are over decoded pixels (mode, size, bytes), so re-encoded
+uploads of the same picture still hit. Entries expire after a TTL, and the
+least recently used ones are evicted above a size cap. Callers store only
+successful parses; the analyzer's hardcoded fallback is never cached.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analysis_accessed ON analysis (accessed_at);
+"""
+
+
+def image_digest(image) -> str:
+    """Content hash of a PIL image (pixels, not file bytes)."""
+    h = hashlib.sha256()
+    h.update(f"{image.mode}|{image.size[0]}x{image.size[1]}|".encode("utf-8"))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def analysis_key(images: List[Any], title: str, body: str, version: str) -> str:
+    """Cache key for one analyze_page call (`version` = prompt version + model)."""
+    parts = [version] + [image_digest(img) for img in images or []] + [normalize_text(title), normalize_text(body)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, path: str, ttl_s: float = 7 * 24 * 3600, max_entries: int = 5000):
+        """
+        Args:
+            path: SQLite file (created with its directory)
+            ttl_s: Entry lifetime in seconds (0 = no expiry)
+            max_entries: Size cap; least recently used entries are evicted beyond it
+        """
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared across request threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis, or None on a miss (errors count as misses)."""
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache read failed: {e}")
+            return None
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM analysis WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_s and now - row[1] > self.ttl_s:
+                self._conn.execute("DELETE FROM analysis WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE analysis SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._evict(now)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_s:
+            self.evictions += self._conn.execute("DELETE FROM analysis WHERE created_at < ?", (now - self.ttl_s,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        if count > self.max_entries:
+            self.evictions += self._conn.execute(
+                "DELETE FROM analysis WHERE key IN (SELECT key FROM analysis ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            ).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,139 @@
+"""
+[BGE-M3 ONNX Backend]
+CPU inference for BGE-M3 through ONNX Runtime (optionally int8-quantized).
+
+OnnxBGEM3Encoder is a drop-in for the parts of FlagEmbedding's BGEM3FlagModel
+that the hybrid retriever uses: encode() returns the same 'dense_vecs',
+'lexical_weights' and 'colbert_vecs' outputs, so indexes built with the
+PyTorch model stay valid. The graph is produced by scripts/export_bge_onnx.py:
+
+    model_dir/
+        model.onnx (+ external data)    fp32 export
+        model_int8.onnx                 dynamic int8 quantization
+        tokenizer files                 saved from the source model
+"""
+
+import os
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+FP32_MODEL = "model.onnx"
+INT8_MODEL = "model_int8.onnx"
+
+
+class OnnxBGEM3Encoder:
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: int = 0):
+        """
+        Args:
+            model_dir: Directory written by scripts/export_bge_onnx.py
+            quantized: Load model_int8.onnx instead of the fp32 graph
+            num_threads: intra-op threads (0 = ONNX Runtime default, all cores)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, INT8_MODEL if quantized else FP32_MODEL)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found at {model_path}. Run scripts/export_bge_onnx.py first.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.unused_tokens = {
+            self.tokenizer.cls_token_id,
+            self.tokenizer.eos_token_id,
+            self.tokenizer.pad_token_id,
+            self.tokenizer.unk_token_id,
+        }
+
+    def _process_token_weights(self, token_weights: np.ndarray, input_ids: List[int]) -> Dict[str, float]:
+        """Max weight per token id, special tokens dropped (as in FlagEmbedding)."""
+        result = defaultdict(int)
+        for w, idx in zip(token_weights, input_ids):
+            if idx not in self.unused_tokens and w > 0:
+                idx = str(idx)
+                if w > result[idx]:
+                    result[idx] = w
+        return dict(result)
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 12,
+        max_length: int = 8192,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> Dict[str, Any]:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        # Length-sorted batches keep padding small; outputs are restored to input order
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        dense = [None] * len(sentences)
+        lexical = [None] * len(sentences)
+        colbert = [None] * len(sentences)
+
+        for start in range(0, len(sentences), batch_size):
+            batch_idx = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in batch_idx],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="np",
+            )
+            input_ids = tokens["input_ids"].astype(np.int64)
+            attention_mask = tokens["attention_mask"].astype(np.int64)
+
+            dense_out, sparse_out, colbert_out = self.session.run(
+                None, {"input_ids": input_ids, "attention_mask": attention_mask}
+            )
+
+            for row, i in enumerate(batch_idx):
+                n_tokens = int(attention_mask[row].sum())
+                if return_dense:
+                    dense[i] = dense_out[row]
+                if return_sparse:
+                    lexical[i] = self._process_token_weights(sparse_out[row][:n_tokens], input_ids[row][:n_tokens].tolist())
+                if return_colbert_vecs:
+                    colbert[i] = colbert_out[row][:n_tokens - 1]
+
+        output = {"dense_vecs": None, "lexical_weights": None, "colbert_vecs": None}
+        if return_dense:
+            output["dense_vecs"] = np.stack(dense) if dense else np.empty((0, 0), dtype=np.float32)
+        if return_sparse:
+            output["lexical_weights"] = lexical
+        if return_colbert_vecs:
+            output["colbert_vecs"] = colbert
+        return output
+
+    def compute_lexical_matching_score(self, lexical_weights_1: Dict[str, float], lexical_weights_2: Dict[str, float]) -> float:
+        scores = 0
+        for token, weight in lexical_weights_1.items():
+            if token in lexical_weights_2:
+                scores += weight * lexical_weights_2[token]
+        return scores
+
+
+def load_bge_model(model_name: str, backend: str = "torch", onnx_path: Optional[str] = None, num_threads: int = 0):
+    """
+    BGE-M3 encoder for the configured backend:
+        torch      FlagEmbedding BGEM3FlagModel (fp16 weights)
+        onnx       ONNX Runtime, int8 dynamic quantization
+        onnx-fp32  ONNX Runtime, fp32 graph
+    """
+    if backend == "torch":
+        from FlagEmbedding import BGEM3FlagModel
+        return BGEM3FlagModel(model_name, use_fp16=True)
+    if backend in ("onnx", "onnx-fp32"):
+        return OnnxBGEM3Encoder(onnx_path, quantized=(backend == "onnx"), num_threads=num_threads)
+    raise ValueError(f"Unknown BGE backend: {backend}")
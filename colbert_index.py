@@ -0,0 +1,82 @@
+"""
+[ColBERT Index]
+Memory-mapped BGE-M3 multi-vector (ColBERT) token embeddings for late-interaction reranking.
+
+Storage: every document's token vectors are concatenated into one float16
+(total_tokens x dim) array, with an int64 offsets table (n_docs + 1) giving
+each document's row range. Both are persisted as .npy and memory-mapped, so
+a rerank only reads the pages of the candidates it scores.
+
+Scoring is BGE-M3's colbert_score (MaxSim averaged over query tokens):
+    score(q, d) = mean_i max_j  q_i . d_j
+"""
+
+import time
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+ARRAY_NAMES = ("vecs", "offsets")
+
+
+class ColbertVectors:
+    def __init__(self, vecs: np.ndarray, offsets: np.ndarray):
+        self.vecs = vecs
+        self.offsets = offsets
+        self.n_docs = len(offsets) - 1
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_vectors(cls, doc_vecs: List[np.ndarray], dtype=np.float16) -> "ColbertVectors":
+        """Build from per-document (n_tokens x dim) arrays (row = list position)."""
+        offsets = np.zeros(len(doc_vecs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(v) for v in doc_vecs])
+        dim = doc_vecs[0].shape[1] if doc_vecs else 0
+        vecs = np.concatenate([np.asarray(v, dtype=dtype).reshape(-1, dim) for v in doc_vecs]) if doc_vecs else np.empty((0, dim), dtype=dtype)
+        return cls(vecs, offsets)
+
+    def arrays(self, prefix: str = "colbert") -> Dict[str, np.ndarray]:
+        """Arrays to persist with IndexStore, keyed '<prefix>_<name>'."""
+        return {f"{prefix}_{name}": getattr(self, name) for name in ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]], prefix: str = "colbert") -> Optional["ColbertVectors"]:
+        parts = [arrays.get(f"{prefix}_{name}") for name in ARRAY_NAMES]
+        if any(part is None for part in parts):
+            return None
+        return cls(*parts)
+
+    def nbytes(self) -> int:
+        return int(self.vecs.nbytes + self.offsets.nbytes)
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    def doc_vectors(self, row: int) -> np.ndarray:
+        return self.vecs[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def maxsim(self, q_vecs: np.ndarray, row: int) -> float:
+        doc = np.asarray(self.doc_vectors(row), dtype=np.float32)
+        if len(doc) == 0 or len(q_vecs) == 0:
+            return 0.0
+        return float((q_vecs @ doc.T).max(axis=1).sum() / len(q_vecs))
+
+    def rerank(self, q_vecs: np.ndarray, rows: List[int], budget_ms: Optional[float] = None) -> Tuple[List[int], Dict[int, float]]:
+        """
+        Reorder candidate `rows` (given best first) by MaxSim.
+        Candidates are scored in their incoming order until `budget_ms` is
+        spent; the scored prefix is reordered and the rest keep their
+        original order after it. Returns (rows, {row: colbert score}).
+        """
+        q_vecs = np.asarray(q_vecs, dtype=np.float32)
+        start = time.perf_counter()
+        scores: Dict[int, float] = {}
+        for row in rows:
+            if budget_ms is not None and scores and (time.perf_counter() - start) * 1000 > budget_ms:
+                break
+            scores[row] = self.maxsim(q_vecs, row)
+
+        scored = sorted(scores, key=lambda r: -scores[r])
+        return scored + [r for r in rows if r not in scores], scores
@@ -25,7 +25,7 @@ docker run -d \
   -p 8000:8000 \
   --env-file ../.env \
   -v $(pwd)/../chroma_db_voyage:/app/chroma_db_voyage \
-  -v $(pwd)/../index_cache_voyage.pkl:/app/index_cache_voyage.pkl \
+  -v $(pwd)/../index_voyage:/app/index_voyage \
   -v $(pwd)/../datas:/app/datas \
   --restart unless-stopped \
   aura-server:latest
@@ -0,0 +1,108 @@
+"""
+[Filter Index]
+Precomputed bitmap index for the retrievers' metadata equality filters.
+
+For every filterable field (type, image_count, mood, category, layout_ratio)
+and every distinct value, one bitset marks the documents having that value.
+Bitsets are packed 8 documents per byte (np.packbits), so a filter such as
+    {"type": "Article", "image_count": 2}
+resolves to a candidate mask with one byte-wise AND per condition and a
+single unpack, and feeds straight into the dense / lexical scorers.
+
+Persisted in IndexStore as, per field:
+    bitmap_<field>_values   distinct values (sorted)
+    bitmap_<field>_bits     (n_values x ceil(n_docs / 8)) uint8
+"""
+
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+
+class BitmapFilterIndex:
+    def __init__(self, n_docs: int, bitmaps: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        """
+        Args:
+            n_docs: Number of documents (mask length)
+            bitmaps: field -> (distinct values, packed bitsets, one row per value)
+        """
+        self.n_docs = n_docs
+        self.bitmaps = bitmaps
+        self._n_bytes = (n_docs + 7) // 8
+        self._value_rows: Dict[str, Dict[Any, int]] = {
+            field: {value: i for i, value in enumerate(values.tolist())}
+            for field, (values, _) in bitmaps.items()
+        }
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "BitmapFilterIndex":
+        """Build from the columnar metadata arrays (see index_store.metadata_columns)."""
+        n_docs = len(next(iter(columns.values()))) if columns else 0
+        bitmaps = {}
+        for field, column in columns.items():
+            values, inverse = np.unique(np.asarray(column), return_inverse=True)
+            bits = np.zeros((len(values), n_docs), dtype=bool)
+            bits[inverse.reshape(-1), np.arange(n_docs)] = True
+            bitmaps[field] = (values, np.packbits(bits, axis=1))
+        return cls(n_docs, bitmaps)
+
+    def arrays(self, prefix: str = "bitmap") -> Dict[str, np.ndarray]:
+        """Arrays to persist with IndexStore."""
+        out = {}
+        for field, (values, bits) in self.bitmaps.items():
+            out[f"{prefix}_{field}_values"] = values
+            out[f"{prefix}_{field}_bits"] = bits
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]], fields, n_docs: int, prefix: str = "bitmap") -> Optional["BitmapFilterIndex"]:
+        bitmaps = {}
+        for field in fields:
+            values = arrays.get(f"{prefix}_{field}_values")
+            bits = arrays.get(f"{prefix}_{field}_bits")
+            if values is None or bits is None:
+                return None
+            # Small: keep resident rather than memory-mapped
+            bitmaps[field] = (np.array(values), np.array(bits))
+        return cls(n_docs, bitmaps)
+
+    def nbytes(self) -> int:
+        return int(sum(values.nbytes + bits.nbytes for values, bits in self.bitmaps.values()))
+
+    # ------------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------------
+    def _packed(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """AND of the packed bitsets; None when no document can match."""
+        packed = None
+        for field, value in filters.items():
+            if field not in self.bitmaps:
+                return None
+            row = self._value_rows[field].get(value)
+            if row is None:
+                return None
+            bits = self.bitmaps[field][1][row]
+            packed = bits.copy() if packed is None else np.bitwise_and(packed, bits, out=packed)
+        if packed is None:
+            packed = np.full(self._n_bytes, 0xFF, dtype=np.uint8)
+        return packed
+
+    def mask(self, filters: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        Boolean candidate mask for equality filters (AND over fields).
+        An unknown field or value matches nothing.
+        """
+        packed = self._packed(filters or {})
+        if packed is None:
+            return np.zeros(self.n_docs, dtype=bool)
+        return np.unpackbits(packed, count=self.n_docs).astype(bool)
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Number of documents matching `filters`."""
+        if not filters:
+            return self.n_docs
+        packed = self._packed(filters)
+        return 0 if packed is None else int(np.unpackbits(packed, count=self.n_docs).sum())
@@ -0,0 +1,168 @@
+"""
+[Hot Reload]
+Zero-downtime index swaps.
+
+A LiveSnapshot holds the serving object (a retriever with its index) behind
+a reference that is replaced atomically. Requests lease the current
+snapshot for the duration of their searches; a swap publishes the new one
+immediately and releases the old one only once its last lease is returned,
+so an in-flight search never sees a half-built or closed index.
+
+BackgroundReloader builds the replacement in a worker thread (one build at
+a time) while the old snapshot keeps serving.
+
+    live = LiveSnapshot(retriever, release=lambda r: r.close())
+    with live.acquire() as retriever:
+        retriever.search(...)
+    reloader = BackgroundReloader(build_fn, live)
+    reloader.trigger()   # -> False if a build is already running
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Generation:
+    __slots__ = ("value", "number", "leases", "retired")
+
+    def __init__(self, value: Any, number: int):
+        self.value = value
+        self.number = number
+        self.leases = 0
+        self.retired = False
+
+
+class LiveSnapshot:
+    def __init__(self, value: Any, release: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            value: Initial snapshot
+            release: Called once on a replaced snapshot after its last lease ends
+        """
+        self._release = release
+        self._lock = threading.Lock()
+        self._current = _Generation(value, 1)
+        self._retired: Dict[int, _Generation] = {}
+        self.swaps = 0
+
+    @property
+    def current(self) -> Any:
+        """The serving snapshot, without a lease (for short, read-only peeks)."""
+        return self._current.value
+
+    @property
+    def generation(self) -> int:
+        return self._current.number
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """Lease the current snapshot; a concurrent swap won't release it until the lease ends."""
+        with self._lock:
+            gen = self._current
+            gen.leases += 1
+        try:
+            yield gen.value
+        finally:
+            with self._lock:
+                gen.leases -= 1
+                done = gen.retired and gen.leases == 0
+                if done:
+                    self._retired.pop(gen.number, None)
+            if done:
+                self._release_generation(gen)
+
+    def swap(self, value: Any) -> int:
+        """Publish a new snapshot. Returns its generation number."""
+        with self._lock:
+            old = self._current
+            self._current = _Generation(value, old.number + 1)
+            old.retired = True
+            self.swaps += 1
+            if old.leases:
+                self._retired[old.number] = old
+                logger.info(f"♻️ Snapshot {old.number} retired with {old.leases} search(es) in flight")
+            number = self._current.number
+        if not old.leases:
+            self._release_generation(old)
+        return number
+
+    def _release_generation(self, gen: _Generation) -> None:
+        if self._release is None or gen.value is None:
+            return
+        try:
+            self._release(gen.value)
+            logger.info(f"🧹 Released snapshot {gen.number}")
+        except Exception as e:
+            logger.error(f"Failed to release snapshot {gen.number}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "generation": self._current.number,
+                "leases": self._current.leases,
+                "draining": {number: gen.leases for number, gen in self._retired.items()},
+                "swaps": self.swaps,
+            }
+
+
+class BackgroundReloader:
+    def __init__(self, build: Callable[..., Any], live: LiveSnapshot, name: str = "index-reload"):
+        """
+        Args:
+            build: Returns a complete new snapshot (runs in a worker thread)
+            live: Where the result is published
+        """
+        self.build = build
+        self.live = live
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {
+            "state": "idle",  # idle | building | failed
+            "reloads": 0,
+            "started_at": None,
+            "finished_at": None,
+            "last_duration_s": None,
+            "last_error": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def trigger(self, **build_kwargs) -> bool:
+        """Start a rebuild. Returns False when one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self._status.update(state="building", started_at=time.time(), finished_at=None, last_error=None)
+            self._thread = threading.Thread(target=self._run, kwargs=build_kwargs, name=self.name, daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self, **build_kwargs) -> None:
+        start = time.perf_counter()
+        print(f"🔄 [{self.name}] Building new snapshot in the background...")
+        try:
+            value = self.build(**build_kwargs)
+            generation = self.live.swap(value)
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Rebuild failed, keeping the current snapshot: {e}")
+            with self._lock:
+                self._status.update(state="failed", finished_at=time.time(), last_error=str(e),
+                                    last_duration_s=round(time.perf_counter() - start, 2))
+            return
+
+        with self._lock:
+            self._status.update(state="idle", finished_at=time.time(), reloads=self._status["reloads"] + 1,
+                                last_duration_s=round(time.perf_counter() - start, 2))
+        print(f"✅ [{self.name}] Swapped in snapshot {generation} ({self._status['last_duration_s']}s)")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._status, "snapshot": self.live.stats()}
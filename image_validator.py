@@ -10,6 +10,7 @@
 
 from PIL import Image
 import io
+import numpy as np
 import base64
 from typing import Tuple, Optional, Dict, Any, List, Union
 
@@ -411,6 +412,230 @@ class ImageValidator:
         
         return css
 
+    def prepare_vision_input(
+        self,
+        image: Image.Image,
+        max_edge: int = 768,
+        quality: int = 85
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        비전 모델 분석용 경량 JPEG 썸네일 생성
+        (모델이 어차피 다운샘플링하므로 원본 해상도를 업로드할 필요가 없음)
+
+        Args:
+            image: 원본 PIL Image
+            max_edge: 긴 변의 최대 픽셀 수 (0이면 리사이즈하지 않음)
+            quality: JPEG 품질 (1-100)
+
+        Returns:
+            (JPEG 바이트, 정보 딕셔너리: 원본/결과 크기, 바이트 수)
+        """
+        orig_size = image.size
+        thumb = image
+        if max_edge and max(orig_size) > max_edge:
+            thumb = image.copy()
+            thumb.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        # JPEG는 알파 채널을 지원하지 않으므로 흰 배경에 합성
+        if thumb.mode in ("RGBA", "LA", "P"):
+            rgba = thumb.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            thumb = background
+        elif thumb.mode != "RGB":
+            thumb = thumb.convert("RGB")
+
+        buffer = io.BytesIO()
+        thumb.save(buffer, format="JPEG", quality=quality, optimize=True)
+        data = buffer.getvalue()
+
+        return data, {
+            "original_size": orig_size,
+            "size": thumb.size,
+            "bytes": len(data)
+        }
+
+    def analysis_pixels(self, image: Image.Image, thumb_edge: int = 64) -> np.ndarray:
+        """
+        분석용 소형 썸네일의 RGB 픽셀 배열 (H, W, 3), 0-1 범위
+        (큰 이미지는 목표 크기의 4배로 NEAREST 샘플링한 뒤 BOX 평균:
+        전체 픽셀을 훑는 thumbnail()보다 훨씬 빠르고 통계는 거의 같음)
+        """
+        width, height = image.size
+        scale = min(1.0, thumb_edge / max(width, height))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if scale < 0.25:
+            image = image.resize((size[0] * 4, size[1] * 4), Image.Resampling.NEAREST)
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA").resize(size, Image.Resampling.BOX)
+            thumb = Image.new("RGB", size, (255, 255, 255))
+            thumb.paste(rgba, mask=rgba.split()[-1])
+        else:
+            thumb = image.convert("RGB").resize(size, Image.Resampling.BOX)
+        return np.asarray(thumb, dtype=np.float32) / 255.0
+
+    def image_stats(
+        self,
+        image: Image.Image,
+        thumb_edge: int = 64,
+        pixels: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """
+        비전 모델 없이 계산하는 이미지 통계 (로컬 분석기용)
+
+        Args:
+            image: 원본 PIL Image
+            thumb_edge: 통계를 계산할 썸네일의 긴 변 픽셀 수
+            pixels: 이미 계산한 analysis_pixels 결과 (재사용 시)
+
+        Returns:
+            밝기/채도/대비(0-1), 색온도(-1 차가움 ~ 1 따뜻함),
+            컬러풀니스, 방향, 원본 크기
+        """
+        if pixels is None:
+            pixels = self.analysis_pixels(image, thumb_edge)
+        rgb = pixels.reshape(-1, 3)
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        luma = 0.299 * r + 0.587 * g + 0.114 * b
+        c_max, c_min = rgb.max(axis=1), rgb.min(axis=1)
+        saturation = np.where(c_max > 0, (c_max - c_min) / np.maximum(c_max, 1e-6), 0.0)
+        # Hasler & Süsstrunk 컬러풀니스 지표
+        rg, yb = r - g, 0.5 * (r + g) - b
+        colorfulness = np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())
+
+        width, height = image.size
+        return {
+            "brightness": round(float(luma.mean()), 4),
+            "saturation": round(float(saturation.mean()), 4),
+            "contrast": round(float(luma.std()), 4),
+            "warmth": round(float((r - b).mean()), 4),
+            "colorfulness": round(float(colorfulness), 4),
+            "orientation": self._get_orientation(width, height),
+            "size": (width, height),
+        }
+
+    def dominant_colors(
+        self,
+        image: Image.Image,
+        k: int = 5,
+        thumb_edge: int = 64,
+        iterations: int = 10,
+        seed: int = 0,
+        pixels: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        썸네일 픽셀에 대한 k-means로 대표 색상 추출
+
+        Args:
+            image: 원본 PIL Image
+            k: 클러스터 수 (색상이 적은 이미지는 더 적게 반환)
+            thumb_edge: 클러스터링할 썸네일의 긴 변 픽셀 수
+            iterations: Lloyd 반복 횟수
+            seed: 초기 중심 선택용 시드 (같은 이미지는 같은 결과)
+            pixels: 이미 계산한 analysis_pixels 결과 (재사용 시)
+
+        Returns:
+            [{"rgb": (r, g, b), "hex": "#rrggbb", "share": 비율}, ...] 비율 내림차순
+        """
+        if pixels is None:
+            pixels = self.analysis_pixels(image, thumb_edge)
+        pixels = pixels.reshape(-1, 3)
+        rng = np.random.default_rng(seed)
+        sq_norms = (pixels ** 2).sum(axis=1)
+
+        def sq_distances(centers: np.ndarray) -> np.ndarray:
+            return np.maximum(sq_norms[:, None] - 2.0 * pixels @ centers.T + (centers ** 2).sum(axis=1)[None], 0.0)
+
+        # k-means++ 초기화 (색상 수가 k보다 적으면 그만큼만)
+        centers = pixels[rng.integers(len(pixels))][None]
+        while len(centers) < k:
+            d2 = sq_distances(centers).min(axis=1).astype(np.float64)
+            if d2.sum() <= 1e-9:
+                break
+            centers = np.vstack([centers, pixels[rng.choice(len(pixels), p=d2 / d2.sum())]])
+        k = len(centers)
+
+        for _ in range(iterations):
+            labels = sq_distances(centers).argmin(axis=1)
+            sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=k) for c in range(3)], axis=1)
+            counts = np.bincount(labels, minlength=k)[:, None]
+            moved = np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+            if np.allclose(moved, centers, atol=1e-4):
+                break
+            centers = moved
+        labels = sq_distances(centers).argmin(axis=1)
+
+        counts = np.bincount(labels, minlength=k)
+        colors = []
+        for j in np.argsort(-counts):
+            if counts[j] == 0:
+                continue
+            rgb = tuple(int(round(c * 255)) for c in centers[j])
+            colors.append({
+                "rgb": rgb,
+                "hex": "#{:02x}{:02x}{:02x}".format(*rgb),
+                "share": round(float(counts[j] / len(pixels)), 4),
+            })
+        return colors
+
+    def extract_palette(
+        self,
+        images: List[Image.Image],
+        n_colors: int = 5,
+        thumb_edge: int = 64,
+        min_accent_contrast: float = 3.0
+    ) -> Dict[str, Any]:
+        """
+        여러 이미지에서 페이지 팔레트와 강조색을 결정적으로 추출
+        (모든 썸네일 픽셀을 합쳐 한 번의 k-means, 같은 이미지는 항상 같은 결과)
+
+        Args:
+            images: PIL Image 리스트
+            n_colors: 팔레트 색상 수
+            thumb_edge: 이미지별 썸네일 긴 변 픽셀 수
+            min_accent_contrast: 흰 배경 대비 강조색의 최소 명암비 (WCAG 기준, 3.0 = 큰 글씨)
+
+        Returns:
+            {"palette": ["#rrggbb", ...], "shares": [...], "accent": "#rrggbb" 또는 None}
+        """
+        if not images:
+            return {"palette": [], "shares": [], "accent": None}
+
+        pixels = np.concatenate([self.analysis_pixels(img, thumb_edge).reshape(-1, 3) for img in images])
+        colors = self.dominant_colors(None, k=n_colors, pixels=pixels)
+
+        # 강조색: 충분한 비중을 가진 색 중 채도가 가장 높은 색 (무채색뿐이면 가장 어두운 색)
+        def saturation(rgb):
+            return (max(rgb) - min(rgb)) / max(max(rgb), 1)
+
+        candidates = [c for c in colors if c["share"] >= 0.03] or colors
+        vivid = [c for c in candidates if saturation(c["rgb"]) >= 0.15 and 40 <= max(c["rgb"]) <= 245]
+        if vivid:
+            accent = max(vivid, key=lambda c: saturation(c["rgb"]) * np.sqrt(c["share"]))["rgb"]
+        else:
+            accent = min(candidates, key=lambda c: sum(c["rgb"]))["rgb"]
+
+        return {
+            "palette": [c["hex"] for c in colors],
+            "shares": [c["share"] for c in colors],
+            "accent": "#{:02x}{:02x}{:02x}".format(*self._darken_for_contrast(accent, min_accent_contrast)),
+        }
+
+    @staticmethod
+    def _darken_for_contrast(rgb: Tuple[int, int, int], min_ratio: float) -> Tuple[int, int, int]:
+        """흰 배경에서 읽히도록 명암비가 min_ratio 이상이 될 때까지 색을 어둡게 조정"""
+        def luminance(color):
+            channels = np.asarray(color, dtype=np.float64) / 255.0
+            linear = np.where(channels <= 0.03928, channels / 12.92, ((channels + 0.055) / 1.055) ** 2.4)
+            return float(linear @ np.array([0.2126, 0.7152, 0.0722]))
+
+        color = np.asarray(rgb, dtype=np.float64)
+        for _ in range(20):
+            if 1.05 / (luminance(color) + 0.05) >= min_ratio:
+                break
+            color *= 0.9
+        return tuple(int(round(c)) for c in color)
+
 
 # 전역 인스턴스
 image_validator = ImageValidator()
@@ -0,0 +1,299 @@
+"""
+[Index Store]
+Versioned, memory-mappable on-disk index artifact.
+Replaces the monolithic pickle caches (index_cache_voyage.pkl / index_cache.pkl).
+
+Directory layout (one directory per index):
+    CURRENT               name of the active build directory (swapped atomically)
+    build-<stamp>/        one complete build:
+      manifest.json         format version, cache version, doc count, stored arrays/blobs
+      doc_ids.npy           id column (unicode)
+      meta_<field>.npy      columnar metadata (type, image_count, mood, category, layout_ratio)
+      <name>.npy            numeric arrays (e.g. embeddings), opened with mmap_mode='r'
+      <blob>.bin            UTF-8 JSON records concatenated back to back
+      <blob>.idx.npy        int64 offsets (n + 1) into <blob>.bin
+
+Nothing is unpickled: every .npy is loaded with allow_pickle=False and blob
+records are plain JSON, so opening an index is a handful of mmap calls and the
+layout bodies are only decoded when get_layout() asks for them.
+"""
+
+import os
+import json
+import mmap
+import time
+import shutil
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+
+# Metadata fields used by the retrievers' equality filters
+METADATA_FIELDS = ("type", "image_count", "mood", "category", "layout_ratio")
+
+
+def _to_jsonable(obj: Any) -> Any:
+    """Convert numpy scalars/arrays nested in a record into JSON-safe values."""
+    if isinstance(obj, dict):
+        return {str(k): _to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def metadata_columns(items: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Build columnar metadata arrays from layout records."""
+    columns = {}
+    for field in METADATA_FIELDS:
+        if field == "image_count":
+            columns[field] = np.asarray([int(item.get(field, 0)) for item in items], dtype=np.int32)
+        else:
+            columns[field] = np.asarray([str(item.get(field, '') or '') for item in items], dtype=np.str_)
+    return columns
+
+
+class IndexStore:
+    """
+    Read side of the on-disk index.
+    Use IndexStore.write() to build one and IndexStore.open() to map it.
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest.get("version")
+
+        ids = np.load(os.path.join(path, "doc_ids.npy"), allow_pickle=False)
+        self.doc_ids: List[str] = ids.tolist()
+        self._row_of: Dict[str, int] = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._blobs: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+    @staticmethod
+    def write(
+        path: str,
+        version: str,
+        doc_ids: List[str],
+        columns: Optional[Dict[str, np.ndarray]] = None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+        blobs: Optional[Dict[str, List[Any]]] = None,
+    ) -> None:
+        """
+        Write a complete index build and make it current atomically.
+        The build goes into a fresh `build-*` directory and only becomes
+        visible once the CURRENT pointer is replaced, so a reader never sees
+        a half-written index (and `path` itself can be a volume mount).
+        """
+        columns = columns or {}
+        arrays = arrays or {}
+        blobs = blobs or {}
+
+        os.makedirs(path, exist_ok=True)
+        build_name = f"build-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.monotonic_ns() % 10**6}"
+        tmp_path = os.path.join(path, build_name)
+        os.makedirs(tmp_path)
+
+        np.save(os.path.join(tmp_path, "doc_ids.npy"), np.asarray(doc_ids, dtype=np.str_), allow_pickle=False)
+
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, f"meta_{name}.npy"), np.asarray(values), allow_pickle=False)
+
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(values), allow_pickle=False)
+
+        for name, records in blobs.items():
+            offsets = np.zeros(len(records) + 1, dtype=np.int64)
+            with open(os.path.join(tmp_path, f"{name}.bin"), "wb") as f:
+                for i, record in enumerate(records):
+                    data = json.dumps(_to_jsonable(record), ensure_ascii=False).encode("utf-8")
+                    f.write(data)
+                    offsets[i + 1] = offsets[i] + len(data)
+            np.save(os.path.join(tmp_path, f"{name}.idx.npy"), offsets, allow_pickle=False)
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "count": len(doc_ids),
+            "columns": sorted(columns),
+            "arrays": sorted(arrays),
+            "blobs": sorted(blobs),
+        }
+        # Manifest is written last: a directory without one is never opened
+        with open(os.path.join(tmp_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        pointer_tmp = os.path.join(path, f"{CURRENT_NAME}.tmp-{os.getpid()}")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(build_name)
+        os.replace(pointer_tmp, os.path.join(path, CURRENT_NAME))
+
+        # Drop superseded builds. Readers that still map them keep working on
+        # POSIX; on failure the directory is simply left for the next write.
+        for name in os.listdir(path):
+            if name.startswith("build-") and name != build_name:
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Open
+    # ------------------------------------------------------------------
+    @classmethod
+    def open(cls, path: str, expected_version: Optional[str] = None) -> Optional["IndexStore"]:
+        """
+        Map an index directory. Returns None when it is missing, was written
+        by another format version, or does not match `expected_version`.
+        """
+        pointer_path = os.path.join(path, CURRENT_NAME)
+        if not os.path.exists(pointer_path):
+            return None
+        with open(pointer_path, "r", encoding="utf-8") as f:
+            build_path = os.path.join(path, f.read().strip())
+
+        manifest_path = os.path.join(build_path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != FORMAT_VERSION:
+            logger.info(f"Index format mismatch (Found: {manifest.get('format_version')}, Expected: {FORMAT_VERSION}).")
+            return None
+        if expected_version is not None and manifest.get("version") != expected_version:
+            logger.info(f"Index version mismatch (Found: {manifest.get('version')}, Expected: {expected_version}).")
+            return None
+
+        return cls(build_path, manifest)
+
+    def mtime(self) -> float:
+        """Build time of the index (manifest mtime)."""
+        return os.path.getmtime(os.path.join(self.path, MANIFEST_NAME))
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._row_of.get(doc_id)
+
+    # ------------------------------------------------------------------
+    # Arrays / columns (memory-mapped)
+    # ------------------------------------------------------------------
+    def has_array(self, name: str) -> bool:
+        return name in self.manifest.get("arrays", [])
+
+    def array(self, name: str) -> Optional[np.ndarray]:
+        """Memory-mapped numeric array, or None if it was not stored."""
+        if not self.has_array(name):
+            return None
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+        return self._arrays[name]
+
+    def column(self, field: str) -> Optional[np.ndarray]:
+        """Columnar metadata array for `field`, or None if it was not stored."""
+        if field not in self.manifest.get("columns", []):
+            return None
+        if field not in self._columns:
+            self._columns[field] = np.load(os.path.join(self.path, f"meta_{field}.npy"), mmap_mode="r", allow_pickle=False)
+        return self._columns[field]
+
+    # ------------------------------------------------------------------
+    # Blobs (offset-indexed JSON records)
+    # ------------------------------------------------------------------
+    def _blob(self, name: str):
+        if name not in self._blobs:
+            offsets = np.load(os.path.join(self.path, f"{name}.idx.npy"), mmap_mode="r", allow_pickle=False)
+            blob_path = os.path.join(self.path, f"{name}.bin")
+            if os.path.getsize(blob_path) == 0:
+                data = b""
+            else:
+                with open(blob_path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._blobs[name] = (offsets, data)
+        return self._blobs[name]
+
+    def blob_record(self, name: str, row: int) -> Any:
+        """Decode a single JSON record; only its pages are touched."""
+        offsets, data = self._blob(name)
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        return json.loads(bytes(data[start:end]).decode("utf-8"))
+
+    def get_layout(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._row_of.get(doc_id)
+        if row is None:
+            return None
+        return self.blob_record("layouts", row)
+
+    def pin(self) -> None:
+        """
+        Map every stored array, column and blob now. The next write() deletes
+        this build's directory; a pinned store keeps serving from its open
+        mappings until close() (used by hot reload, see hot_reload.py).
+        """
+        for name in self.manifest.get("arrays", []):
+            self.array(name)
+        for field in self.manifest.get("columns", []):
+            self.column(field)
+        for name in self.manifest.get("blobs", []):
+            self._blob(name)
+
+    def close(self) -> None:
+        """Release mmaps. Arrays handed out earlier must no longer be used."""
+        for _, data in self._blobs.values():
+            if isinstance(data, mmap.mmap):
+                data.close()
+        self._blobs.clear()
+        self._arrays.clear()
+        self._columns.clear()
+
+
+class LazyLayoutMap(Mapping):
+    """
+    Read-only dict facade over IndexStore layouts.
+    Keeps `doc_map.get(doc_id)` call sites working while layouts are decoded
+    on demand, with a small LRU of recently used records.
+    """
+
+    def __init__(self, store: IndexStore, cache_size: int = 256):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def __getitem__(self, doc_id: str) -> Dict[str, Any]:
+        if doc_id in self._cache:
+            self._cache.move_to_end(doc_id)
+            return self._cache[doc_id]
+
+        layout = self.store.get_layout(doc_id)
+        if layout is None:
+            raise KeyError(doc_id)
+
+        self._cache[doc_id] = layout
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return layout
+
+    def __contains__(self, doc_id: object) -> bool:
+        return self.store.row_of(doc_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.doc_ids)
+
+    def __len__(self) -> int:
+        return len(self.store)
@@ -0,0 +1,183 @@
+"""
+[Layout Geometry]
+Occupancy-grid index over layout element bounding boxes.
+
+Every layout's elements are rasterized into a fixed low-resolution grid per
+channel, storing the covered fraction of each cell as uint8 (0-255):
+
+    hero    largest figure only
+    figure  all figures
+    title   title boxes
+    text    plain text boxes            ('abandon' elements are ignored)
+
+A layout becomes one row of CHANNELS x GRID_ROWS x GRID_COLS bytes (384 by
+default), so the whole corpus is a compact (n_docs x 384) uint8 matrix and
+geometric search is a single vectorized distance computation, no embedding
+call involved. Queries are sketched from named regions ("top-right",
+"full", ...) or taken from an existing layout.
+"""
+
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Dataset coordinate space (portrait page, 2:3)
+PAGE_WIDTH = 1000
+PAGE_HEIGHT = 1500
+GRID_COLS = 8
+GRID_ROWS = 12
+
+CHANNELS = ("hero", "figure", "title", "text")
+ELEMENT_CHANNELS = {"figure": "figure", "title": "title", "plain text": "text"}
+CELLS = GRID_ROWS * GRID_COLS
+BLOCK_ROWS = 8192  # Grid rows widened to float32 at a time while scoring
+
+# Anchor (x, y) of named page regions, in [0, 1]
+REGIONS = {
+    "top-left": (0.0, 0.0), "top": (0.5, 0.0), "top-right": (1.0, 0.0),
+    "left": (0.0, 0.5), "center": (0.5, 0.5), "right": (1.0, 0.5),
+    "bottom-left": (0.0, 1.0), "bottom": (0.5, 1.0), "bottom-right": (1.0, 1.0),
+    "full": (0.5, 0.5),
+}
+
+
+def _coverage(start: float, end: float, n: int) -> np.ndarray:
+    """Covered fraction of each of n equal cells on [0, 1] by the interval [start, end]."""
+    edges = np.linspace(0.0, 1.0, n + 1)
+    overlap = np.clip(np.minimum(edges[1:], end) - np.maximum(edges[:-1], start), 0.0, None)
+    return overlap * n
+
+
+def rasterize_boxes(boxes: Sequence[Tuple[str, float, float, float, float]]) -> np.ndarray:
+    """
+    Rasterize normalized boxes (channel, x1, y1, x2, y2 in [0, 1]) into a
+    (channels, rows, cols) float32 grid of covered fractions (clipped at 1).
+    """
+    grid = np.zeros((len(CHANNELS), GRID_ROWS, GRID_COLS), dtype=np.float32)
+    for channel, x1, y1, x2, y2 in boxes:
+        c = CHANNELS.index(channel)
+        grid[c] += np.outer(_coverage(y1, y2, GRID_ROWS), _coverage(x1, x2, GRID_COLS))
+    return np.clip(grid, 0.0, 1.0)
+
+
+def element_boxes(elements: List[Dict[str, Any]]) -> List[Tuple[str, float, float, float, float]]:
+    """Normalized channel boxes for dataset elements (largest figure also becomes 'hero')."""
+    boxes, largest, largest_area = [], None, 0.0
+    for elem in elements or []:
+        channel = ELEMENT_CHANNELS.get(elem.get('type'))
+        coords = elem.get('coordinates')
+        if channel is None or not coords:
+            continue
+        box = (
+            min(max(coords['x1'] / PAGE_WIDTH, 0.0), 1.0),
+            min(max(coords['y1'] / PAGE_HEIGHT, 0.0), 1.0),
+            min(max(coords['x2'] / PAGE_WIDTH, 0.0), 1.0),
+            min(max(coords['y2'] / PAGE_HEIGHT, 0.0), 1.0),
+        )
+        boxes.append((channel, *box))
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        if channel == "figure" and area > largest_area:
+            largest, largest_area = box, area
+    if largest is not None:
+        boxes.append(("hero", *largest))
+    return boxes
+
+
+def layout_grid(layout: Dict[str, Any]) -> np.ndarray:
+    """Occupancy grid of one dataset record, as a flat uint8 row."""
+    grid = rasterize_boxes(element_boxes(layout.get('elements', [])))
+    return np.rint(grid * 255).astype(np.uint8).reshape(-1)
+
+
+def region_box(position: str, width: float, height: float) -> Tuple[float, float, float, float]:
+    """Normalized box of the given size placed at a named region of the page."""
+    if position not in REGIONS:
+        raise ValueError(f"Unknown region '{position}'. Use one of: {', '.join(REGIONS)}")
+    if position == "full":
+        return (0.0, 0.0, 1.0, 1.0)
+    ax, ay = REGIONS[position]
+    x1, y1 = ax * (1.0 - width), ay * (1.0 - height)
+    return (x1, y1, x1 + width, y1 + height)
+
+
+def sketch_grid(hero: Optional[str] = None, hero_size: float = 0.5, title: Optional[str] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Query grid from named regions, e.g. hero="top-right", title="bottom".
+    Returns the flat grid and the channels it constrains (only those are compared).
+    """
+    boxes, channels = [], []
+    if hero:
+        boxes.append(("hero", *region_box(hero, hero_size, hero_size)))
+        channels.append("hero")
+    if title:
+        boxes.append(("title", *region_box(title, 0.8, 0.1)))
+        channels.append("title")
+    return (rasterize_boxes(boxes) * 255).reshape(-1), channels
+
+
+class LayoutGeometryIndex:
+    """(n_docs x CHANNELS*CELLS) uint8 occupancy matrix with channel-selective L2 search."""
+
+    def __init__(self, grids: np.ndarray):
+        self.grids = grids  # uint8, memory-mapped when loaded from the store
+        # Per-channel squared norms for the ||q||^2 + ||x||^2 - 2 q.x expansion
+        self._sq_norms = np.zeros((len(grids), len(CHANNELS)), dtype=np.float32)
+        for start, block in self._blocks():
+            self._sq_norms[start:start + len(block)] = (block * block).sum(axis=2)
+
+    def _blocks(self):
+        """(first row, float32 (rows x CHANNELS x CELLS) copy) per BLOCK_ROWS rows of the uint8 grids."""
+        for start in range(0, len(self.grids), BLOCK_ROWS):
+            block = np.asarray(self.grids[start:start + BLOCK_ROWS], dtype=np.float32)
+            yield start, block.reshape(len(block), len(CHANNELS), CELLS)
+
+    @classmethod
+    def build(cls, layouts: List[Dict[str, Any]]) -> "LayoutGeometryIndex":
+        grids = np.stack([layout_grid(layout) for layout in layouts]) if layouts else np.zeros((0, len(CHANNELS) * CELLS), dtype=np.uint8)
+        return cls(grids)
+
+    def arrays(self, prefix: str = "geometry") -> Dict[str, np.ndarray]:
+        return {f"{prefix}_grids": self.grids}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]], prefix: str = "geometry") -> Optional["LayoutGeometryIndex"]:
+        grids = arrays.get(f"{prefix}_grids")
+        if grids is None or grids.shape[1] != len(CHANNELS) * CELLS:
+            return None
+        return cls(grids)
+
+    def nbytes(self) -> int:
+        return int(self.grids.nbytes)
+
+    def search(
+        self,
+        query: np.ndarray,
+        channels: Sequence[str] = CHANNELS,
+        mask: Optional[np.ndarray] = None,
+        top_k: int = 5,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows of the top_k layouts closest to `query` (flat grid in 0-255) over
+        the selected channels, best first, with similarity in [0, 1]
+        (1 - RMS cell difference).
+        """
+        selected = [CHANNELS.index(c) for c in channels]
+        if not selected or len(self.grids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        q = np.asarray(query, dtype=np.float32).reshape(len(CHANNELS), CELLS)[selected]
+        # Scored block by block so the float32 copy stays bounded (the grids stay uint8)
+        dots = np.empty(len(self.grids), dtype=np.float32)
+        for start, block in self._blocks():
+            dots[start:start + len(block)] = np.einsum("ncx,cx->n", block[:, selected], q)
+        q = q.reshape(-1)
+        sq_dist = (q @ q) + self._sq_norms[:, selected].sum(axis=1) - 2.0 * dots
+        similarity = 1.0 - np.sqrt(np.clip(sq_dist, 0.0, None) / (len(q) * 255.0 ** 2))
+
+        if mask is not None:
+            similarity = np.where(mask, similarity, -np.inf)
+        k = min(top_k, int(np.isfinite(similarity).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argsort(-similarity, kind="stable")[:k]
+        return top, similarity[top]
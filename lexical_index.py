@@ -0,0 +1,204 @@
+"""
+[Lexical Index]
+Compact sparse-matrix storage and scoring for BGE-M3 lexical weights.
+
+BGE-M3's lexical matching score is a sparse dot product:
+    score(doc, query) = sum(doc[t] * query[t] for t shared by both)
+so scoring every document against a query is the sparse matrix-vector
+product  A @ q,  with A the (documents x vocabulary) weight matrix.
+
+Storage: A is kept in CSR form (int64 indptr, int32 token ids, float32 or
+float16 weights) for per-document access, and in token-major CSC form
+(postings lists: sorted token ids, int64 token_indptr, int32 doc rows,
+weights) for scoring. Both are built once at index time, persisted as plain
+.npy arrays and memory-mapped: a load copies nothing into RAM.
+Scoring: a query accumulates scores only over the rows in its tokens'
+postings, and top-k is selected among those rows (argpartition), so the
+cost follows the postings touched rather than the corpus size.
+"""
+
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+CSR_NAMES = ("indptr", "indices", "data")
+POSTING_NAMES = ("tokens", "token_indptr", "post_rows", "post_data")
+ARRAY_NAMES = CSR_NAMES + POSTING_NAMES
+
+
+def build_postings(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """CSC view of a CSR matrix: (tokens, token_indptr, post_rows, post_data)."""
+    indptr, indices = np.asarray(indptr), np.asarray(indices)
+    doc_rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    # nnz reordered by token id (stable, so rows stay sorted within a posting)
+    order = np.argsort(indices, kind="stable")
+    sorted_tokens = indices[order]
+    tokens, starts = np.unique(sorted_tokens, return_index=True)
+    token_indptr = np.append(starts, len(sorted_tokens)).astype(np.int64)
+    return tokens.astype(np.int32), token_indptr, doc_rows[order], np.asarray(data)[order]
+
+
+class LexicalMatrix:
+    """CSR lexical weight matrix with its postings (CSC) view for scoring."""
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        postings: Optional[Tuple[np.ndarray, ...]] = None,
+    ):
+        """`postings` (build_postings order) are derived from the CSR arrays when not given."""
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_docs = len(indptr) - 1
+        self.tokens, self.token_indptr, self.post_rows, self.post_data = \
+            postings if postings is not None else build_postings(indptr, indices, data)
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_weights(cls, lexical_weights: List[Dict[str, float]], dtype=np.float32) -> "LexicalMatrix":
+        """Build from per-document {token_id: weight} dicts (row = list position)."""
+        indptr = np.zeros(len(lexical_weights) + 1, dtype=np.int64)
+        indices, data = [], []
+        for row, doc_weights in enumerate(lexical_weights):
+            pairs = sorted((int(token), float(weight)) for token, weight in doc_weights.items())
+            indices.extend(token for token, _ in pairs)
+            data.extend(weight for _, weight in pairs)
+            indptr[row + 1] = indptr[row] + len(pairs)
+        return cls(indptr, np.asarray(indices, dtype=np.int32), np.asarray(data, dtype=dtype))
+
+    def arrays(self, prefix: str = "lexical") -> Dict[str, np.ndarray]:
+        """Arrays to persist with IndexStore, keyed '<prefix>_<name>'."""
+        return {f"{prefix}_{name}": getattr(self, name) for name in ARRAY_NAMES}
+
+    @staticmethod
+    def stored(arrays: Dict[str, Optional[np.ndarray]], prefix: str = "lexical") -> bool:
+        """Whether `arrays` holds a persisted matrix (checked without loading it)."""
+        return all(arrays.get(f"{prefix}_{name}") is not None for name in ARRAY_NAMES)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Optional[np.ndarray]], prefix: str = "lexical") -> Optional["LexicalMatrix"]:
+        """Matrix over stored (typically memory-mapped) arrays, or None if any is missing."""
+        if not cls.stored(arrays, prefix):
+            return None
+        csr = [arrays[f"{prefix}_{name}"] for name in CSR_NAMES]
+        return cls(*csr, postings=tuple(arrays[f"{prefix}_{name}"] for name in POSTING_NAMES))
+
+    def row_weights(self, row: int) -> Dict[str, float]:
+        """{token_id: weight} dict of one document (BGE-M3 lexical_weights format)."""
+        start, end = int(self.indptr[row]), int(self.indptr[row + 1])
+        return {str(t): float(w) for t, w in zip(self.indices[start:end], self.data[start:end])}
+
+    def nbytes(self) -> int:
+        return int(sum(np.asarray(getattr(self, name)).nbytes for name in ARRAY_NAMES))
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    def _posting(self, token: int):
+        pos = int(np.searchsorted(self.tokens, token))
+        if pos >= len(self.tokens) or self.tokens[pos] != token:
+            return None
+        start, end = int(self.token_indptr[pos]), int(self.token_indptr[pos + 1])
+        return self.post_rows[start:end], np.asarray(self.post_data[start:end], dtype=np.float32)
+
+    def score_touched(self, query_weights: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sparse matrix-vector product over the documents the query touches:
+        (rows, scores) for every row sharing a token with the query, rows
+        ascending. Every other document scores 0. Cost is the size of the
+        query's postings, independent of the corpus size.
+        """
+        rows, contributions = [], []
+        for token, weight in query_weights.items():
+            posting = self._posting(int(token))
+            if posting is None:
+                continue
+            doc_rows, doc_weights = posting
+            rows.append(doc_rows)
+            contributions.append(doc_weights.astype(np.float64) * float(weight))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        touched, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        return touched.astype(np.int64), np.bincount(inverse, weights=np.concatenate(contributions), minlength=len(touched))
+
+    def scores(self, query_weights: Dict[str, float]) -> np.ndarray:
+        """Lexical score of every document (dense; ranking uses score_touched)."""
+        scores = np.zeros(self.n_docs, dtype=np.float64)
+        rows, touched_scores = self.score_touched(query_weights)
+        scores[rows] = touched_scores
+        return scores
+
+    @staticmethod
+    def _best(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The k best (row, score) pairs, best first; ties keep index order (`rows` ascending)."""
+        if len(rows) > k:
+            # argpartition picks an arbitrary subset of the ties at the k-th score: take the lowest rows
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(above)]
+            keep = np.concatenate([above, ties])
+            rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def _zero_rows(self, need: int, scored: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        """First `need` candidate rows (index order) that the query didn't score."""
+        found = []
+        block = max(4 * need, 1024)
+        for start in range(0, self.n_docs, block):
+            rows = np.arange(start, min(start + block, self.n_docs))
+            if mask is not None:
+                rows = rows[mask[start:start + block]]
+            rows = rows[~np.isin(rows, scored, assume_unique=True)]
+            found.append(rows[:need])
+            need -= len(found[-1])
+            if need <= 0:
+                break
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _rank(self, query_weights: Dict[str, float], k: int, mask: Optional[np.ndarray]) -> Tuple[List[int], List[float]]:
+        if k <= 0:
+            return [], []
+        rows, scores = self.score_touched(query_weights)
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        positive = scores > 0
+        best_rows, best_scores = self._best(rows[positive], scores[positive], k)
+        if len(best_rows) < k:
+            # Fewer than k matches: the rest are documents scoring 0, in index order
+            zero_rows = self._zero_rows(k - len(best_rows), rows[scores != 0], mask)
+            best_rows = np.concatenate([best_rows, zero_rows])
+            best_scores = np.concatenate([best_scores, np.zeros(len(zero_rows))])
+            if len(best_rows) < k:
+                negative = scores < 0
+                neg_rows, neg_scores = self._best(rows[negative], scores[negative], k - len(best_rows))
+                best_rows = np.concatenate([best_rows, neg_rows])
+                best_scores = np.concatenate([best_scores, neg_scores])
+        return best_rows.tolist(), best_scores.tolist()
+
+    def top_k(self, query_weights: Dict[str, float], k: int, mask: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Rows of the k best documents, best first.
+        Ranks exactly like the brute-force scan: every document passing `mask`
+        is a candidate (non-matching ones score 0) and ties keep index order.
+        Only documents sharing a query token are scored and partitioned; the
+        zero-score documents are visited only when fewer than k match.
+        """
+        return self._rank(query_weights, k, mask)[0]
+
+    def top_k_batch(self, queries: List[Dict[str, float]], k: int, masks: List[Optional[np.ndarray]] = None, with_scores: bool = False) -> List[List[int]]:
+        """
+        top_k for several queries.
+        With `with_scores`, each entry is (rows, scores) instead of rows.
+        """
+        masks = masks or [None] * len(queries)
+        ranked = [self._rank(query, k, mask) for query, mask in zip(queries, masks)]
+        if with_scores:
+            return ranked
+        return [rows for rows, _ in ranked]
@@ -0,0 +1,233 @@
+"""
+[Local Analyzer]
+Heuristic stand-in for GeminiAnalyzer.analyze_page, computed locally in
+a few milliseconds per image.
+
+    images  dominant colors (k-means on a thumbnail), brightness, saturation,
+            contrast, warmth, colorfulness, orientation, image count
+            (ImageValidator.image_stats / dominant_colors)
+    text    category keywords in the title and body, body length
+
+The statistics are mapped onto the same schema Gemini returns (mood /
+category / type / description / visual_keywords / images), using the mood
+and category vocabulary of the layout dataset, so retrieval works unchanged.
+The answer is coarser than the vision model's; it is meant for the "fast"
+analyzer mode and as the "auto" mode's answer when Gemini misses its latency
+budget (see ANALYZER_MODE in rag_voyage.py).
+"""
+
+import re
+import time
+import colorsys
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from image_validator import image_validator
+
+logger = logging.getLogger(__name__)
+
+# Category vocabulary of the layout dataset; English and Korean cues
+CATEGORY_KEYWORDS = {
+    "Fashion": ["fashion", "style", "outfit", "runway", "collection", "wear", "dress", "denim", "trend", "model",
+                "패션", "스타일", "컬렉션", "룩", "의상", "코디", "런웨이"],
+    "Beauty": ["beauty", "skin", "skincare", "makeup", "cosmetic", "hair", "spa", "salon", "fragrance", "lip",
+               "뷰티", "피부", "메이크업", "화장", "헤어", "향수", "스킨케어"],
+    "Food": ["food", "recipe", "restaurant", "chef", "dish", "cook", "taste", "flavor", "coffee", "wine", "dessert",
+             "음식", "요리", "레시피", "맛집", "셰프", "커피", "디저트", "와인"],
+    "Travel": ["travel", "trip", "journey", "destination", "hotel", "city", "island", "beach", "tour", "flight",
+               "여행", "호텔", "도시", "해변", "투어", "관광"],
+    "Tech": ["tech", "technology", "digital", "ai", "software", "device", "smartphone", "startup", "innovation", "app",
+             "기술", "테크", "디지털", "인공지능", "스마트폰", "스타트업", "혁신"],
+    "Business": ["business", "market", "finance", "company", "ceo", "economy", "investment", "brand", "industry",
+                 "비즈니스", "경제", "기업", "투자", "시장", "브랜드", "산업"],
+    "Celebrity": ["celebrity", "star", "actor", "actress", "singer", "interview", "idol",
+                  "셀럽", "스타", "배우", "가수", "인터뷰", "아이돌"],
+}
+DEFAULT_CATEGORY = "Lifestyle"
+
+LONG_BODY_CHARS = 1200   # Above this, a single image reads as a text-led page
+SHORT_BODY_CHARS = 300   # Below this, any imagery dominates
+
+
+def color_name(rgb: Tuple[int, int, int]) -> str:
+    """Plain color word for an (r, g, b) tuple."""
+    h, s, v = colorsys.rgb_to_hsv(*(c / 255.0 for c in rgb))
+    if v < 0.18:
+        return "black"
+    if s < 0.15:
+        return "white" if v > 0.9 else "light gray" if v > 0.65 else "gray" if v > 0.35 else "charcoal"
+    hue = h * 360
+    if 15 <= hue < 50 and (v < 0.55 or s < 0.35):
+        return "brown" if v < 0.55 else "beige"
+    for limit, name in ((15, "red"), (40, "orange"), (70, "yellow"), (160, "green"), (200, "teal"),
+                        (255, "blue"), (290, "purple"), (340, "pink"), (361, "red")):
+        if hue < limit:
+            return name
+    return "red"
+
+
+class LocalAnalyzer:
+    def __init__(self, colors_per_image: int = 5, thumb_edge: int = 64):
+        """
+        Args:
+            colors_per_image: k for the dominant-color k-means
+            thumb_edge: Longest edge of the thumbnail the statistics run on
+        """
+        self.colors_per_image = colors_per_image
+        self.thumb_edge = thumb_edge
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._total_ms = 0.0
+        self._last_ms = 0.0
+
+    def analyze_page(self, images: List[Any], title: str, body: str) -> Dict[str, Any]:
+        """Same output schema as GeminiAnalyzer.analyze_page."""
+        start = time.perf_counter()
+        images = images or []
+        stats, colors = [], []
+        for img in images:
+            # One thumbnail per image, shared by both passes
+            pixels = image_validator.analysis_pixels(img, thumb_edge=self.thumb_edge)
+            stats.append(image_validator.image_stats(img, pixels=pixels))
+            colors.append(image_validator.dominant_colors(img, k=self.colors_per_image, pixels=pixels))
+
+        mood = self._mood(stats, body)
+        category = self._category(title, body)
+        layout_type = self._layout_type(stats, body)
+        keywords = self._visual_keywords(stats, colors)
+
+        analysis = {
+            "mood": mood,
+            "category": category,
+            "type": layout_type,
+            "description": self._description(mood, category, layout_type, stats, keywords),
+            "visual_keywords": keywords,
+            "images": self._image_attributes(stats),
+        }
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._calls += 1
+            self._total_ms += elapsed_ms
+            self._last_ms = elapsed_ms
+        return analysis
+
+    # ------------------------------------------------------------------
+    # Mapping
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _mean(stats: List[Dict[str, Any]], field: str) -> float:
+        return float(np.mean([s[field] for s in stats])) if stats else 0.0
+
+    def _mood(self, stats: List[Dict[str, Any]], body: str) -> str:
+        if not stats:
+            # Text only: a long essay reads as professional, short copy as clean
+            return "Professional" if len(body or "") > LONG_BODY_CHARS else "Clean"
+
+        brightness = self._mean(stats, "brightness")
+        saturation = self._mean(stats, "saturation")
+        contrast = self._mean(stats, "contrast")
+        warmth = self._mean(stats, "warmth")
+        colorfulness = self._mean(stats, "colorfulness")
+
+        if colorfulness > 0.35 and saturation > 0.4:
+            return "Energetic" if contrast > 0.25 else "Vibrant"
+        if brightness < 0.35:
+            return "Luxurious" if contrast > 0.2 or warmth > 0.05 else "Emotional"
+        if saturation < 0.12:
+            return "Minimalist" if brightness > 0.7 else "Professional"
+        if warmth > 0.12 and saturation > 0.25:
+            return "Emotional"
+        if colorfulness > 0.25:
+            return "Trendy"
+        return "Elegant"
+
+    @staticmethod
+    def _matches(word: str, cue: str) -> bool:
+        # Korean nouns carry attached particles (패션을, 여행의): prefix match
+        if not cue.isascii():
+            return word.startswith(cue)
+        return word == cue or word == cue + "s"
+
+    def _category(self, title: str, body: str) -> str:
+        # Title words count double: they name the story
+        title_words = re.findall(r"\w+", (title or "").lower())
+        body_words = re.findall(r"\w+", (body or "").lower())
+        scores = {}
+        for category, cues in CATEGORY_KEYWORDS.items():
+            score = 0
+            for cue in cues:
+                score += 2 * sum(1 for w in title_words if self._matches(w, cue))
+                score += sum(1 for w in body_words if self._matches(w, cue))
+            if score:
+                scores[category] = score
+        return max(scores, key=scores.get) if scores else DEFAULT_CATEGORY
+
+    def _layout_type(self, stats: List[Dict[str, Any]], body: str) -> str:
+        n_images = len(stats)
+        body_len = len(body or "")
+        if n_images == 0:
+            return "Text-heavy"
+        if n_images >= 3:
+            return "Collage"
+        if body_len < SHORT_BODY_CHARS:
+            return "Image-heavy"
+        if n_images == 1 and body_len > LONG_BODY_CHARS:
+            return "Text-heavy"
+        return "Balanced"
+
+    def _visual_keywords(self, stats: List[Dict[str, Any]], colors: List[List[Dict[str, Any]]]) -> List[str]:
+        # Color words weighted by their share across all images
+        weights: Dict[str, float] = {}
+        for image_colors in colors:
+            for color in image_colors:
+                name = color_name(color["rgb"])
+                weights[name] = weights.get(name, 0.0) + color["share"]
+        keywords = [name for name, _ in sorted(weights.items(), key=lambda kv: -kv[1])[:3]]
+
+        if stats:
+            brightness = self._mean(stats, "brightness")
+            if brightness > 0.7:
+                keywords.append("bright")
+            elif brightness < 0.35:
+                keywords.append("dark")
+            if self._mean(stats, "contrast") > 0.28:
+                keywords.append("high contrast")
+            orientations = {s["orientation"] for s in stats}
+            if len(orientations) == 1:
+                keywords.append(f"{orientations.pop()} imagery")
+        return keywords[:5]
+
+    def _image_attributes(self, stats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # No subject without a vision model; salience from contrast and colorfulness,
+        # scaled so the page's strongest image is 1.0
+        strength = [s["contrast"] + s["colorfulness"] for s in stats]
+        top = max(strength, default=0.0) or 1.0
+        return [
+            {"index": i, "subject": "", "salience": round(value / top, 2), "orientation": s["orientation"]}
+            for i, (s, value) in enumerate(zip(stats, strength))
+        ]
+
+    def _description(
+        self,
+        mood: str,
+        category: str,
+        layout_type: str,
+        stats: List[Dict[str, Any]],
+        keywords: List[str],
+    ) -> str:
+        if not stats:
+            return f"{mood} typographic {category.lower()} layout led by the headline and body text"
+        tones = ", ".join(keywords[:2])
+        return f"{mood} {category.lower()} layout, {layout_type.lower()}, with {tones} tones and {len(stats)} image(s)"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "mean_ms": round(self._total_ms / self._calls, 2) if self._calls else 0.0,
+                "last_ms": round(self._last_ms, 2),
+            }
@@ -12,9 +12,9 @@ import sys
 import os
 from typing import TypedDict, List, Optional, Annotated
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langgraph.graph import StateGraph, END
+from startup_profiler import phase as startup_phase
+# langchain / langgraph load on first use (node calls, graph build): the
+# server answers the MCP handshake before paying for them
 
 load_dotenv()
 
@@ -45,6 +45,8 @@ class MagazineState(TypedDict):
     vision_summary: str
     design_summary: str
     layout_summary: str
+    palette: List[str]          # 이미지에서 추출한 팔레트 (hex)
+    accent_hex: Optional[str]   # 팔레트 기반 강조색 (있으면 LLM 선택을 덮어씀)
     
     # Retry Control
     retry_count: int                  # 재시도 횟수 (max 3)
@@ -69,6 +71,9 @@ class MagazineState(TypedDict):
 # ============================================================
 def image_analyzer_node(state: MagazineState) -> MagazineState:
     """이미지 분석 및 HERO 이미지 결정"""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
     llm = config.get_llm(temperature=0.3)
     
     prompt = ChatPromptTemplate.from_template("""
@@ -136,11 +141,49 @@ Return JSON only:
     
     return state
 
+def image_analysis_from_attributes(attributes: List[dict], image_count: int) -> Optional[dict]:
+    """
+    FastAPI 쪽 비전 분석의 이미지별 속성(subject, salience, orientation)으로
+    image_analyzer_node와 같은 형식의 결과를 LLM 호출 없이 생성
+    (속성이 이미지 수와 맞지 않으면 None → image_analyzer_node 실행)
+    """
+    if not attributes or len(attributes) != image_count:
+        return None
+    
+    order = sorted(range(image_count), key=lambda i: -float(attributes[i].get("salience", 0.0)))
+    hero_idx = order[0]
+    heights = {"large": "280px", "medium": "220px", "small": "180px"}
+    placements = {}
+    for rank, idx in enumerate(order):
+        size = "large" if rank == 0 else "medium" if rank <= 2 else "small"
+        position = "top-right" if rank == 0 else "middle-right" if rank <= 2 else "bottom-row"
+        placements[str(idx)] = {"position": position, "size": size, "height": heights[size]}
+    
+    hero = attributes[hero_idx]
+    return {
+        "hero_image_index": hero_idx,
+        "image_order": order,
+        "placements": placements,
+        "layout_recommendation": f"{hero.get('orientation', 'portrait')} hero ({hero.get('subject') or 'image'}) "
+                                 f"with {image_count - 1} supporting image(s)",
+        "images": attributes
+    }
+
+def entry_router(state: MagazineState) -> str:
+    """비전 속성으로 image_analysis가 이미 채워졌으면 image_analyzer_node 생략"""
+    if state.get("image_analysis"):
+        print(f"🖼️  [Node 1] Image Analyzer: skipped (HERO #{state['image_analysis']['hero_image_index']} from vision attributes)", file=sys.stderr)
+        return "layout_planner"
+    return "image_analyzer"
+
 # ============================================================
 # NODE 2: Layout Planner
 # ============================================================
 def layout_planner_node(state: MagazineState) -> MagazineState:
     """페이지 그리드 구조 결정"""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
     llm = config.get_llm(temperature=0.3)
     
     body_length = len(state["body"])
@@ -253,6 +296,9 @@ Return JSON with your decision:
 # ============================================================
 def typography_styler_node(state: MagazineState) -> MagazineState:
     """폰트, 색상, 강조 스타일 결정"""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
     llm = config.get_llm(temperature=0.5)
     
     prompt = ChatPromptTemplate.from_template("""
@@ -322,6 +368,7 @@ Return JSON only:
                 "accent_color": "text-red-600"
             }
         
+        apply_palette_accent(style, state.get("accent_hex"))
         accent = style.get('accent_color', 'none')
         headline_cls = style.get('headline_classes', '')[:40]
         touches = style.get('premium_touches', [])
@@ -339,18 +386,28 @@ Return JSON only:
     except Exception as e:
         print(f"   ⚠️ Error: {e}", file=sys.stderr)
         print(f"   🔄 Using fallback typography", file=sys.stderr)
-        state["typography_style"] = {
+        state["typography_style"] = apply_palette_accent({
             "headline_classes": "text-6xl font-black",
             "body_classes": "text-base leading-relaxed"
-        }
+        }, state.get("accent_hex"))
     
     return state
 
+def apply_palette_accent(style: dict, accent_hex: Optional[str]) -> dict:
+    """이미지 팔레트 강조색이 있으면 LLM이 고른 강조색 대신 사용 (Tailwind 임의값 클래스)"""
+    if accent_hex:
+        style["accent_color"] = f"text-[{accent_hex}]"
+        style["accent_border"] = f"border-[{accent_hex}]"
+    return style
+
 # ============================================================
 # NODE 4: HTML Generator
 # ============================================================
 def html_generator_node(state: MagazineState) -> MagazineState:
     """최종 HTML 생성"""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
     llm = config.get_llm(temperature=0.7)
     
     image_analysis = state.get("image_analysis", {})
@@ -580,6 +637,8 @@ NO markdown blocks, just raw HTML.
     
     key_phrases = typography.get("key_phrases", [])
     accent_color = typography.get("accent_color", "text-red-600")
+    if state.get("palette"):
+        accent_color += f" (borders: {typography.get('accent_border', '')}; page palette from the images: {', '.join(state['palette'])})"
     
     # 재시도 시 수정 힌트 추가
     retry_count = state.get("retry_count", 0)
@@ -890,6 +949,8 @@ def quality_check_router(state: MagazineState) -> str:
 # Build LangGraph
 # ============================================================
 def build_magazine_graph():
+    from langgraph.graph import StateGraph, END
+    
     graph = StateGraph(MagazineState)
     
     # Processing nodes (Intent and Filter now run in main.py)
@@ -900,8 +961,14 @@ def build_magazine_graph():
     graph.add_node("validator", validator_node)
     graph.add_node("html_quality_checker", html_quality_checker_node)
     
-    # Entry point (starts with Image Analyzer)
-    graph.set_entry_point("image_analyzer")
+    # Entry point: Image Analyzer, unless the request carried per-image vision attributes
+    graph.set_conditional_entry_point(
+        entry_router,
+        {
+            "image_analyzer": "image_analyzer",
+            "layout_planner": "layout_planner"
+        }
+    )
     
     # Processing edges
     graph.add_edge("image_analyzer", "layout_planner")
@@ -922,8 +989,15 @@ def build_magazine_graph():
     
     return graph.compile()
 
-# Global graph instance
-magazine_graph = build_magazine_graph()
+# Global graph instance, built by the first tool call
+_magazine_graph = None
+
+def get_magazine_graph():
+    global _magazine_graph
+    if _magazine_graph is None:
+        with startup_phase("build_magazine_graph"):
+            _magazine_graph = build_magazine_graph()
+    return _magazine_graph
 
 # ============================================================
 # MCP Interface
@@ -938,7 +1012,8 @@ def generate_magazine_layout(
     layout_override: str = "None",
     vision_context: str = "{}",
     design_spec: str = "{}",
-    planner_intent: str = "{}"
+    planner_intent: str = "{}",
+    image_attributes: str = "[]"
 ) -> str:
     """
     LangGraph 멀티 노드를 사용하여 동적으로 고품질 매거진 HTML을 생성합니다.
@@ -966,6 +1041,11 @@ def generate_magazine_layout(
         vision_data = {}
         design_data = {}
         plan_data = {}
+    try:
+        attributes = json.loads(image_attributes) if image_attributes else []
+    except json.JSONDecodeError:
+        attributes = []
+    image_analysis = image_analysis_from_attributes(attributes if isinstance(attributes, list) else [], image_count)
     
     # Build summaries (same as original)
     vision_summary = "Not provided"
@@ -974,6 +1054,12 @@ def generate_magazine_layout(
         desc = vision_data.get('description', '')
         style = vision_data.get('visual_style', 'Modern')
         vision_summary = f"Style: {style}, Keywords: {', '.join(keywords) if keywords else 'none'}, Description: {desc}"
+    if image_analysis:
+        subjects = "; ".join(
+            f"#{a['index']} {a.get('subject') or 'image'} ({a.get('orientation', '?')}, salience {a.get('salience', 0)})"
+            for a in image_analysis["images"]
+        )
+        vision_summary = f"Images: {subjects}" if vision_summary == "Not provided" else f"{vision_summary}, Images: {subjects}"
     
     design_summary = "Standard magazine layout"
     if design_data:
@@ -999,9 +1085,11 @@ def generate_magazine_layout(
         "vision_summary": vision_summary,
         "design_summary": design_summary,
         "layout_summary": layout_summary,
+        "palette": design_data.get('palette') or [],
+        "accent_hex": design_data.get('accent_color'),
         "retry_count": 0,              # 재시도 카운터 초기화
         "quality_fix_hints": None,     # 품질 수정 힌트 초기화
-        "image_analysis": None,
+        "image_analysis": image_analysis,
         "layout_plan": None,
         "typography_style": None,
         "html_output": None,
@@ -1012,7 +1100,7 @@ def generate_magazine_layout(
 
     try:
         # Run the graph
-        final_state = magazine_graph.invoke(initial_state)
+        final_state = get_magazine_graph().invoke(initial_state)
         
         html = final_state.get("final_html", "")
         validation = final_state.get("validation_result", {})
@@ -1030,4 +1118,9 @@ def generate_magazine_layout(
         return f"<div class='p-10 text-red-500'>Error: {e}</div>"
 
 if __name__ == "__main__":
-    mcp.run()
+    if "--profile-startup" in sys.argv:
+        # Ranked import / initialization times of this server
+        import startup_profiler
+        startup_profiler.main(["mcp"])
+    else:
+        mcp.run()
@@ -0,0 +1,284 @@
+"""
+[Providers]
+Async clients for the external model APIs, with retries and hedging.
+
+    GeminiProvider   google.generativeai generate_content_async (sync variant for scripts)
+    VoyageProvider   Voyage embeddings over REST (aiohttp, pooled keep-alive connections)
+
+Every call goes through Provider.call():
+
+    retries   retryable errors (timeouts, connection errors, 408/429/5xx)
+              are retried with full-jitter exponential backoff:
+              sleep ~ U(0, min(max_delay, base_delay * 2^attempt))
+    hedging   if the call hasn't answered after the hedge delay (fixed ms,
+              or the observed p95 latency), an identical duplicate is fired
+              and the first success wins; the loser is cancelled
+
+Endpoints are configurable (VOYAGE_BASE_URL, GEMINI_API_ENDPOINT), so the
+clients can run against a local fake server; scripts/provider_smoke.py
+ships one for the Voyage REST API.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# google.api_core exception names (matched by name: no hard dependency)
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "TooManyRequests", "GatewayTimeout", "BadGateway", "RateLimitError",
+    "ServiceUnavailableError", "Timeout", "APIConnectionError", "TryAgain",
+}
+
+
+class ProviderHTTPError(Exception):
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(f"HTTP {status}: {message[:200]}")
+        self.status = status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient errors worth another attempt (rate limits, overload, network)."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    for attr in ("status", "status_code", "http_status"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return name in RETRYABLE_ERROR_NAMES or name.startswith("ClientConnector") or name == "ServerDisconnectedError"
+
+
+class Provider:
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay_s: float = 0.5,
+        max_delay_s: float = 8.0,
+        hedge: Optional[str] = None,
+        hedge_min_samples: int = 20,
+    ):
+        """
+        Args:
+            name: Label for logs and stats
+            max_attempts: Attempts per call, including the first
+            base_delay_s / max_delay_s: Backoff scale and cap
+            hedge: None/"off", "p95" (adaptive), or a fixed delay in ms
+            hedge_min_samples: Latencies needed before the p95 hedge kicks in
+        """
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.hedge = None if hedge in (None, "", "off", "0") else hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=512)
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "hedges": 0, "hedge_wins": 0}
+
+    # ------------------------------------------------------------------
+    # Policy
+    # ------------------------------------------------------------------
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+        return random.uniform(0.0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+    def hedge_delay_s(self) -> Optional[float]:
+        if self.hedge is None:
+            return None
+        if self.hedge == "p95":
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return float(np.percentile(self._latencies, 95))
+        return float(self.hedge) / 1000.0
+
+    # ------------------------------------------------------------------
+    # Async
+    # ------------------------------------------------------------------
+    async def call(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `make_call()` (a coroutine factory) with retries and optional hedging."""
+        self._stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            try:
+                return await self._hedged(make_call)
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                    self._stats["failures"] += 1
+                    raise
+                delay = self.backoff_delay(attempt)
+                self._stats["retries"] += 1
+                logger.warning(f"⚠️ {self.name}: {e} (attempt {attempt + 1}/{self.max_attempts}). Retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _timed(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["attempts"] += 1
+        start = time.perf_counter()
+        result = await make_call()
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay_s()
+        if delay is None:
+            return await self._timed(make_call)
+
+        primary = asyncio.ensure_future(self._timed(make_call))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self._stats["hedges"] += 1
+            backup = asyncio.ensure_future(self._timed(make_call))
+            pending.add(backup)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ------------------------------------------------------------------
+    # Sync (scripts, index builds): retries without hedging
+    # ------------------------------------------------------------------
+    def call_sync(self, make_call: Callable[[], Any]) -> Any:
+        """
+        Blocking call() without hedging. Latencies aren't recorded: bulk calls
+        (index builds) would skew the p95 that times the hedges.
+        """
+        self._stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            try:
+                self._stats["attempts"] += 1
+                return make_call()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                    self._stats["failures"] += 1
+                    raise
+                delay = self.backoff_delay(attempt)
+                self._stats["retries"] += 1
+                logger.warning(f"⚠️ {self.name}: {e} (attempt {attempt + 1}/{self.max_attempts}). Retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = np.asarray(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        hedge_delay = self.hedge_delay_s()
+        return {
+            **self._stats,
+            "hedge": self.hedge or "off",
+            "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 1),
+                "p95": round(float(np.percentile(latencies, 95)), 1),
+            },
+        }
+
+
+class GeminiProvider(Provider):
+    def __init__(self, model, request_timeout_s: float = 60.0, **policy):
+        """
+        Args:
+            model: genai.GenerativeModel (configure an api_endpoint in
+                   genai.configure(client_options=...) to target another server)
+        """
+        super().__init__(policy.pop("name", "gemini"), **policy)
+        self.model = model
+        self.request_options = {"timeout": request_timeout_s}
+
+    async def generate(self, inputs: List[Any]) -> Any:
+        return await self.call(lambda: self.model.generate_content_async(inputs, request_options=self.request_options))
+
+    def generate_sync(self, inputs: List[Any]) -> Any:
+        return self.call_sync(lambda: self.model.generate_content(inputs, request_options=self.request_options))
+
+
+class VoyageProvider(Provider):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.voyageai.com/v1",
+        max_connections: int = 16,
+        request_timeout_s: float = 30.0,
+        **policy,
+    ):
+        super().__init__(policy.pop("name", "voyage"), **policy)
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.request_timeout_s = request_timeout_s
+        self._session = None
+        self._session_loop = None
+
+    def _get_session(self):
+        """One pooled keep-alive session per event loop."""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout_s),
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def _post_embeddings(self, payload: Dict[str, Any]) -> List[List[float]]:
+        session = self._get_session()
+        async with session.post(f"{self.base_url}/embeddings", json=payload) as response:
+            if response.status != 200:
+                raise ProviderHTTPError(response.status, await response.text())
+            body = await response.json()
+        data = sorted(body["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    async def embed(
+        self,
+        texts: List[str],
+        model: str,
+        input_type: Optional[str] = None,
+        output_dimension: Optional[int] = None,
+    ) -> List[List[float]]:
+        payload = {"input": texts, "model": model}
+        if input_type:
+            payload["input_type"] = input_type
+        if output_dimension:
+            payload["output_dimension"] = output_dimension
+        return await self.call(lambda: self._post_embeddings(payload))
+
+    async def warmup(self) -> Dict[str, Any]:
+        """
+        Open a pooled connection (DNS, TCP, TLS) before the first embedding
+        call. Any HTTP answer counts: nothing is embedded or billed.
+        """
+        session = self._get_session()
+        start = time.perf_counter()
+        async with session.get(self.base_url) as response:
+            await response.read()
+        return {"status": response.status, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close_soon(self) -> None:
+        """close() from any thread: scheduled on the loop that owns the session."""
+        loop = self._session_loop
+        if self._session is not None and not self._session.closed and loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.close(), loop)
@@ -0,0 +1,214 @@
+"""
+[Query Batcher]
+Micro-batching front end for query encoders shared by concurrent requests.
+
+Each /analyze request used to embed its own queries (one Voyage round trip or
+one BGE-M3 forward pass per request). MicroBatchEncoder collects the queries
+that arrive within a short window (max_wait_ms) or until max_batch_size is
+reached, encodes them with a single encode_fn call on a worker thread, and
+resolves every waiting caller with its own result.
+
+    encoder = MicroBatchEncoder(retriever._embed_queries, max_batch_size=32, max_wait_ms=5)
+    vec = await encoder.encode("Minimalist Fashion ...")
+
+One batch is in flight at a time; queries arriving meanwhile form the next
+batch, so the batch size grows with load instead of the request count.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Samples kept for latency percentiles
+STATS_WINDOW = 1024
+
+
+class MicroBatchEncoder:
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "encoder",
+    ):
+        """
+        Args:
+            encode_fn: Batch encoder, texts -> one result per text (same order);
+                       blocking functions run on a worker thread, coroutine functions on the loop
+            max_batch_size: Flush as soon as this many queries are waiting
+            max_wait_ms: Longest time the first query of a batch waits for company
+            name: Label used in logs and stats
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self._started_at = time.perf_counter()
+        self._requests = 0
+        self._batches = 0
+        self._encoded = 0  # unique texts sent to encode_fn
+        self._errors = 0
+        self._max_batch_seen = 0
+        self._busy_s = 0.0
+        self._wait_ms = deque(maxlen=STATS_WINDOW)
+        self._encode_ms = deque(maxlen=STATS_WINDOW)
+        self._latency_ms = deque(maxlen=STATS_WINDOW)
+        self._batch_sizes = deque(maxlen=STATS_WINDOW)
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # First use, or a new event loop (e.g. tests / reload): start a fresh worker
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> Any:
+        """Encode one query as part of the next micro-batch."""
+        if self._closed:
+            raise RuntimeError(f"{self.name}: encoder is closed")
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._requests += 1
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[Any]:
+        """Encode several queries; they may share batches with other callers."""
+        return list(await asyncio.gather(*(self.encode(t) for t in texts)))
+
+    async def _collect(self) -> List[tuple]:
+        """Block for the first query, then gather more until full or the window closes."""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            # Drain what is already queued without waiting
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - self._loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def close(self) -> None:
+        """
+        Stop the worker task (callable from any thread, e.g. when a hot reload
+        retires the owning retriever). Queries still waiting fail.
+        """
+        self._closed = True
+        loop, worker = self._loop, self._worker
+        if loop is None or worker is None or loop.is_closed():
+            return
+
+        def stop():
+            worker.cancel()
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError(f"{self.name}: encoder closed"))
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            stop()
+        else:
+            loop.call_soon_threadsafe(stop)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+            try:
+                await self._encode_batch(batch)
+            except asyncio.CancelledError:
+                # Closed mid-batch: don't leave its callers waiting
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"{self.name}: encoder closed"))
+                raise
+
+    async def _encode_batch(self, batch: List[tuple]) -> None:
+        # Identical queries in a batch are encoded once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(self.encode_fn):
+                results = await self.encode_fn(texts)
+            else:
+                results = await self._loop.run_in_executor(None, self.encode_fn, texts)
+            if len(results) != len(texts):
+                raise RuntimeError(f"{self.name}: encode_fn returned {len(results)} results for {len(texts)} texts")
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"{self.name}: batch of {len(texts)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        end = time.perf_counter()
+
+        by_text = dict(zip(texts, results))
+        for text, future, enqueued in batch:
+            self._wait_ms.append((start - enqueued) * 1000)
+            self._latency_ms.append((end - enqueued) * 1000)
+            if not future.done():
+                future.set_result(by_text[text])
+
+        self._batches += 1
+        self._encoded += len(texts)
+        self._busy_s += end - start
+        self._encode_ms.append((end - start) * 1000)
+        self._batch_sizes.append(len(batch))
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+    @staticmethod
+    def _percentiles(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        values = np.asarray(samples)
+        return {
+            "p50": round(float(np.percentile(values, 50)), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+            "max": round(float(values.max()), 2),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and latency counters (latencies over the last STATS_WINDOW samples)."""
+        uptime = time.perf_counter() - self._started_at
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "requests": self._requests,
+            "batches": self._batches,
+            "encoded_texts": self._encoded,
+            "errors": self._errors,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "mean_batch_size": round(float(np.mean(self._batch_sizes)), 2) if self._batch_sizes else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "queries_per_s": round(self._requests / uptime, 3) if uptime > 0 else 0.0,
+            "encoded_per_busy_s": round(self._encoded / self._busy_s, 1) if self._busy_s > 0 else 0.0,
+            "queue_wait_ms": self._percentiles(self._wait_ms),
+            "encode_ms": self._percentiles(self._encode_ms),
+            "latency_ms": self._percentiles(self._latency_ms),
+        }
@@ -1,20 +1,28 @@
 
 import os
 import json
-import chromadb
-import google.generativeai as genai
-from typing import List, Dict, Any, Tuple
-from FlagEmbedding import BGEM3FlagModel
+import asyncio
+import threading
+from typing import List, Dict, Any, Tuple, Optional
 from collections import defaultdict
 from dotenv import load_dotenv
 import numpy as np
+from index_store import IndexStore, LazyLayoutMap, metadata_columns
+from filter_index import BitmapFilterIndex
+from lexical_index import LexicalMatrix
+from colbert_index import ColbertVectors
+from sharded_retriever import ShardedRetriever
+from hot_reload import LiveSnapshot, BackgroundReloader
+from startup_profiler import phase as startup_phase
+from bge_onnx import load_bge_model
+from query_batcher import MicroBatchEncoder
+from batch_indexer import encode_batches, estimate_tokens
 
 # Load environment variables
 load_dotenv()
 
 # Configure Logging
 import logging
-import pickle
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -22,8 +30,30 @@ class Config:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     MODEL_NAME = 'BAAI/bge-m3'
     CHROMA_DB_PATH = "./chroma_db"
+    INDEX_PATH = "./index_bge"  # Memory-mapped index artifact (see index_store.py)
     COLLECTION_NAME = "magazine_layouts"
     DATASET_PATH = "./datas/dataset.json"
+    LEXICAL_WEIGHT_DTYPE = os.getenv("BGE_LEXICAL_DTYPE", "float32")  # float32 | float16 (CSR weights)
+    # Encoder backend: torch (FlagEmbedding) | onnx (int8, CPU) | onnx-fp32 — see bge_onnx.py
+    BGE_BACKEND = os.getenv("BGE_BACKEND", "torch")
+    BGE_ONNX_PATH = os.getenv("BGE_ONNX_PATH", "./models/bge-m3-onnx")
+    BGE_ONNX_THREADS = int(os.getenv("BGE_ONNX_THREADS", "0"))  # 0 = all cores
+    # Micro-batching of concurrent query encodes (see query_batcher.py)
+    QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+    # Index build: length-bucketed batches (see batch_indexer.py)
+    MAX_LENGTH = 8192  # BGE-M3 max sequence length
+    INDEX_BATCH_TOKENS = int(os.getenv("BGE_INDEX_BATCH_TOKENS", "16384"))  # padded tokens per forward pass
+    INDEX_BATCH_MAX_DOCS = int(os.getenv("BGE_INDEX_BATCH_MAX_DOCS", "64"))
+    INDEX_WORKERS = int(os.getenv("BGE_INDEX_WORKERS", "1"))  # >1 only helps with spare GPU/CPU capacity
+    # Optional ColBERT (multi-vector) rerank of the fused top-N (see colbert_index.py)
+    COLBERT_RERANK = os.getenv("BGE_COLBERT_RERANK", "0").lower() in ("1", "true", "yes")
+    COLBERT_TOP_N = int(os.getenv("BGE_COLBERT_TOP_N", "20"))
+    COLBERT_BUDGET_MS = float(os.getenv("BGE_COLBERT_BUDGET_MS", "30"))  # Per query; unscored tail keeps RRF order
+    # Scatter-gather over N local worker processes (see sharded_retriever.py); 0 = single process
+    SHARDS = int(os.getenv("BGE_SHARDS", "0"))
+    SHARD_TIMEOUT_MS = float(os.getenv("BGE_SHARD_TIMEOUT_MS", "500"))
+    SHARD_PATH = os.path.join(INDEX_PATH, "shards")
 
     @staticmethod
     def validate():
@@ -32,6 +62,8 @@ class Config:
 
 class GeminiAnalyzer:
     def __init__(self):
+        import google.generativeai as genai  # Heavy: loaded with the first analyzer, not at import
+        
         Config.validate()
         genai.configure(api_key=Config.GOOGLE_API_KEY)
         # Using valid model name. 'gemini-1.5-flash' sometimes requires specific versioning.
@@ -316,23 +348,49 @@ class GeminiAnalyzer:
 
 
 class ChromaHybridRetriever:
-    def __init__(self):
+    def __init__(self, rebuild: bool = False, model=None):
         """
         Initialize BGE-M3 model and ChromaDB client.
+        `rebuild` re-encodes the dataset even if the stored index is current;
+        `model` reuses an already loaded encoder (hot reload).
         """
-        print(f"Loading Model: {Config.MODEL_NAME}...")
-        self.model = BGEM3FlagModel(Config.MODEL_NAME, use_fp16=True)
+        if model is not None:
+            self.model = model
+        else:
+            print(f"Loading Model: {Config.MODEL_NAME} (backend: {Config.BGE_BACKEND})...")
+            self.model = load_bge_model(
+                Config.MODEL_NAME,
+                backend=Config.BGE_BACKEND,
+                onnx_path=Config.BGE_ONNX_PATH,
+                num_threads=Config.BGE_ONNX_THREADS,
+            )
         
-        print(f"Connecting to ChromaDB at {Config.CHROMA_DB_PATH}...")
-        self.client = chromadb.PersistentClient(path=Config.CHROMA_DB_PATH)
-        self.collection = self.client.get_or_create_collection(name=Config.COLLECTION_NAME)
+        # ChromaDB connects on first use (index builds): serving from the cached index never imports it
+        self.client = None
+        self._collection = None
         
-        self.sparse_index: Dict[str, Any] = {}
         self.doc_ids: List[str] = []
         self.doc_map: Dict[str, Any] = {} # Store raw layout data
+        self.dense_embeddings: np.ndarray = None
+        self.columns: Dict[str, np.ndarray] = {}  # Columnar metadata for in-memory filtering
+        self.filter_index: BitmapFilterIndex = None  # Per-field, per-value bitsets over the columns
+        self.lexical_index: LexicalMatrix = None  # CSR lexical weights (documents x vocabulary)
+        self.colbert_index: ColbertVectors = None  # float16 token vectors (only with COLBERT_RERANK)
+        self._row_of: Dict[str, int] = {}  # doc_id -> row in the stored arrays
+        self.shards: ShardedRetriever = None  # Worker processes when Config.SHARDS > 1
+        self._index_lock = threading.Lock()  # Guards on-demand loads of what a sharded coordinator skipped
+        self.store: IndexStore = None
+        self.index_stats: Dict[str, Any] = {}  # Throughput of the last index build
+        # Shared by concurrent requests: queries arriving together share one forward pass
+        self.query_encoder = MicroBatchEncoder(
+            self._encode_queries,
+            max_batch_size=Config.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=Config.QUERY_BATCH_MAX_WAIT_MS,
+            name="bge-m3-query"
+        )
         
         # Index Caching Logic with Auto-Versioning
-        self.cache_path = "./index_cache.pkl"
+        self.cache_path = Config.INDEX_PATH
         
         # Auto-generate version from index_data logic hash
         import hashlib
@@ -341,52 +399,144 @@ class ChromaHybridRetriever:
         logic_hash = hashlib.md5(logic_source.encode()).hexdigest()[:8]
         self.CACHE_VERSION = f"1.0.1-{logic_hash}" # Auto-versioned
         
-        if self._load_from_cache():
+        if not rebuild and self._load_from_cache():
             logger.info(f"✅ Loaded index from cache (v{self.CACHE_VERSION}).")
         else:
             logger.info("⚡ Index not found, expired, or invalid. Re-indexing...")
             self.index_data() 
             self._save_to_cache()
+            # Serve from the memory-mapped artifact just written
+            self._load_from_cache()
+        
+        if Config.SHARDS > 1 and self.store is not None:
+            self.shards = self._start_shards()
+            if self.shards is None:
+                self._ensure_indexes()
+
+    def close(self, remove_files: bool = False):
+        """
+        Release the index (query encoder worker, shard workers, mmaps). Called
+        when a hot reload retires this retriever, with `remove_files` so its
+        shard build is deleted once no newer retriever maps it.
+        """
+        self.query_encoder.close()
+        if self.shards is not None:
+            self.shards.close(remove_files=remove_files)
+        if self.store is not None:
+            self.store.close()
+
+    def _start_shards(self) -> ShardedRetriever:
+        """Split the stored dense + lexical index across Config.SHARDS worker processes (None on failure)."""
+        try:
+            return ShardedRetriever.for_store(
+                self.store,
+                Config.SHARD_PATH,
+                Config.SHARDS,
+                vectors_name="dense",
+                lexical=True,
+                timeout_ms=Config.SHARD_TIMEOUT_MS
+            )
+        except Exception as e:
+            logger.error(f"Failed to start shards: {e}. Searching in-process.")
+            return None
 
     def _save_to_cache(self):
+        if not self.doc_ids:
+            return
         try:
-            with open(self.cache_path, 'wb') as f:
-                pickle.dump({
-                    'version': self.CACHE_VERSION, # Add versioning
-                    'sparse_index': self.sparse_index,
-                    'doc_map': self.doc_map,
-                    'doc_ids': self.doc_ids
-                }, f)
+            layouts = [self.doc_map[doc_id] for doc_id in self.doc_ids]
+            IndexStore.write(
+                self.cache_path,
+                version=self.CACHE_VERSION,
+                doc_ids=self.doc_ids,
+                columns=self.columns,
+                arrays={
+                    "dense": self.dense_embeddings,
+                    **self.lexical_index.arrays("lexical"),
+                    **self.filter_index.arrays("bitmap"),
+                    **(self.colbert_index.arrays("colbert") if self.colbert_index is not None else {})
+                },
+                blobs={"layouts": layouts}
+            )
             logger.info(f"Saved index to {self.cache_path} (v{self.CACHE_VERSION})")
         except Exception as e:
             logger.error(f"Failed to save cache: {e}")
 
+    @property
+    def collection(self):
+        """Chroma collection, connected on first use."""
+        if self._collection is None:
+            import chromadb
+            
+            print(f"Connecting to ChromaDB at {Config.CHROMA_DB_PATH}...")
+            self.client = chromadb.PersistentClient(path=Config.CHROMA_DB_PATH)
+            self._collection = self.client.get_or_create_collection(name=Config.COLLECTION_NAME)
+        return self._collection
+
+    # Attributes _load_from_cache assigns (restored when a load is abandoned)
+    _INDEX_FIELDS = ("store", "doc_ids", "_row_of", "doc_map", "dense_embeddings", "columns",
+                     "lexical_index", "filter_index", "colbert_index")
+
     def _load_from_cache(self) -> bool:
-        if not os.path.exists(self.cache_path):
-            return False
+        store = None
+        previous = {name: getattr(self, name) for name in self._INDEX_FIELDS}
         try:
+            # Check version compatibility (format + auto-version)
+            store = IndexStore.open(self.cache_path, expected_version=self.CACHE_VERSION)
+            if store is None:
+                return False
+            
             # check if dataset is newer than cache
             if os.path.exists(Config.DATASET_PATH):
-                if os.path.getmtime(Config.DATASET_PATH) > os.path.getmtime(self.cache_path):
+                if os.path.getmtime(Config.DATASET_PATH) > store.mtime():
                     logger.info("Dataset modified. Invalidating cache.")
-                    return False
+                    return self._abandon_load(store, previous)
             
-            with open(self.cache_path, 'rb') as f:
-                data = pickle.load(f)
-                
-                # Check version compatibility
-                cached_version = data.get('version', '0.0.0')
-                if cached_version != self.CACHE_VERSION:
-                     logger.info(f"Cache version mismatch (Found: {cached_version}, Expected: {self.CACHE_VERSION}). Invalidate.")
-                     return False
-                     
-                self.sparse_index = data['sparse_index']
-                self.doc_map = data['doc_map']
-                self.doc_ids = data['doc_ids']
+            # Keeps serving from open mappings once a reload replaces the build
+            store.pin()
+            self.store = store
+            self.doc_ids = store.doc_ids
+            self._row_of = store._row_of
+            self.doc_map = LazyLayoutMap(store)
+            self.dense_embeddings = store.array("dense")
+            self.columns = {field: store.column(field) for field in store.manifest.get("columns", [])}
+            arrays = {name: store.array(name) for name in store.manifest.get("arrays", [])}
+            if not LexicalMatrix.stored(arrays, prefix="lexical"):
+                logger.info("Index has no lexical weights or postings. Re-indexing.")
+                return self._abandon_load(store, previous)
+            # The shard workers hold the lexical and filter indexes: a sharded
+            # coordinator loads them only if needed (_ensure_indexes)
+            self.lexical_index = self.filter_index = None
+            if Config.SHARDS <= 1:
+                self._ensure_indexes()
+            self.colbert_index = ColbertVectors.from_arrays(arrays, prefix="colbert") if Config.COLBERT_RERANK else None
+            if Config.COLBERT_RERANK and self.colbert_index is None:
+                logger.info("ColBERT rerank enabled but index has no token vectors. Re-indexing.")
+                return self._abandon_load(store, previous)
             return True
         except Exception as e:
             logger.error(f"Failed to load cache: {e}")
-            return False 
+            return self._abandon_load(store, previous)
+
+    def _abandon_load(self, store: Optional[IndexStore], previous: Dict[str, Any]) -> bool:
+        """Unmap a store that won't be served and put the attributes back (always False)."""
+        if store is not None:
+            store.close()
+        for name, value in previous.items():
+            setattr(self, name, value)
+        return False
+
+    def _ensure_indexes(self) -> None:
+        """Load the stored lexical and filter indexes if not loaded yet (in-process search)."""
+        if self.store is None:
+            return
+        with self._index_lock:
+            if self.lexical_index is not None and self.filter_index is not None:
+                return
+            arrays = {name: self.store.array(name) for name in self.store.manifest.get("arrays", [])}
+            self.lexical_index = LexicalMatrix.from_arrays(arrays, prefix="lexical")
+            self.filter_index = BitmapFilterIndex.from_arrays(arrays, self.columns.keys(), len(self.store)) \
+                or BitmapFilterIndex.from_columns(self.columns)
 
     def _format_layout_text(self, item: Dict[str, Any]) -> str:
         text_parts = [
@@ -462,11 +612,14 @@ class ChromaHybridRetriever:
                 "layout_ratio": layout_ratio
             })
 
+        self.columns = metadata_columns([self.doc_map[doc_id] for doc_id in self.doc_ids])
+        self.filter_index = BitmapFilterIndex.from_columns(self.columns)
+        self._row_of = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
         print("Generating Embeddings...")
-        output = self.model.encode(doc_texts, return_dense=True, return_sparse=True, return_colbert_vecs=False)
-        
-        dense_embeddings = output['dense_vecs']
-        lexical_weights = output['lexical_weights']
+        dense_embeddings, lexical_weights, colbert_vecs = self._encode_documents(doc_texts)
+        self.dense_embeddings = np.asarray(dense_embeddings, dtype=np.float32)
+        self.colbert_index = ColbertVectors.from_vectors(colbert_vecs) if Config.COLBERT_RERANK else None
 
         print("Upserting to ChromaDB...")
         self.collection.upsert(
@@ -476,16 +629,58 @@ class ChromaHybridRetriever:
             documents=doc_texts
         )
 
-        print("Updating Memory Sparse Index...")
-        for doc_id, sparse_vec in zip(self.doc_ids, lexical_weights):
-            self.sparse_index[doc_id] = sparse_vec
+        print("Building CSR Lexical Index...")
+        self.lexical_index = LexicalMatrix.from_weights(list(lexical_weights), dtype=np.dtype(Config.LEXICAL_WEIGHT_DTYPE))
             
         print("Indexing Complete.")
         
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Per-text BGE-M3 token counts (truncated at MAX_LENGTH)."""
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            return [min(estimate_tokens(t), Config.MAX_LENGTH) for t in texts]
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=Config.MAX_LENGTH)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def _encode_documents(self, doc_texts: List[str]) -> Tuple[List[np.ndarray], List[Dict[str, float]], List[Optional[np.ndarray]]]:
+        """
+        Encode layout texts in length-bucketed batches.
+        Each batch holds texts of similar token length under a padded-token
+        budget, so short layouts are not padded to the longest OCR dump.
+        ColBERT token vectors are only produced when COLBERT_RERANK is on.
+        """
+        def encode(batch: List[str]) -> List[Tuple[np.ndarray, Dict[str, float], Optional[np.ndarray]]]:
+            output = self.model.encode(
+                batch,
+                batch_size=len(batch),
+                max_length=Config.MAX_LENGTH,
+                return_dense=True,
+                return_sparse=True,
+                return_colbert_vecs=Config.COLBERT_RERANK
+            )
+            colbert = output['colbert_vecs'] if Config.COLBERT_RERANK else [None] * len(batch)
+            return list(zip(output['dense_vecs'], output['lexical_weights'], colbert))
+
+        encoded, self.index_stats = encode_batches(
+            encode,
+            doc_texts,
+            self._token_lengths(doc_texts),
+            max_tokens=Config.INDEX_BATCH_TOKENS,
+            max_batch_size=Config.INDEX_BATCH_MAX_DOCS,
+            workers=Config.INDEX_WORKERS,
+            padded=True,
+            label="BGE-M3 encoding"
+        )
+        return [e[0] for e in encoded], [e[1] for e in encoded], [e[2] for e in encoded]
+
     def get_layout(self, doc_id: str) -> Dict[str, Any]:
         """Retrieve raw layout data by ID."""
         return self.doc_map.get(doc_id)
 
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean candidate mask for equality filters (ANDs over the precomputed bitsets)."""
+        return self.filter_index.mask(filters)
+
     def compute_rrf(self, dense_results: List[str], sparse_results: List[str], k: int = 60) -> List[Tuple[str, float]]:
         scores = defaultdict(float)
         for rank, doc_id in enumerate(dense_results):
@@ -497,82 +692,165 @@ class ChromaHybridRetriever:
     def search(self, query: str, filters: Dict[str, Any] = None, top_k: int = 5) -> List[Dict[str, Any]]:
         print(f"Searching: {query} | Filters: {filters}")
         
-        q_output = self.model.encode([query], return_dense=True, return_sparse=True)
-        q_dense = q_output['dense_vecs'][0]
-        q_sparse = q_output['lexical_weights'][0]
-
-        # 1. Dense Search (with Chroma Filtering)
         if len(self.doc_ids) == 0:
              return []
 
-        candidate_k = min(50, len(self.doc_ids))
-        
-        # Prepare Chroma Where clause
-        chroma_where = {}
-        if filters:
-            # We only support exact match for now in this simple implementation
-            # Chroma requires specific format. 
-            # If multiple filters, use $and.
-            conditions = []
-            for k, v in filters.items():
-                conditions.append({k: {"$eq": v}})
-            
-            if len(conditions) > 1:
-                chroma_where = {"$and": conditions}
-            elif len(conditions) == 1:
-                chroma_where = conditions[0]
-
-        dense_out = self.collection.query(
-            query_embeddings=[q_dense.tolist()],
-            n_results=candidate_k,
-            where=chroma_where if chroma_where else None
-        )
-        dense_ids = dense_out['ids'][0] if dense_out['ids'] else []
-
-        # 2. Sparse Search (Manual Filtering)
-        sparse_scores = []
-        for doc_id, doc_sparse in self.sparse_index.items():
-            # Filter check
-            if filters:
-                item = self.doc_map.get(doc_id)
-                if not item: continue
-                match = True
-                for k, v in filters.items():
-                    if item.get(k) != v:
-                        match = False
-                        break
-                if not match:
-                    continue
-            
-            score = self.model.compute_lexical_matching_score(doc_sparse, q_sparse)
-            sparse_scores.append((doc_id, score))
-        
-        sparse_scores.sort(key=lambda x: x[1], reverse=True)
-        sparse_ids = [x[0] for x in sparse_scores[:candidate_k]]
+        # Dense + sparse scoring in memory; filters resolve to one bitmap mask
+        return self._search_encoded(self._encode_queries([query]), [filters], top_k)[0]
 
-        # 3. RRF
-        rrf_ranks = self.compute_rrf(dense_ids, sparse_ids)
-        
+    def _colbert_rerank(self, q_colbert: Optional[np.ndarray], rrf_ranks: List[Tuple[str, float]]) -> Tuple[List[Tuple[str, float]], Dict[str, float]]:
+        """
+        Late-interaction rerank of the RRF top-N with memory-mapped token vectors.
+        Candidates are scored best-first within COLBERT_BUDGET_MS; whatever
+        the budget leaves unscored keeps its RRF order.
+        """
+        if q_colbert is None or self.colbert_index is None or not rrf_ranks:
+            return rrf_ranks, {}
+
+        head = rrf_ranks[:Config.COLBERT_TOP_N]
+        rows = [self._row_of[doc_id] for doc_id, _ in head]
+        ordered, scores = self.colbert_index.rerank(q_colbert, rows, budget_ms=Config.COLBERT_BUDGET_MS)
+        if len(scores) < len(rows):
+            logger.info(f"ColBERT budget reached: scored {len(scores)}/{len(rows)} candidates")
+
+        rrf_of = dict(head)
+        reranked = [(self.doc_ids[row], rrf_of[self.doc_ids[row]]) for row in ordered]
+        return reranked + rrf_ranks[len(head):], {self.doc_ids[row]: score for row, score in scores.items()}
+
+    def _format_results(self, rrf_ranks: List[Tuple[str, float]], top_k: int, colbert_scores: Dict[str, float] = None) -> List[Dict[str, Any]]:
         results = []
         for doc_id, score in rrf_ranks[:top_k]:
             doc_data = self.doc_map.get(doc_id)
             if doc_data:
-                results.append({
+                result = {
                     "image_id": doc_id,
                     "rrf_score": score,
                     "category": doc_data.get('category'),
                     "mood": doc_data.get('mood'),
                     "type": doc_data.get('type')
-                })
+                }
+                if colbert_scores and doc_id in colbert_scores:
+                    result["colbert_score"] = round(colbert_scores[doc_id], 4)
+                results.append(result)
         return results
 
+    def search_many(self, queries: List[str], filters_list: List[Dict[str, Any]] = None, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Batched hybrid search: one encode call for all queries, dense scores as
+        one matrix-matrix product over the stored dense vectors, lexical scores
+        as one sparse matrix-matrix product, then RRF per query.
+        """
+        if not queries:
+            return []
+        filters_list = filters_list or [None] * len(queries)
+        if len(self.doc_ids) == 0:
+            return [[] for _ in queries]
+
+        print(f"Batch searching {len(queries)} queries")
+        return self._search_encoded(self._encode_queries(queries), filters_list, top_k)
+
+    async def asearch_many(self, queries: List[str], filters_list: List[Dict[str, Any]] = None, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Async search_many: queries are encoded through the shared micro-batching
+        encoder (one forward pass for concurrent requests), scoring runs off the event loop.
+        """
+        if not queries:
+            return []
+        filters_list = filters_list or [None] * len(queries)
+        if len(self.doc_ids) == 0:
+            return [[] for _ in queries]
+
+        encoded = await self.query_encoder.encode_many(queries)
+        return await asyncio.to_thread(self._search_encoded, encoded, filters_list, top_k)
+
+    def _encode_queries(self, queries: List[str]) -> List[Tuple[np.ndarray, Dict[str, float], Optional[np.ndarray]]]:
+        """
+        One encode call for a batch of queries -> (dense vector, lexical weights,
+        ColBERT token vectors or None) per query.
+        """
+        use_colbert = self.colbert_index is not None
+        q_output = self.model.encode(queries, return_dense=True, return_sparse=True, return_colbert_vecs=use_colbert)
+        colbert = q_output['colbert_vecs'] if use_colbert else [None] * len(queries)
+        return list(zip(q_output['dense_vecs'], q_output['lexical_weights'], colbert))
+
+    def _search_encoded(self, encoded: List[Tuple[np.ndarray, Dict[str, float], Optional[np.ndarray]]], filters_list: List[Dict[str, Any]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """search_many scoring with precomputed query encodings."""
+        candidate_k = min(50, len(self.doc_ids))
+        if self.shards is not None:
+            try:
+                dense_hits, sparse_hits = self.shards.search(
+                    np.asarray([e[0] for e in encoded], dtype=np.float32),
+                    [e[1] for e in encoded], filters_list, candidate_k
+                )
+                outputs = []
+                for i in range(len(encoded)):
+                    rrf_ranks = self.compute_rrf([h[0] for h in dense_hits[i]], [h[0] for h in sparse_hits[i]])
+                    rrf_ranks, colbert_scores = self._colbert_rerank(encoded[i][2], rrf_ranks)
+                    outputs.append(self._format_results(rrf_ranks, top_k, colbert_scores))
+                return outputs
+            except RuntimeError as e:
+                logger.warning(f"Sharded search failed ({e}). Searching in-process.")
+                self._ensure_indexes()
+
+        masks = [self._filter_mask(filters) if filters else None for filters in filters_list]
+
+        # 1. Dense (inner product of normalized vectors ranks like Chroma's L2)
+        dense_scores = np.asarray([e[0] for e in encoded], dtype=np.float32) @ np.asarray(self.dense_embeddings).T
+
+        # 2. Sparse
+        sparse_rows = self.lexical_index.top_k_batch([e[1] for e in encoded], candidate_k, masks)
+
+        outputs = []
+        for i, mask in enumerate(masks):
+            row = dense_scores[i] if mask is None else np.where(mask, dense_scores[i], -np.inf)
+            n_dense = min(candidate_k, int(np.isfinite(row).sum()))
+            dense_rows = np.argsort(-row, kind="stable")[:n_dense]
+            rrf_ranks = self.compute_rrf(
+                [self.doc_ids[r] for r in dense_rows],
+                [self.doc_ids[r] for r in sparse_rows[i]]
+            )
+            # 3. Optional ColBERT rerank of the fused top-N
+            rrf_ranks, colbert_scores = self._colbert_rerank(encoded[i][2], rrf_ranks)
+            outputs.append(self._format_results(rrf_ranks, top_k, colbert_scores))
+        return outputs
+
 
 
 # Global instance placeholders
 analyzer = None
 retriever = None
+live_retriever: LiveSnapshot = None  # Swapped atomically by reload_index()
+reloader: BackgroundReloader = None
 
 def setup_rag():
-    global analyzer, retriever
-    analyzer = GeminiAnalyzer()
-    retriever = ChromaHybridRetriever()
+    global analyzer, retriever, live_retriever, reloader
+    with startup_phase("GeminiAnalyzer"):
+        analyzer = GeminiAnalyzer()
+    with startup_phase("ChromaHybridRetriever"):
+        retriever = ChromaHybridRetriever()
+    live_retriever = LiveSnapshot(retriever, release=lambda old: old.close(remove_files=True))
+    reloader = BackgroundReloader(_build_retriever, live_retriever, name="bge-reload")
+
+def _build_retriever(rebuild: bool = False) -> ChromaHybridRetriever:
+    global retriever
+    # The encoder doesn't depend on the index: share it instead of loading a second copy
+    new_retriever = ChromaHybridRetriever(rebuild=rebuild, model=live_retriever.current.model)
+    retriever = new_retriever
+    return new_retriever
+
+def acquire_retriever():
+    """Lease the serving retriever: `with acquire_retriever() as r: r.search(...)`."""
+    return live_retriever.acquire()
+
+def index_loaded() -> bool:
+    """Whether a retriever with a non-empty index is serving."""
+    current = live_retriever.current if live_retriever else None
+    return current is not None and bool(getattr(current, "doc_ids", None))
+
+def provider_endpoints() -> Dict[str, str]:
+    """Endpoints /readyz checks for reachability (embeddings are local here)."""
+    return {"gemini": "generativelanguage.googleapis.com"}
+
+def reload_index(rebuild: bool = False) -> bool:
+    """Rebuild the retriever in the background and swap it in; False if a reload is already running."""
+    return reloader.trigger(rebuild=rebuild)
@@ -7,9 +7,10 @@ Changed: Voyage-3.5 + Dense Only (Dot Product / Inner Product)
 
 import os
 import json
-import chromadb
-import google.generativeai as genai
-from typing import List, Dict, Any, Tuple
+import time
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict
 from dotenv import load_dotenv
 import numpy as np
@@ -17,9 +18,23 @@ import numpy as np
 # Load environment variables
 load_dotenv()
 
+from index_store import IndexStore, LazyLayoutMap, metadata_columns
+from filter_index import BitmapFilterIndex
+from layout_geometry import LayoutGeometryIndex, layout_grid, sketch_grid, CHANNELS as GEOMETRY_CHANNELS
+import vector_index
+from query_batcher import MicroBatchEncoder
+from batch_indexer import encode_batches, estimate_tokens
+from recommendation_table import RecommendationTable, GENERIC_DESCRIPTIONS
+from sharded_retriever import ShardedRetriever
+from hot_reload import LiveSnapshot, BackgroundReloader
+from startup_profiler import phase as startup_phase
+from analysis_cache import AnalysisCache, analysis_key
+from providers import GeminiProvider, VoyageProvider
+from singleflight import SingleFlight, fingerprint
+from local_analyzer import LocalAnalyzer
+
 # Configure Logging
 import logging
-import pickle
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -28,10 +43,60 @@ class Config:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
     VOYAGE_API_KEY = os.getenv("VOY_API_KEY")  # Voyage API Key
     CHROMA_DB_PATH = "./chroma_db_voyage"  # Separate DB for Voyage embeddings
-    COLLECTION_NAME = "magazine_layouts_voyage"
+    INDEX_PATH = "./index_voyage"  # Memory-mapped index artifact (see index_store.py)
     DATASET_PATH = "./datas/final_final_dataset.json"
     VOYAGE_MODEL = "voyage-3.5"  # Model selection
-    VOYAGE_DIMENSIONS = 512  # Dimension (256, 512, 1024, 2048 available)
+    # Stored dimension (256, 512, 1024, 2048 available). Use 1024/2048 with the matryoshka mode.
+    VOYAGE_DIMENSIONS = int(os.getenv("VOYAGE_DIMENSIONS", "512"))
+    # Chroma collections are fixed-dimension, so non-default dims get their own collection
+    COLLECTION_NAME = "magazine_layouts_voyage" if VOYAGE_DIMENSIONS == 512 else f"magazine_layouts_voyage_{VOYAGE_DIMENSIONS}"
+    COLLECTION_METRIC = "ip"  # Inner Product (Dot Product) similarity; part of the index version
+    VECTOR_INDEX_MODE = os.getenv("VOYAGE_INDEX_MODE", "exact")  # exact | int8 | binary | matryoshka (see vector_index.py)
+    RESCORE_CANDIDATES = int(os.getenv("VOYAGE_RESCORE_CANDIDATES", "100"))  # Full-precision rescoring shortlist
+    MATRYOSHKA_PREFIX_DIM = int(os.getenv("VOYAGE_PREFIX_DIM", "256"))  # Coarse stage dimension (128 / 256)
+    # Micro-batching of concurrent query embeddings (see query_batcher.py)
+    QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+    # Index build: token-budgeted embed requests (see batch_indexer.py)
+    INDEX_BATCH_TOKENS = int(os.getenv("VOYAGE_INDEX_BATCH_TOKENS", "100000"))  # API limit: 320K tokens / request
+    INDEX_BATCH_MAX_DOCS = int(os.getenv("VOYAGE_INDEX_BATCH_MAX_DOCS", "128"))  # API limit: 1000 texts / request
+    INDEX_WORKERS = int(os.getenv("VOYAGE_INDEX_WORKERS", "4"))  # Concurrent embed requests
+    # Precomputed results per (type, image_count, mood, category) (scripts/build_recommendation_table.py)
+    RECOMMENDATION_TABLE_PATH = os.getenv("RECOMMENDATION_TABLE_PATH", os.path.join(INDEX_PATH, "recommendations.json"))
+    # 0 (default): the table answers only analyses with an empty/generic description;
+    # 1: from (type, image_count, mood, category) alone, ignoring the description (no embedding call)
+    RECOMMENDATION_IGNORE_DESCRIPTION = os.getenv("RECOMMENDATION_IGNORE_DESCRIPTION", "0") == "1"
+    # Scatter-gather over N local worker processes (see sharded_retriever.py); 0 = single process
+    SHARDS = int(os.getenv("VOYAGE_SHARDS", "0"))
+    SHARD_TIMEOUT_MS = float(os.getenv("VOYAGE_SHARD_TIMEOUT_MS", "500"))  # Slower shards are left out of the answer
+    SHARD_PATH = os.path.join(INDEX_PATH, "shards")
+    # Persistent analyze_page results (see analysis_cache.py); empty path disables
+    ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "./cache/analysis_cache.sqlite")
+    ANALYSIS_CACHE_TTL_S = float(os.getenv("ANALYSIS_CACHE_TTL_S", str(7 * 24 * 3600)))
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000"))
+    # Vision payload: images go to Gemini as JPEG thumbnails (see ImageValidator.prepare_vision_input)
+    VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "768"))  # Longest edge in px; 0 = original size
+    VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+    # Provider clients (see providers.py): jittered exponential backoff, optional hedged requests
+    PROVIDER_MAX_ATTEMPTS = int(os.getenv("PROVIDER_MAX_ATTEMPTS", "3"))
+    PROVIDER_BACKOFF_S = float(os.getenv("PROVIDER_BACKOFF_S", "0.5"))
+    PROVIDER_BACKOFF_MAX_S = float(os.getenv("PROVIDER_BACKOFF_MAX_S", "8"))
+    GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")  # e.g. a proxy or local fake server
+    GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "60"))
+    GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "off")  # off | p95 | <ms>; a hedge pays for the vision call twice
+    VOYAGE_BASE_URL = os.getenv("VOYAGE_BASE_URL", "https://api.voyageai.com/v1")
+    VOYAGE_TIMEOUT_S = float(os.getenv("VOYAGE_TIMEOUT_S", "30"))
+    VOYAGE_MAX_CONNECTIONS = int(os.getenv("VOYAGE_MAX_CONNECTIONS", "16"))
+    VOYAGE_HEDGE = os.getenv("VOYAGE_HEDGE", "p95")  # Query embeddings are cheap to duplicate
+    # analyze_page tier (see local_analyzer.py): gemini | fast (local heuristics only) |
+    # auto (Gemini within ANALYZER_BUDGET_MS, local heuristics when it misses the budget or fails)
+    ANALYZER_MODE = os.getenv("ANALYZER_MODE", "gemini")
+    ANALYZER_BUDGET_MS = float(os.getenv("ANALYZER_BUDGET_MS", "6000"))
+    # Start each page's search from the local guess while Gemini runs (see speculation.py)
+    SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+    # /readyz (see readiness.py): provider endpoints are TCP-probed, results reused for READINESS_PROBE_TTL_S
+    READINESS_PROBE_TTL_S = float(os.getenv("READINESS_PROBE_TTL_S", "10"))
+    READINESS_PROBE_TIMEOUT_S = float(os.getenv("READINESS_PROBE_TIMEOUT_S", "2"))
 
     @staticmethod
     def validate():
@@ -41,16 +106,176 @@ class Config:
             raise ValueError("VOY_API_KEY not found in .env file")
 
 
+# Returned when analysis fails after retries (never cached)
+FALLBACK_ANALYSIS = {
+    "mood": "General",
+    "category": "General",
+    "type": "Balanced",
+    "description": "Standard layout",
+    "visual_keywords": []
+}
+
+
+def image_attributes(reported: Any, images: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Per-image attributes from the model, one entry per image in upload order.
+    Orientation comes from the pixels, not the model; missing or malformed
+    entries get an empty subject and neutral salience.
+    """
+    from image_validator import image_validator
+
+    items = [item for item in (reported if isinstance(reported, list) else []) if isinstance(item, dict)]
+    # Explicit indices win; entries without one fill their list position
+    by_index = {item["index"]: item for item in items if isinstance(item.get("index"), int)}
+    for position, item in enumerate(items):
+        if not isinstance(item.get("index"), int):
+            by_index.setdefault(position, item)
+
+    attributes = []
+    for i, img in enumerate(images or []):
+        item = by_index.get(i, {})
+        try:
+            salience = min(1.0, max(0.0, float(item.get("salience", 0.5))))
+        except (TypeError, ValueError):
+            salience = 0.5
+        attributes.append({
+            "index": i,
+            "subject": str(item.get("subject", "") or ""),
+            "salience": round(salience, 2),
+            "orientation": image_validator._get_orientation(*img.size),
+        })
+    return attributes
+
+
+def provider_policy(hedge: str) -> Dict[str, Any]:
+    """Retry/hedge settings shared by the provider clients (see providers.py)."""
+    return {
+        "max_attempts": Config.PROVIDER_MAX_ATTEMPTS,
+        "base_delay_s": Config.PROVIDER_BACKOFF_S,
+        "max_delay_s": Config.PROVIDER_BACKOFF_MAX_S,
+        "hedge": hedge,
+    }
+
+
 class GeminiAnalyzer:
     """Same as original - Uses Gemini for content analysis"""
+    # Bump whenever the analyze_page prompt changes (invalidates cached analyses)
+    PROMPT_VERSION = "2"
+
     def __init__(self):
+        import google.generativeai as genai  # Heavy: loaded with the first analyzer, not at import
+        
         Config.validate()
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
+        if Config.GEMINI_API_ENDPOINT:
+            genai.configure(api_key=Config.GOOGLE_API_KEY, client_options={"api_endpoint": Config.GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=Config.GOOGLE_API_KEY)
         self.model_name = 'gemini-2.5-flash'
         self.model = genai.GenerativeModel(self.model_name)
+        self.provider = GeminiProvider(
+            self.model, request_timeout_s=Config.GEMINI_TIMEOUT_S, **provider_policy(Config.GEMINI_HEDGE)
+        )
+        self.analysis_cache: AnalysisCache = None
+        if Config.ANALYSIS_CACHE_PATH:
+            try:
+                self.analysis_cache = AnalysisCache(
+                    Config.ANALYSIS_CACHE_PATH,
+                    ttl_s=Config.ANALYSIS_CACHE_TTL_S,
+                    max_entries=Config.ANALYSIS_CACHE_MAX_ENTRIES
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Analysis cache unavailable ({e}). Every page will call Gemini.")
+        # Concurrent identical pages (double-clicked Generate) share one Gemini call
+        self.inflight = SingleFlight("analyze_page")
+        # Heuristic tier: ANALYZER_MODE=fast, or the auto mode's answer past the latency budget
+        self.mode = Config.ANALYZER_MODE
+        self.local = LocalAnalyzer()
+        self._tier_counts = defaultdict(int)
+        # Payload size / latency / token usage of analyze_page calls, for tuning VISION_MAX_EDGE
+        self._vision_lock = threading.Lock()
+        self._vision_totals = defaultdict(float)
+        self._vision_last: Dict[str, Any] = {}
 
-    def analyze_page(self, images: List[Any], title: str, body: str) -> Dict[str, str]:
-        """Analyze a single page's content (Images + Text) to extract metadata."""
+    def _analysis_version(self) -> str:
+        # The thumbnail size changes what the model sees, so it is part of the cache key
+        return f"{self.PROMPT_VERSION}|{self.model_name}|{Config.VISION_MAX_EDGE}"
+
+    def _vision_parts(self, images: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Images as compact JPEG blobs, plus what was sent."""
+        from image_validator import image_validator
+        
+        start = time.perf_counter()
+        parts, sent = [], {"images": len(images), "request_bytes": 0, "pixels": 0, "sizes": []}
+        for img in images:
+            data, info = image_validator.prepare_vision_input(
+                img, max_edge=Config.VISION_MAX_EDGE, quality=Config.VISION_JPEG_QUALITY
+            )
+            parts.append({"mime_type": "image/jpeg", "data": data})
+            sent["request_bytes"] += info["bytes"]
+            sent["pixels"] += info["size"][0] * info["size"][1]
+            sent["sizes"].append(f"{info['original_size'][0]}x{info['original_size'][1]}->{info['size'][0]}x{info['size'][1]}")
+        sent["prepare_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return parts, sent
+
+    def _record_vision_call(self, sent: Dict[str, Any], call_ms: float, response: Any) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        record = {
+            **sent,
+            "call_ms": round(call_ms, 1),  # Upload + model time (the SDK doesn't split them)
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+        }
+        with self._vision_lock:
+            self._vision_totals["calls"] += 1
+            for field in ("images", "request_bytes", "prepare_ms", "call_ms", "prompt_tokens", "output_tokens", "total_tokens"):
+                self._vision_totals[field] += record[field]
+            self._vision_last = record
+        print(f"   📦 Vision payload: {record['images']} image(s), {record['request_bytes'] / 1024:.0f} KB, "
+              f"{record['call_ms']:.0f} ms, {record['prompt_tokens']} prompt tokens")
+
+    def vision_stats(self) -> Dict[str, Any]:
+        """Totals and per-call means of analyze_page vision calls."""
+        with self._vision_lock:
+            totals = dict(self._vision_totals)
+            last = dict(self._vision_last)
+        calls = totals.get("calls", 0)
+        means = {f"mean_{k}": round(v / calls, 1) for k, v in totals.items() if k != "calls"} if calls else {}
+        return {
+            "max_edge": Config.VISION_MAX_EDGE,
+            "jpeg_quality": Config.VISION_JPEG_QUALITY,
+            "calls": int(calls),
+            **means,
+            "last": last,
+        }
+
+    def analyzer_stats(self) -> Dict[str, Any]:
+        """
+        Which tier answered analyze_page calls: gemini (a fresh Gemini answer),
+        gemini_cached (a cached Gemini answer), local_<reason>, or fallback
+        (the fixed default after a Gemini error outside auto mode).
+        """
+        return {
+            "mode": self.mode,
+            "budget_ms": Config.ANALYZER_BUDGET_MS if self.mode == "auto" else None,
+            **dict(self._tier_counts),
+            "local": self.local.stats(),
+        }
+
+    def _local_analysis(self, images: List[Any], title: str, body: str, reason: str) -> Dict[str, Any]:
+        self._tier_counts[f"local_{reason}"] += 1
+        analysis = self.local.analyze_page(images, title, body)
+        print(f"   ⚡ Local analysis ({reason}): {analysis['mood']} / {analysis['category']}")
+        return analysis
+
+    def _fallback_analysis(self, images: List[Any], title: str, body: str) -> Dict[str, Any]:
+        """Answer when Gemini fails: local heuristics in auto mode, the fixed default otherwise."""
+        if self.mode == "auto":
+            return self._local_analysis(images, title, body, "error")
+        self._tier_counts["fallback"] += 1
+        return dict(FALLBACK_ANALYSIS, visual_keywords=[])
+
+    def _analysis_prompt(self, title: str, body: str) -> str:
         prompt = f"""
         You are an expert design assistant. Analyze these images and the provided text content for a magazine layout.
         
@@ -63,6 +288,10 @@ class GeminiAnalyzer:
         3. Type (e.g., Image-heavy, Text-heavy, Balanced, Collage)
         4. Description (A short visual description of the ideal layout style)
         5. Visual Keywords (List of 3-5 key visual elements/colors/objects found in the images)
+        6. Images: for each image, in the order given (index 0 = first image):
+           - subject: what the image shows, in a few words
+           - salience: 0.0-1.0, how strong it is as the page's hero image
+             (expressive faces, eye contact, dramatic composition score high)
 
         Return the result strictly in JSON format:
         {{
@@ -70,27 +299,108 @@ class GeminiAnalyzer:
             "category": "...",
             "type": "...",
             "description": "...",
-            "visual_keywords": ["...", "..."]
+            "visual_keywords": ["...", "..."],
+            "images": [{{"index": 0, "subject": "...", "salience": 0.8}}]
         }}
         """
+        return prompt
+
+    def _analysis_key(self, images: List[Any], title: str, body: str) -> str:
+        return analysis_key(images, title, body, self._analysis_version())
+
+    def _cached_analysis(self, cache_key: str) -> Optional[Dict[str, str]]:
+        if self.analysis_cache is None:
+            return None
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            print("   💾 Analysis cache hit")
+        return cached
+
+    def _analysis_inputs(self, images: List[Any], title: str, body: str) -> Tuple[List[Any], Dict[str, Any]]:
+        prompt = self._analysis_prompt(title, body)
+        # Thumbnails instead of full-resolution uploads
+        parts, sent = self._vision_parts(images or [])
+        sent["request_bytes"] += len(prompt.encode("utf-8"))
+        return [prompt] + parts, sent
+
+    def _parse_analysis(self, response: Any, cache_key: str, images: List[Any]) -> Dict[str, Any]:
+        text = response.text.replace("```json", "").replace("```", "").strip()
+        analysis = json.loads(text)
+        if isinstance(analysis, dict):
+            analysis["images"] = image_attributes(analysis.get("images"), images)
+        # Only successful parses are cached, never the fallback
+        if self.analysis_cache is not None and isinstance(analysis, dict):
+            self.analysis_cache.put(cache_key, analysis)
+        return analysis
+
+    def analyze_page(self, images: List[Any], title: str, body: str) -> Dict[str, str]:
+        """Analyze a single page's content (Images + Text) to extract metadata."""
+        if self.mode == "fast":
+            return self._local_analysis(images, title, body, "fast")
+        cache_key = self._analysis_key(images, title, body)
+        cached = self._cached_analysis(cache_key)
+        if cached is not None:
+            self._tier_counts["gemini_cached"] += 1
+            return cached
         
         try:
-            inputs = [prompt]
-            if images:
-                inputs.extend(images)
-                
-            response = self.model.generate_content(inputs)
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(text)
+            inputs, sent = self._analysis_inputs(images, title, body)
+            start = time.perf_counter()
+            response = self.provider.generate_sync(inputs)
+            self._record_vision_call(sent, (time.perf_counter() - start) * 1000, response)
+            analysis = self._parse_analysis(response, cache_key, images)
+            self._tier_counts["gemini"] += 1
+            return analysis
         except Exception as e:
             print(f"Gemini Analysis Error: {e}")
-            return {
-                "mood": "General",
-                "category": "General",
-                "type": "Balanced",
-                "description": "Standard layout",
-                "visual_keywords": []
-            }
+            return self._fallback_analysis(images, title, body)
+
+    async def aanalyze_page(self, images: List[Any], title: str, body: str) -> Dict[str, str]:
+        """
+        Async analyze_page for the API path: Gemini's async client with
+        retries (and hedging if configured); image hashing/encoding runs off the event loop.
+        Identical concurrent calls (same images and text) share one analysis.
+
+        ANALYZER_MODE=fast answers from local heuristics only. In auto mode a
+        Gemini call that misses ANALYZER_BUDGET_MS is answered locally; the call
+        keeps running and fills the analysis cache for the next request.
+        """
+        if self.mode == "fast":
+            return await asyncio.to_thread(self._local_analysis, images, title, body, "fast")
+
+        cache_key = await asyncio.to_thread(self._analysis_key, images, title, body)
+        gemini = asyncio.ensure_future(
+            self.inflight.do(cache_key, lambda: self._aanalyze_page(images, title, body, cache_key))
+        )
+        # An auto-mode call that fails after the budget has no awaiter left: retrieve its error
+        gemini.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if self.mode == "auto":
+            done, _ = await asyncio.wait({gemini}, timeout=Config.ANALYZER_BUDGET_MS / 1000.0)
+            if not done:
+                print(f"   ⏱️ Gemini over the {Config.ANALYZER_BUDGET_MS:.0f} ms budget, answering locally")
+                return await asyncio.to_thread(self._local_analysis, images, title, body, "budget")
+        try:
+            analysis, tier = await gemini
+        except Exception as e:
+            print(f"Gemini Analysis Error: {e}")
+            return await asyncio.to_thread(self._fallback_analysis, images, title, body)
+        # Counted per caller, so requests sharing one in-flight call each count
+        self._tier_counts[tier] += 1
+        return analysis
+
+    async def _aanalyze_page(
+        self, images: List[Any], title: str, body: str, cache_key: str
+    ) -> Tuple[Dict[str, str], str]:
+        """(analysis, tier) from the cache or Gemini; errors propagate to every waiting caller."""
+        cached = await asyncio.to_thread(self._cached_analysis, cache_key)
+        if cached is not None:
+            return cached, "gemini_cached"
+        
+        inputs, sent = await asyncio.to_thread(self._analysis_inputs, images, title, body)
+        start = time.perf_counter()
+        response = await self.provider.generate(inputs)
+        self._record_vision_call(sent, (time.perf_counter() - start) * 1000, response)
+        return self._parse_analysis(response, cache_key, images), "gemini"
 
     async def aura_render(self, layout_data: Dict[str, Any], user_content: Dict[str, Any]) -> str:
         """
@@ -106,6 +416,7 @@ class GeminiAnalyzer:
         # 🖼️ Image validation and processing
         raw_images = user_content.get('images', [])
         user_images = []
+        decoded_images = []  # For the page palette
         
         image_count = len(raw_images)
         if image_count == 1:
@@ -131,6 +442,7 @@ class GeminiAnalyzer:
                     base64_data = img_b64
                 image_bytes = b64.b64decode(base64_data)
                 temp_img = Image.open(io.BytesIO(image_bytes))
+                decoded_images.append(temp_img)
                 orig_width, orig_height = temp_img.size
                 
                 aspect_ratio = orig_width / orig_height
@@ -165,10 +477,19 @@ class GeminiAnalyzer:
         
         placeholders = [f"__IMAGE_{i}__" for i in range(len(user_images))]
         
+        # 🎨 Deterministic palette + accent from the images (instead of asking the LLM to pick colors)
+        try:
+            palette = await asyncio.to_thread(image_validator.extract_palette, decoded_images)
+        except Exception as e:
+            print(f"  ⚠️ Palette extraction failed: {e}")
+            palette = {"palette": [], "shares": [], "accent": None}
+        if palette["palette"]:
+            print(f"  🎨 Palette: {', '.join(palette['palette'])} (accent {palette['accent']})")
+        
         vision_context = {
             "keywords": analysis.get('visual_keywords', []),
             "description": analysis.get('description', ''),
-            "dominant_colors": "Analyze from keywords",
+            "dominant_colors": palette["palette"] or "Analyze from keywords",
             "visual_style": analysis.get('mood', 'Modern')
         }
         
@@ -180,7 +501,9 @@ class GeminiAnalyzer:
             "page_type": page_layout_type,
             "visual_keywords": analysis.get('visual_keywords', []),
             "typography_style": self._suggest_typography(analysis.get('category', 'Magazine')),
-            "color_scheme": self._suggest_color_scheme(analysis.get('mood', 'Modern'))
+            "color_scheme": self._suggest_color_scheme(analysis.get('mood', 'Modern'), palette),
+            "palette": palette["palette"],
+            "accent_color": palette["accent"]
         }
         
         image_count = len(user_images)
@@ -191,6 +514,11 @@ class GeminiAnalyzer:
         else:
             layout_strategy = "Hero Image"
         
+        # Per-image subject/salience from analyze_page: lets the MCP graph skip its image analyzer LLM call
+        image_attrs = analysis.get('images') or []
+        if len(image_attrs) != len(user_images):
+            image_attrs = []
+        
         elements = layout_data.get('elements', [])
         plan_json = {
             "reference_id": layout_data.get('image_id'),
@@ -210,7 +538,8 @@ class GeminiAnalyzer:
                 layout_override=page_layout_type.upper(),
                 vision_json=json.dumps(vision_context),
                 design_json=json.dumps(design_spec),
-                plan_json=json.dumps(plan_json)
+                plan_json=json.dumps(plan_json),
+                image_attributes_json=json.dumps(image_attrs)
             )
             
             # Image Placeholder Injection
@@ -273,7 +602,7 @@ class GeminiAnalyzer:
         }
         return typography_map.get(category, "Balanced, readable")
     
-    def _suggest_color_scheme(self, mood: str) -> str:
+    def _suggest_color_scheme(self, mood: str, palette: Dict[str, Any] = None) -> str:
         color_map = {
             "Minimalist": "Monochrome with accent",
             "Energetic": "Vibrant, high saturation",
@@ -281,7 +610,10 @@ class GeminiAnalyzer:
             "Emotional": "Warm tones",
             "Professional": "Navy, gray, white"
         }
-        return color_map.get(mood, "Balanced palette")
+        scheme = color_map.get(mood, "Balanced palette")
+        if palette and palette.get("palette"):
+            scheme += f"; image palette {', '.join(palette['palette'])}; accent {palette['accent']}"
+        return scheme
     
     def _summarize_layout(self, elements: List[Dict]) -> str:
         if not elements:
@@ -307,80 +639,250 @@ class VoyageRetriever:
     Voyage AI voyage-3.5 based retriever.
     Uses Dense Only search with Dot Product (Inner Product).
     """
-    def __init__(self):
+    def __init__(self, rebuild: bool = False):
+        """
+        Args:
+            rebuild: Re-embed the dataset even if the stored index is current
+        """
         import voyageai
         
         print(f"🚀 Initializing Voyage AI Retriever...")
         print(f"   Model: {Config.VOYAGE_MODEL}")
         print(f"   Dimensions: {Config.VOYAGE_DIMENSIONS}")
         
-        # Initialize Voyage client
+        # Initialize Voyage clients: SDK for index builds, pooled async REST for queries
         self.client = voyageai.Client(api_key=Config.VOYAGE_API_KEY)
-        
-        # Initialize ChromaDB
-        print(f"   Connecting to ChromaDB at {Config.CHROMA_DB_PATH}...")
-        self.chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DB_PATH)
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=Config.COLLECTION_NAME,
-            metadata={"hnsw:space": "ip"}  # Inner Product (Dot Product) similarity
+        self.voyage = VoyageProvider(
+            Config.VOYAGE_API_KEY,
+            base_url=Config.VOYAGE_BASE_URL,
+            max_connections=Config.VOYAGE_MAX_CONNECTIONS,
+            request_timeout_s=Config.VOYAGE_TIMEOUT_S,
+            **provider_policy(Config.VOYAGE_HEDGE)
         )
         
+        # ChromaDB connects on first use (index builds): serving from the cached index never imports it
+        self.chroma_client = None
+        self._collection = None
+        self._collection_lock = threading.Lock()
+        
         self.doc_ids: List[str] = []
         self.doc_map: Dict[str, Any] = {}
+        self.embeddings: np.ndarray = None  # (N, dim) float32, memory-mapped when loaded
+        self.columns: Dict[str, np.ndarray] = {}  # Columnar metadata for in-memory filtering
+        self.filter_index: BitmapFilterIndex = None  # Per-field, per-value bitsets over the columns
+        self.geometry_index: LayoutGeometryIndex = None  # uint8 occupancy grids of element boxes
+        self.recommendations: RecommendationTable = None  # Precomputed attribute -> results table
+        self.dense_index = None  # First-stage scorer (exact / int8 / binary)
+        self.shards: ShardedRetriever = None  # Worker processes when Config.SHARDS > 1
+        self._index_lock = threading.Lock()  # Guards on-demand loads of what a sharded coordinator skipped
+        self.store: IndexStore = None
+        self._rows: Dict[str, int] = None  # doc_id -> row when there is no store (fresh, unsaved build)
+        self._query_cache: Dict[str, List[float]] = {}  # Recent query embeddings (cascading retries)
+        self._query_cache_lock = threading.Lock()
+        self.index_stats: Dict[str, Any] = {}  # Throughput of the last index build
+        # Shared by concurrent requests: queries arriving together go out in one embed call
+        self.query_encoder = MicroBatchEncoder(
+            self._aembed_queries,
+            max_batch_size=Config.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=Config.QUERY_BATCH_MAX_WAIT_MS,
+            name="voyage-query"
+        )
+        # Identical concurrent search batches run once (per index snapshot)
+        self.inflight = SingleFlight("search")
         
         # Cache management
-        self.cache_path = "./index_cache_voyage.pkl"
+        self.cache_path = Config.INDEX_PATH
         
         import hashlib
         import inspect
         logic_source = inspect.getsource(self.index_data)
         logic_hash = hashlib.md5(logic_source.encode()).hexdigest()[:8]
         # Include distance metric in version to invalidate cache when it changes
-        distance_metric = self.collection.metadata.get('hnsw:space', 'unknown')
-        self.CACHE_VERSION = f"voyage-1.0-{distance_metric}-{logic_hash}"
+        distance_metric = Config.COLLECTION_METRIC
+        self.CACHE_VERSION = f"voyage-1.0-{distance_metric}-{Config.VOYAGE_DIMENSIONS}-{logic_hash}"
         
-        if self._load_from_cache():
+        if not rebuild and self._load_from_cache():
             logger.info(f"✅ Loaded Voyage index from cache (v{self.CACHE_VERSION}).")
         else:
             logger.info("⚡ Voyage index not found. Re-indexing...")
             self.index_data()
             self._save_to_cache()
+            # Serve from the memory-mapped artifact just written
+            if not self._load_from_cache() and self.embeddings is not None:
+                self.dense_index = vector_index.ExactIndex(self.embeddings)
+        
+        if Config.SHARDS > 1 and self.store is not None:
+            self.shards = self._start_shards()
+            if self.shards is None:
+                self._load_search_indexes(self.store)
+        
+        self.recommendations = RecommendationTable.load(Config.RECOMMENDATION_TABLE_PATH, expected_version=self.index_build_id())
+        if self.recommendations is not None:
+            logger.info(f"📋 Loaded recommendation table ({len(self.recommendations.entries)} entries).")
+
+    def close(self, remove_files: bool = False):
+        """
+        Release the index (query encoder worker, shard workers, mmaps). Called
+        when a hot reload retires this retriever, with `remove_files` so its
+        shard build is deleted once no newer retriever maps it.
+        """
+        self.query_encoder.close()
+        self.voyage.close_soon()
+        if self.shards is not None:
+            self.shards.close(remove_files=remove_files)
+        if self.store is not None:
+            self.store.close()
+
+    def index_build_id(self) -> str:
+        """Identity of the serving index build (precomputed tables are tied to it)."""
+        build = os.path.basename(self.store.path) if self.store is not None else "unsaved"
+        return f"{self.CACHE_VERSION}/{build}"
+
+    def _start_shards(self) -> ShardedRetriever:
+        """Split the stored index across Config.SHARDS worker processes (None on failure)."""
+        options = {"prefix_dim": Config.MATRYOSHKA_PREFIX_DIM} if Config.VECTOR_INDEX_MODE == "matryoshka" else {}
+        try:
+            return ShardedRetriever.for_store(
+                self.store,
+                Config.SHARD_PATH,
+                Config.SHARDS,
+                vectors_name="embeddings",
+                mode=Config.VECTOR_INDEX_MODE,
+                timeout_ms=Config.SHARD_TIMEOUT_MS,
+                **options
+            )
+        except Exception as e:
+            logger.error(f"Failed to start shards: {e}. Searching in-process.")
+            return None
 
     def _save_to_cache(self):
+        if not self.doc_ids:
+            return
         try:
-            with open(self.cache_path, 'wb') as f:
-                pickle.dump({
-                    'version': self.CACHE_VERSION,
-                    'doc_map': self.doc_map,
-                    'doc_ids': self.doc_ids
-                }, f)
+            layouts = [self.doc_map[doc_id] for doc_id in self.doc_ids]
+            IndexStore.write(
+                self.cache_path,
+                version=self.CACHE_VERSION,
+                doc_ids=self.doc_ids,
+                columns=self.columns,
+                arrays={
+                    "embeddings": self.embeddings,
+                    # Quantized copies are small, so both are always written
+                    **vector_index.build_arrays("int8", self.embeddings),
+                    **vector_index.build_arrays("binary", self.embeddings),
+                    **vector_index.build_arrays("matryoshka", self.embeddings, prefix_dim=Config.MATRYOSHKA_PREFIX_DIM),
+                    **self.filter_index.arrays("bitmap"),
+                    **self.geometry_index.arrays("geometry")
+                },
+                blobs={"layouts": layouts}
+            )
             logger.info(f"Saved Voyage index to {self.cache_path}")
         except Exception as e:
             logger.error(f"Failed to save cache: {e}")
 
+    @property
+    def collection(self):
+        """Chroma collection, connected on first use."""
+        with self._collection_lock:
+            if self._collection is None:
+                import chromadb
+                
+                print(f"   Connecting to ChromaDB at {Config.CHROMA_DB_PATH}...")
+                self.chroma_client = chromadb.PersistentClient(path=Config.CHROMA_DB_PATH)
+                self._collection = self.chroma_client.get_or_create_collection(
+                    name=Config.COLLECTION_NAME,
+                    metadata={"hnsw:space": Config.COLLECTION_METRIC}
+                )
+            return self._collection
+
+    # Attributes _load_from_cache assigns (restored when a load is abandoned)
+    _INDEX_FIELDS = ("store", "doc_ids", "_rows", "doc_map", "embeddings", "columns",
+                     "filter_index", "geometry_index", "dense_index")
+
     def _load_from_cache(self) -> bool:
-        if not os.path.exists(self.cache_path):
-            return False
+        store = None
+        previous = {name: getattr(self, name) for name in self._INDEX_FIELDS}
         try:
+            store = IndexStore.open(self.cache_path, expected_version=self.CACHE_VERSION)
+            if store is None:
+                return False
+            
             if os.path.exists(Config.DATASET_PATH):
-                if os.path.getmtime(Config.DATASET_PATH) > os.path.getmtime(self.cache_path):
+                if os.path.getmtime(Config.DATASET_PATH) > store.mtime():
                     logger.info("Dataset modified. Invalidating cache.")
-                    return False
+                    return self._abandon_load(store, previous)
             
-            with open(self.cache_path, 'rb') as f:
-                data = pickle.load(f)
-                
-                cached_version = data.get('version', '0.0.0')
-                if cached_version != self.CACHE_VERSION:
-                    logger.info(f"Cache version mismatch. Invalidate.")
-                    return False
-                
-                self.doc_map = data['doc_map']
-                self.doc_ids = data['doc_ids']
+            # Keeps serving from open mappings once a reload replaces the build
+            store.pin()
+            self.store = store
+            self.doc_ids = store.doc_ids
+            self.doc_map = LazyLayoutMap(store)
+            self.embeddings = store.array("embeddings")
+            self.columns = {field: store.column(field) for field in store.manifest.get("columns", [])}
+            if Config.SHARDS > 1:
+                # The shard workers hold the search indexes: the coordinator keeps ids,
+                # layouts and columns, and loads the rest only if needed (_ensure_indexes)
+                self.filter_index = self.geometry_index = self.dense_index = None
+            else:
+                self._load_search_indexes(store)
             return True
         except Exception as e:
             logger.error(f"Failed to load cache: {e}")
-            return False
+            return self._abandon_load(store, previous)
+
+    def _abandon_load(self, store: Optional[IndexStore], previous: Dict[str, Any]) -> bool:
+        """Unmap a store that won't be served and put the attributes back (always False)."""
+        if store is not None:
+            store.close()
+        for name, value in previous.items():
+            setattr(self, name, value)
+        return False
+
+    def _load_search_indexes(self, store: IndexStore) -> None:
+        self.filter_index = self._load_filter_index(store)
+        self.geometry_index = self._load_geometry_index(store)
+        self.dense_index = self._load_vector_index(store)
+
+    def _ensure_indexes(self, *fields: str) -> None:
+        """
+        Load search structures a sharded coordinator skipped, on first use:
+        geometry search needs filter_index and geometry_index; a search no
+        shard answered scans the memory-mapped vectors (dense_index is then an
+        exact scan, so nothing is copied into the coordinator's memory).
+        """
+        if self.store is None:
+            return
+        with self._index_lock:
+            if "filter_index" in fields and self.filter_index is None:
+                self.filter_index = self._load_filter_index(self.store)
+            if "geometry_index" in fields and self.geometry_index is None:
+                self.geometry_index = self._load_geometry_index(self.store)
+            if "dense_index" in fields and self.dense_index is None:
+                self.dense_index = vector_index.ExactIndex(self.embeddings)
+
+    def _load_geometry_index(self, store: IndexStore) -> LayoutGeometryIndex:
+        """Stored grids (memory-mapped), or rebuilt from the layouts for indexes written without them."""
+        arrays = {name: store.array(name) for name in store.manifest.get("arrays", [])}
+        return LayoutGeometryIndex.from_arrays(arrays, prefix="geometry") \
+            or LayoutGeometryIndex.build([self.doc_map[doc_id] for doc_id in self.doc_ids])
+
+    def _load_filter_index(self, store: IndexStore) -> BitmapFilterIndex:
+        """Stored bitmaps, or rebuilt from the columns for indexes written without them."""
+        arrays = {name: store.array(name) for name in store.manifest.get("arrays", [])}
+        index = BitmapFilterIndex.from_arrays(arrays, self.columns.keys(), len(store))
+        return index if index is not None else BitmapFilterIndex.from_columns(self.columns)
+
+    def _load_vector_index(self, store: IndexStore):
+        """Create the configured first-stage index, falling back to exact scan."""
+        arrays = {name: store.array(name) for name in store.manifest.get("arrays", [])}
+        index = vector_index.load_index(
+            Config.VECTOR_INDEX_MODE, self.embeddings, arrays, prefix_dim=Config.MATRYOSHKA_PREFIX_DIM
+        )
+        if index is None:
+            logger.warning(f"⚠️ '{Config.VECTOR_INDEX_MODE}' vectors missing from index. Using exact scan.")
+            index = vector_index.ExactIndex(self.embeddings)
+        logger.info(f"Vector index: {index.mode} ({index.nbytes() / 1e6:.1f} MB resident)")
+        return index
 
     def _format_layout_text(self, item: Dict[str, Any]) -> str:
         """Format layout data into searchable text."""
@@ -402,6 +904,14 @@ class VoyageRetriever:
             
         return "\n".join(text_parts)
 
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        """Per-text Voyage token counts; falls back to a length heuristic (offline tokenizer unavailable)."""
+        try:
+            return [len(encoding.ids) for encoding in self.client.tokenize(texts, model=Config.VOYAGE_MODEL)]
+        except Exception as e:
+            logger.warning(f"⚠️ Voyage tokenizer unavailable ({e}). Estimating token counts.")
+            return [estimate_tokens(t) for t in texts]
+
     def _get_voyage_embeddings(self, texts: List[str], input_type: str = "document") -> List[List[float]]:
         """
         Get embeddings from Voyage AI API.
@@ -412,28 +922,76 @@ class VoyageRetriever:
         
         Returns:
             List of embedding vectors
-        """
-        # Voyage API has batch size limits, process in chunks
-        batch_size = 128
-        all_embeddings = []
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            
-            result = self.client.embed(
+        Documents are grouped by token length into requests under a token
+        budget and sent concurrently (Config.INDEX_WORKERS).
+        """
+        def embed(batch: List[str]) -> List[List[float]]:
+            # Retryable errors (rate limits, 5xx) back off and retry instead of failing the build
+            result = self.voyage.call_sync(lambda: self.client.embed(
                 batch,
                 model=Config.VOYAGE_MODEL,
                 input_type=input_type,
                 output_dimension=Config.VOYAGE_DIMENSIONS  # Matryoshka dimension
-            )
-            
-            all_embeddings.extend(result.embeddings)
-            
-            if i + batch_size < len(texts):
-                print(f"   Embedded {i + batch_size}/{len(texts)} documents...")
-        
+            ))
+            return result.embeddings
+
+        if input_type != "document":
+            # Queries: small batches, serial chunks within the API limits
+            all_embeddings = []
+            for i in range(0, len(texts), Config.INDEX_BATCH_MAX_DOCS):
+                all_embeddings.extend(embed(texts[i:i + Config.INDEX_BATCH_MAX_DOCS]))
+            return all_embeddings
+
+        all_embeddings, self.index_stats = encode_batches(
+            embed,
+            texts,
+            self._count_tokens(texts),
+            max_tokens=Config.INDEX_BATCH_TOKENS,
+            max_batch_size=Config.INDEX_BATCH_MAX_DOCS,
+            workers=Config.INDEX_WORKERS,
+            padded=False,
+            label="Voyage embedding"
+        )
         return all_embeddings
 
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed search queries in a single API call.
+        Recently seen queries are served from a small cache, so cascading
+        filter retries of the same query don't pay another round trip.
+        """
+        found, missing = self._cached_query_embeddings(queries)
+        if missing:
+            self._cache_query_embeddings(found, missing, self._get_voyage_embeddings(missing, input_type="query"))
+        return [found[q] for q in queries]
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """_embed_queries over the async REST client (retries + hedging, see providers.py)."""
+        found, missing = self._cached_query_embeddings(queries)
+        if missing:
+            embeddings = await self.voyage.embed(
+                missing,
+                model=Config.VOYAGE_MODEL,
+                input_type="query",
+                output_dimension=Config.VOYAGE_DIMENSIONS
+            )
+            self._cache_query_embeddings(found, missing, embeddings)
+        return [found[q] for q in queries]
+
+    def _cached_query_embeddings(self, queries: List[str]) -> Tuple[Dict[str, List[float]], List[str]]:
+        with self._query_cache_lock:
+            found = {q: self._query_cache[q] for q in dict.fromkeys(queries) if q in self._query_cache}
+        return found, [q for q in dict.fromkeys(queries) if q not in found]
+
+    def _cache_query_embeddings(self, found: Dict[str, List[float]], missing: List[str], embeddings: List[List[float]]) -> None:
+        found.update(zip(missing, embeddings))
+        with self._query_cache_lock:
+            for q in missing:
+                self._query_cache[q] = found[q]
+            while len(self._query_cache) > 256:
+                self._query_cache.pop(next(iter(self._query_cache)))
+
     def index_data(self):
         """Load JSON, generate Voyage embeddings, and populate ChromaDB."""
         if not os.path.exists(Config.DATASET_PATH):
@@ -448,6 +1006,7 @@ class VoyageRetriever:
         doc_metadatas = []
         self.doc_ids = []
         self.doc_map = {}
+        self._rows = None
         
         for item in data:
             doc_id = item['image_id']
@@ -487,14 +1046,19 @@ class VoyageRetriever:
                 "layout_ratio": layout_ratio
             })
 
+        self.columns = metadata_columns([self.doc_map[doc_id] for doc_id in self.doc_ids])
+        self.filter_index = BitmapFilterIndex.from_columns(self.columns)
+        self.geometry_index = LayoutGeometryIndex.build([self.doc_map[doc_id] for doc_id in self.doc_ids])
+
         # Generate Voyage embeddings
         print(f"🔄 Generating Voyage embeddings for {len(doc_texts)} documents...")
         embeddings = self._get_voyage_embeddings(doc_texts, input_type="document")
         
         # Verify embeddings are normalized for dot product (optional but recommended)
         # Voyage AI embeddings should be pre-normalized
-        if embeddings:
-            sample_norm = sum(x**2 for x in embeddings[0]) ** 0.5
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(self.embeddings):
+            sample_norm = float(np.linalg.norm(self.embeddings[0]))
             if abs(sample_norm - 1.0) > 0.01:
                 logger.warning(f"⚠️ Embeddings may not be normalized (norm={sample_norm:.4f}). Dot product may not work as expected.")
 
@@ -513,6 +1077,14 @@ class VoyageRetriever:
         """Retrieve raw layout data by ID."""
         return self.doc_map.get(doc_id)
 
+    def _row_of(self, doc_id: str) -> Optional[int]:
+        """Index row of a document (None if it isn't indexed)."""
+        if self.store is not None:
+            return self.store.row_of(doc_id)
+        if self._rows is None:
+            self._rows = {d: i for i, d in enumerate(self.doc_ids)}
+        return self._rows.get(doc_id)
+
     def search(self, query: str, filters: Dict[str, Any] = None, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Search for similar layouts using Voyage embeddings.
@@ -523,8 +1095,179 @@ class VoyageRetriever:
             print(f"   Filters: {filters}")
         
         # Get query embedding
-        query_embedding = self._get_voyage_embeddings([query], input_type="query")[0]
+        query_embedding = self._embed_queries([query])[0]
+        
+        # In-memory scan with the bitmap filter mask (Chroma only without local vectors)
+        return self._search_embedded([query_embedding], [filters], top_k)[0]
+
+    def _filter_mask(self, filters: Dict[str, Any] = None) -> np.ndarray:
+        """Boolean candidate mask for equality filters (ANDs over the precomputed bitsets)."""
+        return self.filter_index.mask(filters)
+
+    def _format_result(self, doc_id: str, score: float) -> Dict[str, Any]:
+        doc_data = self.doc_map.get(doc_id) or {}
+        return {
+            "image_id": doc_id,
+            "similarity_score": round(float(score), 4),
+            "category": doc_data.get('category'),
+            "mood": doc_data.get('mood'),
+            "type": doc_data.get('type')
+        }
+
+    def _format_hit(self, doc_id: str, score: float, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """_format_result from the metadata a shard returned (no layout decode)."""
+        return {
+            "image_id": doc_id,
+            "similarity_score": round(float(score), 4),
+            "category": meta.get('category'),
+            "mood": meta.get('mood'),
+            "type": meta.get('type')
+        }
+
+    def search_many(self, queries: List[str], filters_list: List[Dict[str, Any]] = None, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Batched search for multi-page requests.
+        All queries are embedded in one Voyage call and scored together with a
+        single matrix-matrix product against the in-memory first-stage index
+        (Config.VECTOR_INDEX_MODE), with full-precision rescoring when quantized.
+        Returns one result list per query, in the same format as search().
+        """
+        if not queries:
+            return []
+        filters_list = filters_list or [None] * len(queries)
+        if len(filters_list) != len(queries):
+            raise ValueError("filters_list must have one entry per query")
+
+        print(f"🔍 [Voyage] Batch searching {len(queries)} queries")
+        return self._search_embedded(self._embed_queries(queries), filters_list, top_k)
+
+    async def asearch_many(self, queries: List[str], filters_list: List[Dict[str, Any]] = None, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Async search_many for the API path.
+        Query embeddings go through the shared micro-batching encoder, so
+        concurrent requests share Voyage calls; scoring runs off the event loop.
+        An identical batch already in flight is joined instead of re-run.
+        """
+        if not queries:
+            return []
+        filters_list = filters_list or [None] * len(queries)
+        if len(filters_list) != len(queries):
+            raise ValueError("filters_list must have one entry per query")
+
+        key = fingerprint("search", queries, filters_list, top_k)
+        return await self.inflight.do(key, lambda: self._asearch_many(queries, filters_list, top_k))
+
+    async def _asearch_many(self, queries: List[str], filters_list: List[Dict[str, Any]], top_k: int) -> List[List[Dict[str, Any]]]:
+        print(f"🔍 [Voyage] Async batch searching {len(queries)} queries")
+        query_embeddings = await self.query_encoder.encode_many(queries)
+        return await asyncio.to_thread(self._search_embedded, query_embeddings, filters_list, top_k)
+
+    def _search_embedded(self, query_embeddings: List[List[float]], filters_list: List[Dict[str, Any]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """search_many scoring with precomputed query embeddings."""
+        if self.shards is not None:
+            try:
+                hits, _ = self.shards.search(
+                    np.asarray(query_embeddings, dtype=np.float32), None, filters_list, top_k, Config.RESCORE_CANDIDATES
+                )
+                outputs = [[self._format_hit(doc_id, score, meta) for doc_id, score, meta in query_hits] for query_hits in hits]
+                print(f"   Found {[len(o) for o in outputs]} results ({Config.SHARDS} shards)")
+                return outputs
+            except RuntimeError as e:
+                logger.warning(f"⚠️ Sharded search failed ({e}). Searching in-process.")
+                self._ensure_indexes("filter_index", "dense_index")
+
+        # No local vectors (e.g. cache could not be written): per-query Chroma lookups
+        if self.dense_index is None or self.filter_index is None:
+            return [
+                self._search_chroma(vec, filters, top_k)
+                for vec, filters in zip(query_embeddings, filters_list)
+            ]
+
+        # One (queries x documents) scan, then full-precision rescoring if quantized
+        q_matrix = np.asarray(query_embeddings, dtype=np.float32)
+        hits = vector_index.search(
+            self.dense_index,
+            self.embeddings,
+            q_matrix,
+            masks=[self._filter_mask(filters) if filters else None for filters in filters_list],
+            top_k=top_k,
+            rescore_candidates=Config.RESCORE_CANDIDATES
+        )
+
+        outputs = []
+        for rows, scores in hits:
+            outputs.append([self._format_result(self.doc_ids[j], score) for j, score in zip(rows, scores)])
+
+        print(f"   Found {[len(o) for o in outputs]} results")
+        return outputs
+
+    def recommend(self, layout_type: str, image_count: int, mood: str, category: str, description: str = '', top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Precomputed results for an analysis, or None when a live search is needed
+        (no table, a key the table doesn't cover, or an informative description
+        unless RECOMMENDATION_IGNORE_DESCRIPTION=1). A hit equals the live cascading
+        search for rag_query(mood, category) with an empty description.
+        """
+        if self.recommendations is None:
+            return None
+        if not Config.RECOMMENDATION_IGNORE_DESCRIPTION and (description or '').strip().lower() not in GENERIC_DESCRIPTIONS:
+            return None
+        return self.recommendations.lookup(layout_type, image_count, mood, category, top_k=top_k)
+
+    def search_by_layout(
+        self,
+        image_count: int = None,
+        hero: str = None,
+        hero_size: float = 0.5,
+        title: str = None,
+        like: str = None,
+        filters: Dict[str, Any] = None,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Find layouts by geometry alone (no embedding call).
+        
+        Args:
+            image_count: Exact number of figures (bitmap filter)
+            hero: Region of the largest image, e.g. "top-right", "left", "full"
+            hero_size: Hero width/height as a fraction of the page
+            title: Region of the title block, e.g. "top", "bottom"
+            like: image_id of a layout to match on all channels instead of a sketch
+                  (excluded from results; an unknown id returns [])
+            filters: Extra metadata equality filters (type, mood, ...)
+        
+        Example: search_by_layout(image_count=3, hero="top-right")
+        """
+        filters = dict(filters or {})
+        if image_count is not None:
+            filters['image_count'] = int(image_count)
+        self._ensure_indexes("filter_index", "geometry_index")
+        
+        if like is not None:
+            like_row = self._row_of(like)
+            layout = self.doc_map.get(like) if like_row is not None else None
+            if layout is None:
+                return []
+            query, channels = layout_grid(layout), GEOMETRY_CHANNELS
+        else:
+            query, channels = sketch_grid(hero=hero, hero_size=hero_size, title=title)
+        
+        mask = self._filter_mask(filters) if filters else None
+        if like is not None:
+            # Don't return the example itself
+            mask = np.ones(len(self.doc_ids), dtype=bool) if mask is None else mask
+            mask[like_row] = False
+        if not channels:
+            # Nothing to compare: filter-only lookup in index order
+            rows = np.flatnonzero(mask if mask is not None else np.ones(len(self.doc_ids), dtype=bool))[:top_k]
+            return [self._format_result(self.doc_ids[j], 1.0) for j in rows]
         
+        print(f"📐 [Geometry] Searching: hero={hero}, title={title}, like={like}, filters={filters}")
+        rows, scores = self.geometry_index.search(query, channels, mask, top_k)
+        return [self._format_result(self.doc_ids[j], score) for j, score in zip(rows, scores)]
+
+    def _search_chroma(self, query_embedding: List[float], filters: Dict[str, Any] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Dense search through ChromaDB with a precomputed query embedding."""
         # Prepare ChromaDB where clause
         chroma_where = None
         if filters:
@@ -550,33 +1293,64 @@ class VoyageRetriever:
         output = []
         if results['ids'] and results['ids'][0]:
             for i, doc_id in enumerate(results['ids'][0][:top_k]):
-                doc_data = self.doc_map.get(doc_id)
-                if doc_data:
-                    # ChromaDB returns distances
-                    # For inner product (dot product), the distance IS the similarity score
-                    # Higher values = more similar (unlike cosine distance where lower is better)
-                    distance = results['distances'][0][i] if results.get('distances') else 0
-                    similarity = distance  # For inner product, distance = similarity
-                    
-                    output.append({
-                        "image_id": doc_id,
-                        "similarity_score": round(similarity, 4),
-                        "category": doc_data.get('category'),
-                        "mood": doc_data.get('mood'),
-                        "type": doc_data.get('type')
-                    })
-        
-        print(f"   Found {len(output)} results")
+                if doc_id in self.doc_map:
+                    # Chroma's "ip" space reports distance = 1 - dot product (lower is closer);
+                    # convert back so similarity_score matches the in-memory path
+                    distance = results['distances'][0][i] if results.get('distances') else 1.0
+                    output.append(self._format_result(doc_id, 1.0 - distance))
         return output
 
 
 # Global instance placeholders
 analyzer = None
 retriever = None
+live_retriever: LiveSnapshot = None  # Swapped atomically by reload_index()
+reloader: BackgroundReloader = None
 
 def setup_rag():
     """Initialize RAG components with Voyage embeddings."""
-    global analyzer, retriever
-    analyzer = GeminiAnalyzer()
-    retriever = VoyageRetriever()
+    global analyzer, retriever, live_retriever, reloader
+    with startup_phase("GeminiAnalyzer"):
+        analyzer = GeminiAnalyzer()
+    with startup_phase("VoyageRetriever"):
+        retriever = VoyageRetriever()
+    live_retriever = LiveSnapshot(retriever, release=lambda old: old.close(remove_files=True))
+    reloader = BackgroundReloader(_build_retriever, live_retriever, name="voyage-reload")
     print("✅ Voyage RAG system initialized!")
+
+def _build_retriever(rebuild: bool = False) -> VoyageRetriever:
+    global retriever
+    new_retriever = VoyageRetriever(rebuild=rebuild)
+    if new_retriever.recommendations is None and Config.RECOMMENDATION_TABLE_PATH:
+        logger.info("Recommendation table does not match the new index. Run scripts/build_recommendation_table.py.")
+    # Published before the swap so un-leased readers (module attribute) move on too
+    retriever = new_retriever
+    return new_retriever
+
+def acquire_retriever():
+    """Lease the serving retriever: `with acquire_retriever() as r: r.search(...)`."""
+    return live_retriever.acquire()
+
+def index_loaded() -> bool:
+    """Whether a retriever with a non-empty index is serving."""
+    current = live_retriever.current if live_retriever else None
+    return current is not None and bool(getattr(current, "doc_ids", None))
+
+def provider_endpoints() -> Dict[str, str]:
+    """Endpoints /readyz checks for reachability."""
+    return {
+        "voyage": Config.VOYAGE_BASE_URL,
+        "gemini": Config.GEMINI_API_ENDPOINT or "generativelanguage.googleapis.com",
+    }
+
+async def warmup_providers() -> Dict[str, Any]:
+    """Open the Voyage connection pool on the serving event loop, so the first search skips DNS/TLS setup."""
+    return {"voyage": await retriever.voyage.warmup()}
+
+def reload_index(rebuild: bool = False) -> bool:
+    """
+    Rebuild the retriever in the background and swap it in when complete.
+    Without `rebuild` the stored index is reused unless the dataset changed.
+    Returns False if a reload is already running.
+    """
+    return reloader.trigger(rebuild=rebuild)
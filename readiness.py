@@ -0,0 +1,130 @@
+"""
+[Readiness]
+Non-blocking startup and the liveness / readiness probes.
+
+The server binds before the index is loaded: Startup runs the slow steps
+(module import, index load or build, provider client warmup) as a
+background task on the server's event loop and records how far it got.
+
+    /healthz   liveness: the process is up and startup hasn't failed
+    /readyz    readiness: startup finished, the index is loaded and the
+               provider endpoints are reachable (TCP connect, cached for
+               a few seconds so frequent probes cost nothing upstream)
+
+    startup = Startup()
+    asyncio.create_task(startup.run([("init_rag", lambda: asyncio.to_thread(init_rag)), ...]))
+    probe = ProviderProbe({"voyage": "https://api.voyageai.com/v1"})
+    probe.check()   # -> {"voyage": {"reachable": True, "latency_ms": 12.3, ...}}
+"""
+
+import time
+import socket
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint(url: str, default_port: int = 443) -> Tuple[str, int]:
+    """(host, port) of a base URL or a bare `host[:port]` API endpoint."""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    port = parts.port or (80 if parts.scheme == "http" else default_port)
+    return parts.hostname or "", port
+
+
+def tcp_probe(host: str, port: int, timeout_s: float = 2.0) -> Dict[str, Any]:
+    """Whether a TCP connection to host:port opens within the timeout."""
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s):
+            pass
+    except OSError as e:
+        return {"reachable": False, "error": f"{type(e).__name__}: {e}"}
+    return {"reachable": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+class ProviderProbe:
+    def __init__(self, targets: Dict[str, str], ttl_s: float = 10.0, timeout_s: float = 2.0):
+        """
+        Args:
+            targets: Provider name -> base URL or host[:port]
+            ttl_s: How long a result is reused before the endpoint is probed again
+            timeout_s: Connect timeout per endpoint
+        """
+        self.targets = {name: endpoint(url) for name, url in targets.items() if url}
+        self.ttl_s = ttl_s
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked_at = 0.0
+
+    def check(self) -> Dict[str, Dict[str, Any]]:
+        """Reachability per provider (blocking; call from a worker thread)."""
+        with self._lock:
+            if self._results and time.monotonic() - self._checked_at < self.ttl_s:
+                return dict(self._results)
+            results = {}
+            for name, (host, port) in self.targets.items():
+                results[name] = {"endpoint": f"{host}:{port}", **tcp_probe(host, port, self.timeout_s)}
+                if not results[name]["reachable"]:
+                    logger.warning(f"⚠️ Provider {name} unreachable at {host}:{port}: {results[name]['error']}")
+            self._results = results
+            self._checked_at = time.monotonic()
+            return dict(results)
+
+
+class Startup:
+    def __init__(self):
+        self.state = "starting"  # starting | ready | failed
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.steps: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def failed(self) -> bool:
+        return self.state == "failed"
+
+    async def run(self, steps: List[Tuple[str, Callable[[], Awaitable[Any]]]]) -> None:
+        """
+        Run the startup steps in order. A step that raises marks startup as
+        failed and stops the rest; a step may return a dict of details that
+        is kept in status() (e.g. warmup latencies).
+        """
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                detail = await step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.steps.append({"step": name, "ms": round((time.perf_counter() - start) * 1000, 1), "ok": False})
+                self.state = "failed"
+                self.error = f"{name}: {type(e).__name__}: {e}"
+                logger.exception(f"❌ Startup step {name} failed")
+                print(f"❌ Startup failed in {name}: {e}")
+                return
+            record = {"step": name, "ms": round((time.perf_counter() - start) * 1000, 1), "ok": True}
+            if isinstance(detail, dict):
+                record.update(detail)
+            self.steps.append(record)
+        self.state = "ready"
+        self.ready_at = time.time()
+        print(f"✅ Startup complete in {self.ready_at - self.started_at:.1f}s, ready for traffic")
+
+    def status(self) -> Dict[str, Any]:
+        now = self.ready_at or time.time()
+        return {
+            "state": self.state,
+            "error": self.error,
+            "elapsed_s": round(now - self.started_at, 1),
+            "steps": list(self.steps),
+        }
@@ -0,0 +1,173 @@
+"""
+[Recommendation Table]
+Precomputed RAG results for the enumerated analysis attributes.
+
+The /analyze query is "<mood> <category> <description>", and mood/category
+come from a small closed vocabulary. Running the cascading filter search
+offline for every (type, image_count, mood, category) combination (with an
+empty description) turns most request-time searches into a dict lookup; an
+embedding search is only needed when the description is informative or the
+key is not in the table (RECOMMENDATION_IGNORE_DESCRIPTION=1 opts into
+answering from the key alone, dropping the description's signal).
+
+Only the table key is normalized (normalize_attribute): "Minimalist" and
+"minimalist " hit the entry computed for the query "Minimalist ...", while
+live queries keep the analysis' text as is.
+
+Built by scripts/build_recommendation_table.py; stored as JSON next to the
+index and tied to the index build it was computed from.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABLE_FORMAT_VERSION = 1
+
+# Vocabulary offered to Gemini in analyze_page, merged with the dataset's own values
+DEFAULT_MOODS = ["Minimalist", "Energetic", "Luxurious", "Emotional", "Professional", "General"]
+DEFAULT_CATEGORIES = ["Fashion", "Travel", "Food", "Business", "Tech", "General"]
+DEFAULT_TYPES = ["Cover", "Article"]
+
+# Descriptions that carry no retrieval signal (empty, or the analyzer's fallback)
+GENERIC_DESCRIPTIONS = {"", "standard layout"}
+
+
+def normalize_attribute(value: Any) -> str:
+    """Canonical form of a mood/category value in table keys."""
+    return str(value or '').strip().lower()
+
+
+def table_key(layout_type: str, image_count: int, mood: str, category: str) -> str:
+    return "|".join([
+        str(layout_type).strip(),
+        str(int(image_count)),
+        normalize_attribute(mood),
+        normalize_attribute(category),
+    ])
+
+
+def rag_query(mood: str, category: str, description: str = '') -> str:
+    """The query string analyze_pages builds from an analysis result."""
+    return f"{mood} {category} {description}"
+
+
+def filter_attempts(layout_type: str, image_count: int) -> List[Dict[str, Any]]:
+    """Cascading fallback filters used by analyze_pages."""
+    return [
+        {'type': layout_type, 'image_count': image_count},
+        {'type': layout_type},
+        {}
+    ]
+
+
+def cascade_search(retriever, queries: List[str], attempts: List[List[Dict[str, Any]]], top_k: int) -> List[List[Dict[str, Any]]]:
+    """search_many level by level over the queries still without results."""
+    results = [[] for _ in queries]
+    pending = list(range(len(queries)))
+    level = 0
+    while pending:
+        batch = [i for i in pending if level < len(attempts[i])]
+        if not batch:
+            break
+        found = retriever.search_many([queries[i] for i in batch], [attempts[i][level] for i in batch], top_k=top_k)
+        for i, hits in zip(batch, found):
+            results[i] = hits
+        pending = [i for i in batch if not results[i]]
+        level += 1
+    return results
+
+
+class RecommendationTable:
+    def __init__(self, entries: Dict[str, List[Dict[str, Any]]], version: str, top_k: int):
+        self.entries = entries
+        self.version = version
+        self.top_k = top_k
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(
+        cls,
+        retriever,
+        version: str,
+        types: List[str],
+        image_counts: List[int],
+        moods: List[str],
+        categories: List[str],
+        top_k: int = 5,
+        batch_size: int = 256,
+    ) -> "RecommendationTable":
+        """Run the cascading search for every attribute combination (empty description)."""
+        combos: List[Tuple[str, int, str, str]] = [
+            (t, n, m, c) for t in types for n in image_counts for m in moods for c in categories
+        ]
+        print(f"🧮 Precomputing {len(combos)} combinations "
+              f"({len(types)} types x {len(image_counts)} image counts x {len(moods)} moods x {len(categories)} categories)")
+
+        entries = {}
+        start = time.perf_counter()
+        for i in range(0, len(combos), batch_size):
+            chunk = combos[i:i + batch_size]
+            found = cascade_search(
+                retriever,
+                [rag_query(m, c) for _, _, m, c in chunk],
+                [filter_attempts(t, n) for t, n, _, _ in chunk],
+                top_k
+            )
+            for (t, n, m, c), hits in zip(chunk, found):
+                entries[table_key(t, n, m, c)] = hits
+            print(f"   {min(i + batch_size, len(combos))}/{len(combos)} combinations")
+        print(f"✅ Recommendation table built in {time.perf_counter() - start:.1f}s")
+        return cls(entries, version, top_k)
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": TABLE_FORMAT_VERSION,
+                "version": self.version,
+                "top_k": self.top_k,
+                "entries": self.entries,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, expected_version: Optional[str] = None) -> Optional["RecommendationTable"]:
+        """Returns None when the table is missing or was built from another index."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read recommendation table {path}: {e}")
+            return None
+        if data.get("format_version") != TABLE_FORMAT_VERSION:
+            return None
+        if expected_version is not None and data.get("version") != expected_version:
+            logger.info(f"Recommendation table is stale (Found: {data.get('version')}, Expected: {expected_version}). Ignoring.")
+            return None
+        return cls(data.get("entries", {}), data.get("version"), data.get("top_k", 5))
+
+    def lookup(self, layout_type: str, image_count: int, mood: str, category: str, top_k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Precomputed results, or None on a miss (or when more than the stored top_k is asked for)."""
+        hits = self.entries.get(table_key(layout_type, image_count, mood, category)) if top_k <= self.top_k else None
+        if hits is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return hits[:top_k]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
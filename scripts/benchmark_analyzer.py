@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Analyzer Benchmark
+Times the local heuristic analyzer (local_analyzer.py) per page and per
+stage, for a few thumbnail sizes, and optionally compares it with Gemini
+(latency, and mood/category agreement with the vision model).
+
+Images are decoded up front, so the timings cover the analysis only, as in
+the API where uploads are already PIL images.
+
+Usage:
+    python scripts/benchmark_analyzer.py
+    python scripts/benchmark_analyzer.py --images image_data --pages 50 --thumb-edges 32 64 128
+    python scripts/benchmark_analyzer.py --gemini 10      # also call Gemini on 10 pages (needs API keys)
+"""
+
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from image_validator import image_validator  # noqa: E402
+from local_analyzer import LocalAnalyzer  # noqa: E402
+
+SAMPLE_TEXT = [
+    ("Summer Collection", "The runway this season leaned on linen, denim and soft tailoring. " * 8),
+    ("A Week on the Island", "Our journey started at a small hotel by the beach. " * 20),
+    ("The New Skincare Rules", "Dermatologists explain the makeup and skin routine that works. " * 5),
+    ("Inside the Startup", "The technology company builds software for every device. " * 30),
+]
+
+
+def load_images(path: str, limit: int):
+    files = sorted(glob.glob(os.path.join(path, "*.png")) + glob.glob(os.path.join(path, "*.jpg")))[:limit]
+    images = []
+    for f in files:
+        img = Image.open(f)
+        img.load()
+        images.append(img)
+    return images
+
+
+def synthetic_images(n: int, seed: int = 0):
+    """Blocky random images at typical upload sizes, when no image folder is available."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        w, h = random.Random(int(rng.integers(1 << 30))).choice([(1200, 1600), (1920, 1080), (1000, 1000)])
+        blocks = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+        images.append(Image.fromarray(blocks).resize((w, h), Image.Resampling.NEAREST))
+    return images
+
+
+def make_pages(images, n_pages: int, seed: int = 0):
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n_pages):
+        title, body = SAMPLE_TEXT[i % len(SAMPLE_TEXT)]
+        n = rng.choice([0, 1, 1, 2, 3]) if images else 0
+        pages.append((rng.sample(images, min(n, len(images))), title, body))
+    return pages
+
+
+def percentiles(values_ms):
+    arr = np.asarray(values_ms) if values_ms else np.zeros(1)
+    return round(float(np.percentile(arr, 50)), 2), round(float(np.percentile(arr, 95)), 2)
+
+
+def benchmark_stages(images, thumb_edges):
+    print(f"\n[Stages] per image, {len(images)} image(s)")
+    print(f"{'thumb':>6} {'stats p50':>10} {'stats p95':>10} {'kmeans p50':>11} {'kmeans p95':>11}")
+    for edge in thumb_edges:
+        stats_ms, kmeans_ms = [], []
+        for img in images:
+            start = time.perf_counter()
+            image_validator.image_stats(img, thumb_edge=edge)
+            stats_ms.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            image_validator.dominant_colors(img, thumb_edge=edge)
+            kmeans_ms.append((time.perf_counter() - start) * 1000)
+        s50, s95 = percentiles(stats_ms)
+        k50, k95 = percentiles(kmeans_ms)
+        print(f"{edge:>6} {s50:>10} {s95:>10} {k50:>11} {k95:>11}")
+
+
+def benchmark_pages(pages, thumb_edges):
+    print(f"\n[Pages] local analyze_page, {len(pages)} page(s)")
+    print(f"{'thumb':>6} {'p50 ms':>8} {'p95 ms':>8} {'pages/s':>8}")
+    results = {}
+    for edge in thumb_edges:
+        analyzer = LocalAnalyzer(thumb_edge=edge)
+        latencies = []
+        for images, title, body in pages:
+            start = time.perf_counter()
+            results[(edge, id(images))] = analyzer.analyze_page(images, title, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+        p50, p95 = percentiles(latencies)
+        print(f"{edge:>6} {p50:>8} {p95:>8} {len(pages) / (sum(latencies) / 1000):>8.0f}")
+
+
+def compare_gemini(pages, n: int):
+    import rag_voyage
+
+    rag_voyage.Config.ANALYSIS_CACHE_PATH = ""  # Time real calls
+    gemini = rag_voyage.GeminiAnalyzer()
+    local = LocalAnalyzer()
+    gemini_ms, local_ms, mood_agree, category_agree = [], [], 0, 0
+    for images, title, body in pages[:n]:
+        start = time.perf_counter()
+        remote = gemini.analyze_page(images, title, body)
+        gemini_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        heuristic = local.analyze_page(images, title, body)
+        local_ms.append((time.perf_counter() - start) * 1000)
+        mood_agree += str(remote.get("mood", "")).lower() == heuristic["mood"].lower()
+        category_agree += str(remote.get("category", "")).lower() == heuristic["category"].lower()
+
+    g50, g95 = percentiles(gemini_ms)
+    l50, l95 = percentiles(local_ms)
+    total = max(1, min(n, len(pages)))
+    print(f"\n[Gemini vs local] {total} page(s)")
+    print(f"   Gemini p50/p95: {g50} / {g95} ms")
+    print(f"   Local  p50/p95: {l50} / {l95} ms")
+    print(f"   Agreement: mood {mood_agree / total:.0%}, category {category_agree / total:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="image_data", help="Folder of .png/.jpg images (synthetic if missing)")
+    parser.add_argument("--max-images", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--thumb-edges", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--gemini", type=int, default=0, help="Also run Gemini on this many pages")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.max_images) if os.path.isdir(args.images) else []
+    if not images:
+        print(f"⚠️ No images in {args.images}, using synthetic ones")
+        images = synthetic_images(min(args.max_images, 20))
+    print(f"🖼️  {len(images)} image(s), sizes like {images[0].size}")
+
+    pages = make_pages(images, args.pages)
+    benchmark_stages(images, args.thumb_edges)
+    benchmark_pages(pages, args.thumb_edges)
+    if args.gemini:
+        compare_gemini(pages, args.gemini)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark
+Measures first-stage index memory, query latency and recall@k versus exact
+search on a synthetic corpus shaped like the Voyage layout embeddings.
+
+Usage:
+    python scripts/benchmark_retrieval.py --docs 100000 --dim 512 --queries 100
+    python scripts/benchmark_retrieval.py --section matryoshka --dim 1024 --sizes 10000 50000 200000
+    python scripts/benchmark_retrieval.py --section colbert --colbert-top-n 10 20 50 --colbert-budgets 0 10 30
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import vector_index  # noqa: E402
+from colbert_index import ColbertVectors  # noqa: E402
+
+
+def make_corpus(n_docs: int, dim: int, n_queries: int, seed: int = 0, matryoshka: bool = False):
+    """
+    Clustered unit vectors (layouts group by category/mood), plus nearby queries.
+    With `matryoshka`, per-dimension scale decays so leading dims carry most
+    of the signal, as in Matryoshka-trained embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, n_docs // 500), dim)).astype(np.float32)
+    docs = centers[rng.integers(0, len(centers), n_docs)] + 0.6 * rng.standard_normal((n_docs, dim)).astype(np.float32)
+    if matryoshka:
+        docs *= (1.0 / np.sqrt(1.0 + np.arange(dim) / 64.0)).astype(np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    queries = docs[rng.integers(0, n_docs, n_queries)] + 0.4 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return docs, queries
+
+
+def run_search(index, docs, queries, top_k, rescore_candidates):
+    start = time.perf_counter()
+    hits = vector_index.search(index, docs, queries, [None] * len(queries), top_k, rescore_candidates)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [rows for rows, _ in hits], elapsed_ms / len(queries)
+
+
+def benchmark_quantization(docs, queries, top_k, rescore_candidates):
+    print(f"\n[Quantization] top_k={top_k}, rescore_candidates={rescore_candidates}")
+    print(f"{'mode':<8} {'resident MB':>12} {'ms/query':>10} {f'recall@{top_k}':>10}")
+
+    exact_index = vector_index.ExactIndex(docs)
+    exact_rows, _ = run_search(exact_index, docs, queries, top_k, 0)
+
+    for mode in ("exact", "int8", "binary"):
+        index = vector_index.load_index(mode, docs, vector_index.build_arrays(mode, docs))
+        rows, ms = run_search(index, docs, queries, top_k, rescore_candidates)
+        recall = vector_index.recall_at_k(rows, exact_rows)
+        print(f"{mode:<8} {index.nbytes() / 1e6:>12.1f} {ms:>10.2f} {recall:>10.3f}")
+
+
+def benchmark_matryoshka(sizes, dim, n_queries, top_k, prefix_dims, shortlists):
+    print(f"\n[Matryoshka] full dim={dim}, top_k={top_k}")
+    print(f"{'docs':>8} {'prefix':>7} {'shortlist':>10} {'resident MB':>12} {'ms/query':>10} {f'recall@{top_k}':>10}")
+
+    for n_docs in sizes:
+        docs, queries = make_corpus(n_docs, dim, n_queries, matryoshka=True)
+        exact_rows, exact_ms = run_search(vector_index.ExactIndex(docs), docs, queries, top_k, 0)
+        print(f"{n_docs:>8} {'full':>7} {'-':>10} {docs.nbytes / 1e6:>12.1f} {exact_ms:>10.2f} {1.0:>10.3f}")
+
+        for prefix_dim in prefix_dims:
+            index = vector_index.load_index("matryoshka", docs, {}, prefix_dim=prefix_dim)
+            for shortlist in shortlists:
+                rows, ms = run_search(index, docs, queries, top_k, shortlist)
+                recall = vector_index.recall_at_k(rows, exact_rows)
+                print(f"{n_docs:>8} {prefix_dim:>7} {shortlist:>10} {index.nbytes() / 1e6:>12.1f} {ms:>10.2f} {recall:>10.3f}")
+
+
+def benchmark_colbert(n_docs, doc_tokens, query_tokens, n_queries, top_ns, budgets, dim=1024, seed=0):
+    """
+    MaxSim rerank latency over memory-mapped float16 token vectors
+    (BGE-M3 ColBERT dim is 1024). Budget 0 means unlimited.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(np.log(doc_tokens), 0.6, n_docs).astype(int), 8, 8192)
+    doc_vecs = []
+    for n in lengths:
+        v = rng.standard_normal((n, dim)).astype(np.float32)
+        doc_vecs.append(v / np.linalg.norm(v, axis=1, keepdims=True))
+    colbert = ColbertVectors.from_vectors(doc_vecs)
+    del doc_vecs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, arr in colbert.arrays().items():
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        mapped = ColbertVectors.from_arrays(
+            {name: np.load(os.path.join(tmp, f"{name}.npy"), mmap_mode="r") for name in colbert.arrays()}
+        )
+
+        print(f"\n[ColBERT rerank] {n_docs} docs, mean {lengths.mean():.0f} tokens/doc, "
+              f"{mapped.nbytes() / 1e6:.0f} MB on disk (float16), {query_tokens} query tokens")
+        print(f"{'top_n':>6} {'budget ms':>10} {'p50 ms':>8} {'p95 ms':>8} {'scored':>7} {'MB read':>8}")
+
+        for top_n in top_ns:
+            for budget in budgets:
+                times, scored, read = [], [], []
+                for _ in range(n_queries):
+                    q = rng.standard_normal((query_tokens, dim)).astype(np.float32)
+                    q /= np.linalg.norm(q, axis=1, keepdims=True)
+                    rows = rng.choice(n_docs, size=min(top_n, n_docs), replace=False).tolist()
+                    start = time.perf_counter()
+                    _, scores = mapped.rerank(q, rows, budget_ms=budget or None)
+                    times.append((time.perf_counter() - start) * 1000)
+                    scored.append(len(scores))
+                    read.append(sum(int(lengths[r]) for r in scores) * dim * 2 / 1e6)
+                print(f"{top_n:>6} {budget or '-':>10} {np.percentile(times, 50):>8.2f} {np.percentile(times, 95):>8.2f} "
+                      f"{np.mean(scored):>7.1f} {np.mean(read):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, default=100, help="Full-precision rescoring shortlist size")
+    parser.add_argument("--section", choices=["all", "quantization", "matryoshka", "colbert"], default="all")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000], help="Corpus sizes (matryoshka)")
+    parser.add_argument("--prefix-dims", type=int, nargs="+", default=[128, 256])
+    parser.add_argument("--shortlists", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--colbert-docs", type=int, default=500, help="Corpus size (colbert)")
+    parser.add_argument("--colbert-doc-tokens", type=int, default=150, help="Mean tokens per document")
+    parser.add_argument("--colbert-query-tokens", type=int, default=24)
+    parser.add_argument("--colbert-top-n", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--colbert-budgets", type=float, nargs="+", default=[0, 10, 30], help="ms per query, 0 = unlimited")
+    args = parser.parse_args()
+
+    if args.section in ("all", "quantization"):
+        print(f"Corpus: {args.docs} docs x {args.dim} dims, {args.queries} queries")
+        docs, queries = make_corpus(args.docs, args.dim, args.queries)
+        benchmark_quantization(docs, queries, args.top_k, args.rescore)
+
+    if args.section in ("all", "matryoshka"):
+        benchmark_matryoshka(args.sizes, args.dim, args.queries, args.top_k, args.prefix_dims, args.shortlists)
+
+    if args.section in ("all", "colbert"):
+        benchmark_colbert(args.colbert_docs, args.colbert_doc_tokens, args.colbert_query_tokens,
+                          args.queries, args.colbert_top_n, args.colbert_budgets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Recommendation Table Build
+Precomputes the cascading RAG search for every (type, image_count, mood,
+category) combination against the current Voyage index, so /analyze can
+answer searches with a table lookup (see recommendation_table.py for how
+the description is treated).
+
+Rebuild after every re-index: the table records the index build it was
+computed from and is ignored by the server once that build is replaced.
+
+Usage:
+    python scripts/build_recommendation_table.py
+    python scripts/build_recommendation_table.py --max-images 6 --moods Minimalist Vibrant --top-k 5
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # Config paths are relative to the project root
+
+import rag_voyage  # noqa: E402
+from recommendation_table import (  # noqa: E402
+    RecommendationTable, DEFAULT_MOODS, DEFAULT_CATEGORIES, DEFAULT_TYPES, normalize_attribute
+)
+
+
+def vocabulary(defaults, column) -> list:
+    """Defaults plus the dataset's own values, one per table key (in the casing Gemini is offered)."""
+    values = {}
+    for value in list(defaults) + [str(v) for v in np.asarray(column).tolist() if str(v)]:
+        values.setdefault(normalize_attribute(value), value.strip().title())
+    return sorted(values.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=rag_voyage.Config.RECOMMENDATION_TABLE_PATH)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-images", type=int, default=None, help="Largest image count (default: dataset max)")
+    parser.add_argument("--moods", nargs="+", default=None, help="Override the mood vocabulary")
+    parser.add_argument("--categories", nargs="+", default=None, help="Override the category vocabulary")
+    args = parser.parse_args()
+
+    retriever = rag_voyage.VoyageRetriever()
+    if not retriever.doc_ids:
+        print("❌ Index is empty. Nothing to precompute.")
+        sys.exit(1)
+
+    max_images = args.max_images
+    if max_images is None:
+        max_images = int(np.max(retriever.columns['image_count']))
+    moods = args.moods or vocabulary(DEFAULT_MOODS, retriever.columns['mood'])
+    categories = args.categories or vocabulary(DEFAULT_CATEGORIES, retriever.columns['category'])
+
+    table = RecommendationTable.build(
+        retriever,
+        version=retriever.index_build_id(),
+        types=DEFAULT_TYPES,
+        image_counts=list(range(max_images + 1)),
+        moods=moods,
+        categories=categories,
+        top_k=args.top_k,
+    )
+    table.save(args.output)
+    print(f"💾 Saved {len(table.entries)} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+BGE-M3 ONNX Export
+Exports BGE-M3 (XLM-R backbone + sparse/colbert heads) to ONNX, applies
+dynamic int8 quantization, verifies parity against the PyTorch model and
+benchmarks CPU query latency. The output directory is what
+rag_modules.Config.BGE_ONNX_PATH points to (BGE_BACKEND=onnx).
+
+Usage:
+    python scripts/export_bge_onnx.py --output ./models/bge-m3-onnx
+    python scripts/export_bge_onnx.py --output ./models/bge-m3-onnx --skip-export --threads 4
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bge_onnx import OnnxBGEM3Encoder, FP32_MODEL, INT8_MODEL  # noqa: E402
+
+MODEL_NAME = "BAAI/bge-m3"
+
+# Sample queries in the shape the retriever builds (type/mood/category/description)
+SAMPLE_QUERIES = [
+    "Type: Cover, Mood: Minimalist, Category: Fashion, Description: Full-bleed portrait with a bold serif headline",
+    "Type: Article, Mood: Energetic, Category: Travel, Description: Two landscape photos above a two-column body",
+    "Type: Article, Mood: Luxurious, Category: Food, Description: Large hero image with a narrow text column",
+    "Type: Cover, Mood: Professional, Category: Business, Description: Centered headline over a muted background",
+    "Type: Article, Mood: Emotional, Category: Lifestyle, Description: Collage of four images and a pull quote",
+    "미니멀한 패션 화보, 큰 인물 사진과 세리프 제목",
+    "여행 기사, 풍경 사진 두 장과 2단 본문",
+    "Tech review with product shots on a white grid",
+]
+
+
+def export(output_dir: str, opset: int) -> None:
+    import torch
+    from FlagEmbedding import BGEM3FlagModel
+
+    class BGEM3ExportWrapper(torch.nn.Module):
+        """Backbone + heads with the post-processing BGEM3FlagModel does in torch."""
+
+        def __init__(self, m3):
+            super().__init__()
+            self.backbone = m3.model.model
+            self.sparse_linear = m3.model.sparse_linear
+            self.colbert_linear = m3.model.colbert_linear
+
+        def forward(self, input_ids, attention_mask):
+            hidden = self.backbone(input_ids=input_ids, attention_mask=attention_mask, return_dict=True).last_hidden_state
+            dense = torch.nn.functional.normalize(hidden[:, 0], dim=-1)
+            sparse = torch.relu(self.sparse_linear(hidden)).squeeze(-1)
+            colbert = self.colbert_linear(hidden[:, 1:]) * attention_mask[:, 1:][:, :, None].to(hidden.dtype)
+            colbert = torch.nn.functional.normalize(colbert, dim=-1)
+            return dense, sparse, colbert
+
+    print(f"📦 Loading {MODEL_NAME} (fp32 for export)...")
+    m3 = BGEM3FlagModel(MODEL_NAME, use_fp16=False)
+    wrapper = BGEM3ExportWrapper(m3).eval()
+
+    os.makedirs(output_dir, exist_ok=True)
+    m3.tokenizer.save_pretrained(output_dir)
+
+    sample = m3.tokenizer(SAMPLE_QUERIES[:2], padding=True, return_tensors="pt")
+    fp32_path = os.path.join(output_dir, FP32_MODEL)
+    print(f"🔧 Exporting ONNX graph (opset {opset}) -> {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["dense_vecs", "sparse_weights", "colbert_vecs"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "dense_vecs": {0: "batch"},
+                "sparse_weights": {0: "batch", 1: "sequence"},
+                "colbert_vecs": {0: "batch", 1: "sequence_minus_cls"},
+            },
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+
+def quantize(output_dir: str) -> None:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    fp32_path = os.path.join(output_dir, FP32_MODEL)
+    int8_path = os.path.join(output_dir, INT8_MODEL)
+    print(f"🔧 Dynamic int8 quantization -> {int8_path}")
+    # fp32 weights exceed the 2GB protobuf limit, so they live in external data
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, use_external_data_format=True)
+
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir) if f.startswith(INT8_MODEL))
+    print(f"  {INT8_MODEL}: {size / 1e6:.0f} MB")
+
+
+def _lexical_overlap(a, b) -> float:
+    """Jaccard overlap of the active token sets."""
+    a, b = set(a), set(b)
+    return len(a & b) / max(len(a | b), 1)
+
+
+def verify(reference, candidate, queries, label: str, min_dense_cos: float, min_lexical_overlap: float) -> bool:
+    """Compare `candidate` encoder outputs against the PyTorch reference."""
+    ref = reference.encode(queries, return_dense=True, return_sparse=True, return_colbert_vecs=True)
+    out = candidate.encode(queries, return_dense=True, return_sparse=True, return_colbert_vecs=True)
+
+    dense_cos = np.sum(np.asarray(ref["dense_vecs"], dtype=np.float32) * out["dense_vecs"], axis=1)
+    overlaps = [_lexical_overlap(r, o) for r, o in zip(ref["lexical_weights"], out["lexical_weights"])]
+    colbert_cos = [
+        float(np.mean(np.sum(np.asarray(r, dtype=np.float32) * o, axis=1)))
+        for r, o in zip(ref["colbert_vecs"], out["colbert_vecs"])
+    ]
+
+    # Ranking parity: same nearest sample for every query (dense and lexical)
+    ref_dense_rank = np.argsort(-(ref["dense_vecs"] @ np.asarray(ref["dense_vecs"]).T), axis=1)[:, 1]
+    out_dense_rank = np.argsort(-(out["dense_vecs"] @ out["dense_vecs"].T), axis=1)[:, 1]
+    lex = [[reference.compute_lexical_matching_score(q, d) for d in ref["lexical_weights"]] for q in ref["lexical_weights"]]
+    lex_out = [[candidate.compute_lexical_matching_score(q, d) for d in out["lexical_weights"]] for q in out["lexical_weights"]]
+    lex_corr = float(np.corrcoef(np.ravel(lex), np.ravel(lex_out))[0, 1])
+
+    ok = dense_cos.min() >= min_dense_cos and min(overlaps) >= min_lexical_overlap
+    print(f"\n[Parity: {label}] {'✅ PASS' if ok else '❌ FAIL'}")
+    print(f"  dense cosine      min {dense_cos.min():.4f}  mean {dense_cos.mean():.4f}  (threshold {min_dense_cos})")
+    print(f"  lexical tokens    min {min(overlaps):.3f}  mean {np.mean(overlaps):.3f}  (threshold {min_lexical_overlap})")
+    print(f"  lexical score r   {lex_corr:.4f}")
+    print(f"  colbert cosine    mean {np.mean(colbert_cos):.4f}")
+    print(f"  dense nearest-neighbour agreement {np.mean(ref_dense_rank == out_dense_rank):.2f}")
+    return ok
+
+
+def benchmark(encoder, queries, label: str, repeats: int) -> None:
+    """Single-query and batched latency for query-time encoding."""
+    encoder.encode(queries[:1], return_dense=True, return_sparse=True)  # warm-up
+
+    single = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            encoder.encode([q], return_dense=True, return_sparse=True)
+            single.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encoder.encode(queries, return_dense=True, return_sparse=True)
+    batch_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    print(f"{label:<12} p50 {np.percentile(single, 50):>8.1f} ms   p95 {np.percentile(single, 95):>8.1f} ms   "
+          f"batch({len(queries)}) {batch_ms:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export BGE-M3 to ONNX (int8) and verify parity/latency")
+    parser.add_argument("--output", default="./models/bge-m3-onnx", help="Output directory")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    parser.add_argument("--repeats", type=int, default=3, help="Benchmark repetitions")
+    parser.add_argument("--skip-export", action="store_true", help="Reuse an existing export")
+    parser.add_argument("--min-dense-cos", type=float, default=0.99)
+    parser.add_argument("--min-lexical-overlap", type=float, default=0.8)
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export(args.output, args.opset)
+        quantize(args.output)
+
+    from FlagEmbedding import BGEM3FlagModel
+    reference = BGEM3FlagModel(MODEL_NAME, use_fp16=False)
+    encoders = {
+        "onnx-fp32": OnnxBGEM3Encoder(args.output, quantized=False, num_threads=args.threads),
+        "onnx-int8": OnnxBGEM3Encoder(args.output, quantized=True, num_threads=args.threads),
+    }
+
+    passed = True
+    for label, encoder in encoders.items():
+        passed &= verify(reference, encoder, SAMPLE_QUERIES, label, args.min_dense_cos, args.min_lexical_overlap)
+
+    print(f"\n[Latency] threads={args.threads or 'default'}")
+    benchmark(reference, SAMPLE_QUERIES, "torch-fp32", args.repeats)
+    for label, encoder in encoders.items():
+        benchmark(encoder, SAMPLE_QUERIES, label, args.repeats)
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
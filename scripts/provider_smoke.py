@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Provider Smoke Test
+Runs the Voyage provider (providers.py) against a local fake embeddings
+server with injected failures and slow responses, and reports retries,
+hedges and latency percentiles with hedging off and on.
+
+The fake server speaks the Voyage REST shape (POST /v1/embeddings), so the
+same server can back the app itself: VOYAGE_BASE_URL=http://127.0.0.1:<port>/v1
+
+Usage:
+    python scripts/provider_smoke.py
+    python scripts/provider_smoke.py --requests 400 --error-rate 0.05 --slow-rate 0.05 --slow-ms 400
+    python scripts/provider_smoke.py --serve --port 8765     # fake server only
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from providers import VoyageProvider  # noqa: E402
+
+
+def make_handler(error_rate: float, slow_rate: float, base_ms: float, slow_ms: float, dim: int):
+    class FakeVoyageHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client cancelled (e.g. the losing copy of a hedged request)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/embeddings"):
+                return self._send(404, {"detail": "not found"})
+            if random.random() < error_rate:
+                return self._send(random.choice([429, 503]), {"detail": "injected failure"})
+            time.sleep((slow_ms if random.random() < slow_rate else base_ms) / 1000.0)
+
+            texts = payload.get("input", [])
+            dim_out = payload.get("output_dimension") or dim
+            data = []
+            for i, text in enumerate(texts):
+                v = np.random.default_rng(abs(hash(text)) % (2 ** 32)).standard_normal(dim_out)
+                data.append({"object": "embedding", "index": i, "embedding": (v / np.linalg.norm(v)).tolist()})
+            self._send(200, {"object": "list", "data": data, "model": payload.get("model"), "usage": {"total_tokens": 8 * len(texts)}})
+
+    return FakeVoyageHandler
+
+
+def start_server(port: int, **behaviour) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(**behaviour))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_load(base_url: str, n_requests: int, concurrency: int, hedge: str) -> dict:
+    provider = VoyageProvider("fake-key", base_url=base_url, base_delay_s=0.05, max_delay_s=0.5, hedge=hedge, name=f"voyage[hedge={hedge}]")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await provider.embed([f"query {i}"], model="voyage-3.5", input_type="query", output_dimension=512)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    await provider.close()
+    stats = provider.stats()
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "hedge": hedge,
+        "ok": len(latencies),
+        "failed": failures,
+        "retries": stats["retries"],
+        "hedges": stats["hedges"],
+        "hedge_wins": stats["hedge_wins"],
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=0, help="0 = any free port")
+    parser.add_argument("--serve", action="store_true", help="Only run the fake server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of 429/503 responses")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of slow responses")
+    parser.add_argument("--base-ms", type=float, default=20.0)
+    parser.add_argument("--slow-ms", type=float, default=300.0)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--hedges", nargs="+", default=["off", "p95"], help="Hedge settings to compare (off | p95 | <ms>)")
+    args = parser.parse_args()
+
+    server = start_server(
+        args.port, error_rate=args.error_rate, slow_rate=args.slow_rate,
+        base_ms=args.base_ms, slow_ms=args.slow_ms, dim=args.dim
+    )
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"🧪 Fake Voyage server at {base_url} "
+          f"(errors {args.error_rate:.0%}, slow {args.slow_rate:.0%} @ {args.slow_ms:.0f}ms, base {args.base_ms:.0f}ms)")
+
+    if args.serve:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    print(f"{'hedge':>8} {'ok':>5} {'failed':>6} {'retries':>7} {'hedges':>6} {'wins':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for hedge in args.hedges:
+        r = asyncio.run(run_load(base_url, args.requests, args.concurrency, hedge))
+        print(f"{r['hedge']:>8} {r['ok']:>5} {r['failed']:>6} {r['retries']:>7} {r['hedges']:>6} {r['hedge_wins']:>5} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+"""
+[Sharded Retriever]
+Scatter-gather retrieval over N local worker processes.
+
+The corpus is split by a stable hash of the document id into N shards, each
+written as its own IndexStore (see build_shards). One worker process per
+shard maps its shard and answers searches for precomputed query vectors; the
+coordinator embeds the query once, sends it to every shard, and merges the
+partial top-k lists by score:
+
+    dense    per-shard top-k  -> global top-k by score
+    hybrid   per-shard dense and lexical top-k -> global lists -> RRF (caller)
+
+Both modalities are exact per shard, so the merged lists equal the
+single-process ones (up to ties). A shard that errors or misses the deadline
+is left out of that answer (the request degrades instead of failing), and a
+dead worker is restarted in the background.
+
+Shard layout (under <index path>/shards):
+    <build>-<N>-<mode>/          one directory per index build, so a hot
+                                 reload never rewrites shards that retiring
+                                 workers still map; removed on release
+        shard-00/ ... shard-<N-1>/   IndexStore: doc ids, metadata columns,
+                                     "dense" vectors, first-stage index arrays,
+                                     bitmap filters, lexical CSR + postings (hybrid only)
+"""
+
+import os
+import zlib
+import time
+import queue
+import atexit
+import shutil
+import logging
+import weakref
+import threading
+import itertools
+import multiprocessing as mp
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+import vector_index
+from index_store import IndexStore
+from filter_index import BitmapFilterIndex
+from lexical_index import LexicalMatrix
+
+logger = logging.getLogger(__name__)
+
+# Metadata returned with every hit, so the coordinator needn't decode layouts
+RESULT_FIELDS = ("type", "mood", "category")
+
+Hit = Tuple[str, float, Dict[str, Any]]  # (doc_id, score, metadata)
+
+# Open coordinators: closed once at interpreter exit (weak, so retired ones can be collected)
+_open_retrievers: "weakref.WeakSet[ShardedRetriever]" = weakref.WeakSet()
+# Shard build directory -> number of open coordinators mapping it
+_dir_users: Dict[str, int] = {}
+_dir_lock = threading.Lock()
+
+
+@atexit.register
+def _close_all() -> None:
+    for retriever in list(_open_retrievers):
+        retriever.close()
+
+
+def shard_of(doc_id: str, n_shards: int) -> int:
+    """Stable shard assignment (crc32; Python's hash() is salted per process)."""
+    return zlib.crc32(doc_id.encode("utf-8")) % n_shards
+
+
+def build_dir(shard_root: str, store: IndexStore, n_shards: int, mode: str) -> str:
+    """Shard directory of one index build (see the module docstring)."""
+    return os.path.join(shard_root, f"{os.path.basename(store.path)}-{n_shards}-{mode}")
+
+
+def prune_shard_dirs(shard_root: str) -> None:
+    """Remove shard builds that no open coordinator maps (left by earlier runs)."""
+    if not os.path.isdir(shard_root):
+        return
+    with _dir_lock:
+        in_use = set(_dir_users)
+        for name in os.listdir(shard_root):
+            path = os.path.join(shard_root, name)
+            if os.path.isdir(path) and path not in in_use:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def shard_paths(shard_dir: str, n_shards: int) -> List[str]:
+    return [os.path.join(shard_dir, f"shard-{i:02d}") for i in range(n_shards)]
+
+
+def shards_current(shard_dir: str, n_shards: int, version: str) -> bool:
+    return all(IndexStore.open(path, expected_version=version) is not None for path in shard_paths(shard_dir, n_shards))
+
+
+def _slice_lexical(lexical: LexicalMatrix, rows: np.ndarray) -> LexicalMatrix:
+    indptr = np.asarray(lexical.indptr)
+    starts, ends = indptr[rows], indptr[rows + 1]
+    new_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    new_indptr[1:] = np.cumsum(ends - starts)
+    take = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]) if len(rows) else np.empty(0, dtype=np.int64)
+    return LexicalMatrix(new_indptr, np.asarray(lexical.indices)[take], np.asarray(lexical.data)[take])
+
+
+def build_shards(
+    store: IndexStore,
+    shard_dir: str,
+    n_shards: int,
+    version: str,
+    vectors_name: str,
+    mode: str = "exact",
+    lexical: bool = False,
+    **index_options,
+) -> List[str]:
+    """
+    Split an index into `n_shards` IndexStores by id hash. With `lexical`,
+    the store's lexical matrix is split too.
+    """
+    assignment = np.array([shard_of(doc_id, n_shards) for doc_id in store.doc_ids], dtype=np.int64)
+    columns = {field: np.asarray(store.column(field)) for field in store.manifest.get("columns", [])}
+    vectors = store.array(vectors_name)
+    lexical_matrix = None
+    if lexical:
+        lexical_matrix = LexicalMatrix.from_arrays(
+            {name: store.array(name) for name in store.manifest.get("arrays", [])}, prefix="lexical"
+        )
+        if lexical_matrix is None:
+            raise ValueError(f"{store.path} has no lexical arrays to shard")
+
+    paths = shard_paths(shard_dir, n_shards)
+    for shard, path in enumerate(paths):
+        rows = np.flatnonzero(assignment == shard)
+        shard_vectors = np.asarray(vectors[rows], dtype=np.float32)
+        shard_columns = {field: column[rows] for field, column in columns.items()}
+
+        arrays = {"dense": shard_vectors}
+        if len(rows):
+            arrays.update(vector_index.build_arrays(mode, shard_vectors, **index_options))
+            arrays.update(BitmapFilterIndex.from_columns(shard_columns).arrays("bitmap"))
+        if lexical_matrix is not None:
+            arrays.update(_slice_lexical(lexical_matrix, rows).arrays("lexical"))
+
+        IndexStore.write(path, version, [store.doc_ids[r] for r in rows], columns=shard_columns, arrays=arrays)
+        print(f"   🧩 Shard {shard}: {len(rows)} documents")
+    return paths
+
+
+# ----------------------------------------------------------------------
+# Worker process
+# ----------------------------------------------------------------------
+class _Shard:
+    """In-process view of one shard (used inside the worker)."""
+
+    def __init__(self, path: str, version: str, mode: str, prefix_dim: int):
+        store = IndexStore.open(path, expected_version=version)
+        if store is None:
+            raise RuntimeError(f"Shard {path} missing or stale")
+        self.doc_ids = store.doc_ids
+        arrays = {name: store.array(name) for name in store.manifest.get("arrays", [])}
+        self.columns = {field: store.column(field) for field in store.manifest.get("columns", [])}
+        self.vectors = arrays.get("dense")
+        self.index = None
+        self.filters = None
+        self.lexical = LexicalMatrix.from_arrays(arrays, prefix="lexical")
+        if len(self.doc_ids):
+            self.index = vector_index.load_index(mode, self.vectors, arrays, prefix_dim=prefix_dim) or vector_index.ExactIndex(self.vectors)
+            self.filters = BitmapFilterIndex.from_arrays(arrays, self.columns.keys(), len(self.doc_ids)) \
+                or BitmapFilterIndex.from_columns(self.columns)
+
+    def _hit(self, row: int, score: float) -> Hit:
+        meta = {field: np.asarray(self.columns[field][row]).item() for field in RESULT_FIELDS if field in self.columns}
+        return (self.doc_ids[row], float(score), meta)
+
+    def search(self, request: Dict[str, Any]) -> Tuple[List[List[Hit]], Optional[List[List[Hit]]]]:
+        filters_list = request["filters_list"]
+        if not self.doc_ids:
+            empty = [[] for _ in filters_list]
+            return empty, (empty if request.get("q_lexical") is not None else None)
+
+        masks = [self.filters.mask(f) if f else None for f in filters_list]
+        dense_hits = vector_index.search(
+            self.index, self.vectors, request["q_dense"], masks, request["k"], request.get("rescore", 0)
+        )
+        dense = [[self._hit(r, s) for r, s in zip(rows, scores)] for rows, scores in dense_hits]
+
+        sparse = None
+        if request.get("q_lexical") is not None and self.lexical is not None:
+            ranked = self.lexical.top_k_batch(request["q_lexical"], request["k"], masks, with_scores=True)
+            sparse = [[self._hit(r, s) for r, s in zip(rows, scores)] for rows, scores in ranked]
+        return dense, sparse
+
+
+def _shard_worker(shard_id: int, path: str, version: str, mode: str, prefix_dim: int, inbox, outbox) -> None:
+    try:
+        shard = _Shard(path, version, mode, prefix_dim)
+    except Exception as e:
+        outbox.put((None, shard_id, "error", repr(e)))
+        return
+    outbox.put((None, shard_id, "ready", len(shard.doc_ids)))
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        req_id, request = message
+        try:
+            outbox.put((req_id, shard_id, "ok", shard.search(request)))
+        except Exception as e:
+            outbox.put((req_id, shard_id, "error", repr(e)))
+
+
+# ----------------------------------------------------------------------
+# Coordinator
+# ----------------------------------------------------------------------
+class ShardedRetriever:
+    def __init__(
+        self,
+        paths: List[str],
+        version: str,
+        shard_dir: Optional[str] = None,
+        mode: str = "exact",
+        prefix_dim: int = 256,
+        timeout_ms: float = 500.0,
+        start_timeout_s: float = 120.0,
+    ):
+        """
+        Args:
+            paths: Shard directories (from build_shards)
+            version: Shard build version the workers must find
+            shard_dir: Directory holding `paths` (removable with close(remove_files=True))
+            mode: First-stage vector index mode (see vector_index.py)
+            timeout_ms: Per-request deadline; slower shards are left out
+            start_timeout_s: How long to wait for workers to map their shards
+        """
+        self.paths = paths
+        self.version = version
+        self.shard_dir = shard_dir
+        self.mode = mode
+        self.prefix_dim = prefix_dim
+        self.timeout_ms = timeout_ms
+
+        self._ctx = mp.get_context("spawn")
+        self._outbox = self._ctx.Queue()
+        self._procs: List[Optional[mp.Process]] = [None] * len(paths)
+        self._inboxes: List[Any] = [None] * len(paths)
+        self._ready = [False] * len(paths)
+        self._req_ids = itertools.count()
+        self._pending: Dict[int, Dict[int, Any]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Searches run concurrently (asyncio.to_thread): worker restarts and counters are guarded
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "degraded": 0, "timeouts": 0, "errors": 0, "restarts": 0}
+        self._latency_ms: List[float] = []
+
+        for i in range(len(paths)):
+            self._start_worker(i)
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+        _open_retrievers.add(self)
+        if shard_dir is not None:
+            with _dir_lock:
+                _dir_users[shard_dir] = _dir_users.get(shard_dir, 0) + 1
+
+        deadline = time.monotonic() + start_timeout_s
+        with self._cond:
+            while not all(self._ready) and time.monotonic() < deadline:
+                self._cond.wait(timeout=0.1)
+        ready = sum(self._ready)
+        if ready < len(paths):
+            logger.warning(f"⚠️ Only {ready}/{len(paths)} shards ready after {start_timeout_s:.0f}s")
+        print(f"🧩 Sharded retrieval: {ready}/{len(paths)} shard workers ready")
+
+    def _start_worker(self, i: int) -> None:
+        self._ready[i] = False
+        self._inboxes[i] = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_shard_worker,
+            args=(i, self.paths[i], self.version, self.mode, self.prefix_dim, self._inboxes[i], self._outbox),
+            name=f"shard-{i:02d}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[i] = proc
+
+    def _collect(self) -> None:
+        """Route worker replies to the waiting requests (late replies are dropped)."""
+        while not self._closed:
+            try:
+                req_id, shard_id, status, payload = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._cond:
+                if req_id is None:
+                    self._ready[shard_id] = status == "ready"
+                    if status != "ready":
+                        logger.error(f"❌ Shard {shard_id} failed to start: {payload}")
+                elif req_id in self._pending:
+                    self._pending[req_id][shard_id] = (status, payload)
+                self._cond.notify_all()
+
+    def _check_workers(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            for i, proc in enumerate(self._procs):
+                if proc is not None and not proc.is_alive():
+                    logger.warning(f"⚠️ Shard worker {i} exited (code {proc.exitcode}). Restarting.")
+                    self._stats["restarts"] += 1
+                    self._start_worker(i)
+
+    def search(
+        self,
+        q_dense: np.ndarray,
+        q_lexical: Optional[List[Dict[str, float]]],
+        filters_list: List[Optional[Dict[str, Any]]],
+        k: int,
+        rescore: int = 0,
+    ) -> Tuple[List[List[Hit]], Optional[List[List[Hit]]]]:
+        """
+        Scatter one batch of queries to every ready shard and merge the
+        per-shard top-k lists. Returns (dense hits, lexical hits or None) per query.
+        Raises RuntimeError when no shard answers (callers fall back to a local scan).
+        """
+        self._check_workers()
+        request = {
+            "q_dense": np.asarray(q_dense, dtype=np.float32),
+            "q_lexical": q_lexical,
+            "filters_list": filters_list,
+            "k": k,
+            "rescore": rescore,
+        }
+
+        start = time.monotonic()
+        req_id = next(self._req_ids)
+        with self._cond:
+            targets = [i for i, ready in enumerate(self._ready) if ready]
+            self._pending[req_id] = {}
+        for i in targets:
+            self._inboxes[i].put((req_id, request))
+
+        deadline = start + self.timeout_ms / 1000.0
+        with self._cond:
+            while len(self._pending[req_id]) < len(targets):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            replies = self._pending.pop(req_id)
+
+        answered = [i for i in targets if i in replies and replies[i][0] == "ok"]
+        errors = [i for i in targets if i in replies and replies[i][0] != "ok"]
+        timeouts = [i for i in targets if i not in replies]
+        for i in errors:
+            logger.warning(f"⚠️ Shard {i} error: {replies[i][1]}")
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["errors"] += len(errors)
+            self._stats["timeouts"] += len(timeouts)
+            if len(answered) < len(self.paths):
+                self._stats["degraded"] += 1
+            self._latency_ms.append((time.monotonic() - start) * 1000)
+            self._latency_ms = self._latency_ms[-1024:]
+        if len(answered) < len(self.paths):
+            logger.warning(f"⚠️ Partial results: {len(answered)}/{len(self.paths)} shards "
+                           f"(timeouts: {timeouts}, errors: {errors})")
+        if not answered:
+            raise RuntimeError("No shard answered within the deadline")
+
+        n_queries = len(filters_list)
+        dense = self._merge([replies[i][1][0] for i in answered], n_queries, k)
+        sparse = None
+        if q_lexical is not None:
+            sparse = self._merge([replies[i][1][1] or [[] for _ in range(n_queries)] for i in answered], n_queries, k)
+        return dense, sparse
+
+    @staticmethod
+    def _merge(partials: List[List[List[Hit]]], n_queries: int, k: int) -> List[List[Hit]]:
+        merged = []
+        for q in range(n_queries):
+            hits = [hit for partial in partials for hit in partial[q]]
+            hits.sort(key=lambda hit: -hit[1])
+            merged.append(hits[:k])
+        return merged
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._stats)
+            latencies = np.asarray(self._latency_ms) if self._latency_ms else np.zeros(1)
+        return {
+            "shards": len(self.paths),
+            "ready": int(sum(self._ready)),
+            **counters,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+            },
+        }
+
+    @classmethod
+    def for_store(
+        cls,
+        store: IndexStore,
+        shard_root: str,
+        n_shards: int,
+        vectors_name: str,
+        mode: str = "exact",
+        lexical: bool = False,
+        timeout_ms: float = 500.0,
+        **index_options,
+    ) -> "ShardedRetriever":
+        """
+        Start workers over `store`, (re)building the shards if they are missing
+        or stale. `shard_root` holds one shard directory per index build.
+        """
+        version = f"{store.version}/{os.path.basename(store.path)}/{n_shards}/{mode}"
+        shard_dir = build_dir(shard_root, store, n_shards, mode)
+        if not shards_current(shard_dir, n_shards, version):
+            print(f"🧩 Building {n_shards} shards in {shard_dir}...")
+            build_shards(store, shard_dir, n_shards, version, vectors_name, mode, lexical, **index_options)
+        retriever = cls(
+            shard_paths(shard_dir, n_shards), version, shard_dir, mode,
+            prefix_dim=index_options.get("prefix_dim", 256), timeout_ms=timeout_ms
+        )
+        prune_shard_dirs(shard_root)
+        return retriever
+
+    def close(self, remove_files: bool = False) -> None:
+        """
+        Stop the workers. With `remove_files` (hot-reload release), the shard
+        directory is deleted too once no other open coordinator maps it.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        _open_retrievers.discard(self)
+        for inbox, proc in zip(self._inboxes, self._procs):
+            if proc is not None and proc.is_alive():
+                try:
+                    inbox.put(None)
+                except (OSError, ValueError):
+                    pass
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout=2)
+                if proc.is_alive():
+                    proc.terminate()
+        if self.shard_dir is None:
+            return
+        with _dir_lock:
+            users = _dir_users.get(self.shard_dir, 1) - 1
+            if users > 0:
+                _dir_users[self.shard_dir] = users
+                return
+            _dir_users.pop(self.shard_dir, None)
+            if remove_files:
+                shutil.rmtree(self.shard_dir, ignore_errors=True)
+                logger.info(f"Removed retired shard build {self.shard_dir}")
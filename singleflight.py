@@ -0,0 +1,69 @@
+"""
+[Single Flight]
+Coalescing of identical concurrent calls.
+
+A double-clicked Generate, or pages that share content, start the same
+analysis / search / render several times at once. SingleFlight keys each
+call by a request fingerprint; while a call with that key is in flight,
+later callers await the same future instead of starting their own, so the
+work (and the API bill) is paid once.
+
+    flight = SingleFlight("analyze")
+    result = await flight.do(fingerprint("analyze", title, body), lambda: analyze(...))
+
+Only concurrent calls are merged; nothing is cached once the call finishes.
+The shared task is shielded, so a caller that disconnects doesn't cancel it
+for the others. Followers get a deep copy of the result, so per-request
+mutation can't leak between requests.
+"""
+
+import copy
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable request parts (other values via str())."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `make_call()` unless an identical call is already in flight; then share its result."""
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)  # Futures are bound to their event loop
+        self._calls += 1
+
+        task = self._inflight.get(slot)
+        if task is not None:
+            self._coalesced += 1
+            logger.info(f"🔗 [{self.name}] Joined in-flight call {key[:12]}")
+            return copy.deepcopy(await asyncio.shield(task))
+
+        self._executions += 1
+        task = asyncio.ensure_future(make_call())
+        self._inflight[slot] = task
+        task.add_done_callback(lambda _: self._inflight.pop(slot, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self._calls,
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._inflight),
+            "coalesced_rate": round(self._coalesced / self._calls, 3) if self._calls else 0.0,
+        }
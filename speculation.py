@@ -0,0 +1,63 @@
+"""
+[Speculation]
+Bookkeeping for speculative retrieval in analyze_pages.
+
+With SPECULATIVE_RETRIEVAL=1 each page's layout search starts right away,
+from a local heuristic guess of the analysis (headline, body, image
+statistics; see local_analyzer.py), while the Gemini vision call is still
+running. When the vision analysis lands:
+
+    hit    mood and category agree with the guess -> the speculative
+           results are kept and the search is off the critical path
+    miss   they disagree -> the precise search runs as usual
+    stale  the index was hot-reloaded in between -> precise search
+
+Time saved on a hit is the part of the speculative search that overlapped
+the vision call (its duration minus any time still spent waiting for it).
+"""
+
+import threading
+from typing import Any, Dict
+
+
+def agrees(guess: Dict[str, Any], analysis: Dict[str, Any]) -> bool:
+    """Whether the speculative query matches what the precise one would search for."""
+    def norm(value) -> str:
+        return str(value or "").strip().lower()
+    return all(norm(guess.get(field)) == norm(analysis.get(field)) for field in ("mood", "category"))
+
+
+class SpeculationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"started": 0, "hits": 0, "misses": 0, "stale": 0, "errors": 0}
+        self._saved_ms = 0.0
+        self._wasted_ms = 0.0
+
+    def started(self) -> None:
+        with self._lock:
+            self._counts["started"] += 1
+
+    def hit(self, search_ms: float, waited_ms: float) -> float:
+        saved_ms = max(0.0, search_ms - waited_ms)
+        with self._lock:
+            self._counts["hits"] += 1
+            self._saved_ms += saved_ms
+        return saved_ms
+
+    def miss(self, search_ms: float, reason: str = "misses") -> None:
+        """A discarded speculation (`reason`: misses | stale | errors)."""
+        with self._lock:
+            self._counts[reason] += 1
+            self._wasted_ms += search_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resolved = self._counts["hits"] + self._counts["misses"] + self._counts["stale"] + self._counts["errors"]
+            return {
+                **self._counts,
+                "hit_rate": round(self._counts["hits"] / resolved, 3) if resolved else 0.0,
+                "saved_ms": round(self._saved_ms, 1),
+                "mean_saved_ms": round(self._saved_ms / self._counts["hits"], 1) if self._counts["hits"] else 0.0,
+                "wasted_search_ms": round(self._wasted_ms, 1),
+            }
@@ -0,0 +1,177 @@
+"""
+[Startup Profiler]
+Cold-start accounting for the app and the MCP server.
+
+    lazy_import(name)   module object that is imported on first attribute access
+    phase(name)         times an initialization step (setup_rag, graph build, ...)
+    phases()            recorded steps, for /metrics
+
+`python main.py --profile-startup` (or `python mcp_server_langgraph.py
+--profile-startup`) runs each target in a fresh interpreter under
+`python -X importtime` and prints a ranked report:
+
+    import    what `import main` / `import mcp_server_langgraph` pays before
+              the first request (top-level packages by cumulative time)
+    init      initialization steps and the imports they trigger on first
+              use (main.init_rag(), get_magazine_graph())
+"""
+
+import os
+import sys
+import json
+import time
+import importlib
+import importlib.util
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+_INIT_MARKER = "--- startup-profiler: init ---"
+_RESULT_MARKER = "STARTUP_PROFILER_PHASES="
+
+_lock = threading.Lock()
+_phases: List[Dict[str, Any]] = []
+
+
+def lazy_import(name: str):
+    """
+    Module `name`, imported when one of its attributes is first used.
+    Trigger the import from one thread (e.g. at startup) before sharing it:
+    importlib's LazyLoader is not thread-safe while the module loads.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def phase(name: str):
+    """Record the wall time of an initialization step."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            _phases.append({"phase": name, "ms": round(elapsed_ms, 1)})
+
+
+def phases() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_phases)
+
+
+# ----------------------------------------------------------------------
+# Profiling
+# ----------------------------------------------------------------------
+TARGETS = {
+    # name: (module to import, initialization statement run after the import)
+    "app": ("main", "main.init_rag()"),
+    "mcp": ("mcp_server_langgraph", "mcp_server_langgraph.get_magazine_graph()"),
+}
+
+
+def parse_importtime(lines: List[str]) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) rows of `-X importtime` output."""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+            rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def top_level(rows: List[Tuple[str, int, int]]) -> List[Tuple[str, int]]:
+    """Cumulative time of the modules imported directly by the target, largest first."""
+    ranked = [(module.strip(), cumulative) for module, _, cumulative in rows if not module.startswith("  ")]
+    return sorted(ranked, key=lambda r: -r[1])
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> List[Tuple[str, int]]:
+    """Self time summed per top-level package, largest first."""
+    totals: Dict[str, int] = {}
+    for module, self_us, _ in rows:
+        package = module.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda r: -r[1])
+
+
+def profile_target(name: str, cwd: str) -> Dict[str, Any]:
+    module, init = TARGETS[name]
+    code = (
+        "import sys, time, json\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "import_ms = (time.perf_counter() - t0) * 1000\n"
+        f"sys.stderr.write({_INIT_MARKER!r} + '\\n'); sys.stderr.flush()\n"
+        "t1 = time.perf_counter(); error = None\n"
+        "try:\n"
+        f"    {init}\n"
+        "except Exception as e:\n"
+        "    error = f'{type(e).__name__}: {e}'\n"
+        "init_ms = (time.perf_counter() - t1) * 1000\n"
+        "import startup_profiler\n"
+        f"print({_RESULT_MARKER!r} + json.dumps({{'import_ms': import_ms, 'init_ms': init_ms, "
+        "'error': error, 'phases': startup_profiler.phases()}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    lines = proc.stderr.splitlines()
+    split = lines.index(_INIT_MARKER) if _INIT_MARKER in lines else len(lines)
+    result = {"target": name, "module": module, "returncode": proc.returncode}
+    for line in proc.stdout.splitlines():
+        if line.startswith(_RESULT_MARKER):
+            result.update(json.loads(line[len(_RESULT_MARKER):]))
+    if "import_ms" not in result:
+        errors = [line for line in lines if not line.startswith("import time:")]
+        result["error"] = "\n".join(errors[-5:]) or f"exit code {proc.returncode}"
+    result["import_rows"] = parse_importtime(lines[:split])
+    result["init_rows"] = parse_importtime(lines[split + 1:])
+    return result
+
+
+def print_report(result: Dict[str, Any], top: int = 15) -> None:
+    print(f"\n🚀 [{result['target']}] import {result['module']}")
+    if "import_ms" in result:
+        print(f"   import: {result['import_ms']:.0f} ms, init: {result['init_ms']:.0f} ms")
+    if result.get("error"):
+        print(f"   ⚠️ {result['error']}")
+
+    print(f"\n   Imports before the first request (top {top}, cumulative ms):")
+    for module, cumulative in top_level(result["import_rows"])[:top]:
+        print(f"   {cumulative / 1000:>9.1f}  {module}")
+
+    if result["init_rows"]:
+        print(f"\n   Imports triggered during init (self ms per package):")
+        for package, self_us in by_package(result["init_rows"])[:top]:
+            print(f"   {self_us / 1000:>9.1f}  {package}")
+
+    if result.get("phases"):
+        print(f"\n   Init phases (ms):")
+        for item in sorted(result["phases"], key=lambda p: -p["ms"]):
+            print(f"   {item['ms']:>9.1f}  {item['phase']}")
+
+
+def main(targets: List[str] = None) -> None:
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    for name in targets or list(TARGETS):
+        print_report(profile_target(name, cwd))
+
+
+if __name__ == "__main__":
+    main([arg for arg in sys.argv[1:] if arg in TARGETS] or None)
@@ -0,0 +1,121 @@
+"""GeminiAnalyzer.analyzer_stats: which tier answered each analyze_page call."""
+
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+rag_voyage = pytest.importorskip("rag_voyage")
+
+from singleflight import SingleFlight
+
+ANSWER = '{"mood": "Minimalist", "category": "Tech", "type": "Balanced", "description": "x", "visual_keywords": []}'
+
+
+class Response:
+    text = ANSWER
+
+
+class StubProvider:
+    def __init__(self, delay_s: float = 0.0, error: Exception = None):
+        self.delay_s = delay_s
+        self.error = error
+        self.calls = 0
+
+    async def generate(self, inputs):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if self.error is not None:
+            raise self.error
+        return Response()
+
+    def generate_sync(self, inputs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return Response()
+
+
+class DictCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        self.entries[key] = value
+
+
+def make_analyzer(mode: str, provider: StubProvider, cache: DictCache = None):
+    analyzer = rag_voyage.GeminiAnalyzer.__new__(rag_voyage.GeminiAnalyzer)
+    analyzer.provider = provider
+    analyzer.analysis_cache = cache
+    analyzer.inflight = SingleFlight("analyze_page")
+    analyzer.mode = mode
+    analyzer.local = rag_voyage.LocalAnalyzer()
+    analyzer._tier_counts = defaultdict(int)
+    analyzer._analysis_key = lambda images, title, body: f"{title}|{body}"
+    analyzer._analysis_inputs = lambda images, title, body: ([title], {"request_bytes": 0})
+    analyzer._record_vision_call = lambda sent, call_ms, response: None
+    return analyzer
+
+
+def tiers(analyzer):
+    stats = analyzer.analyzer_stats()
+    return {k: v for k, v in stats.items() if k.startswith(("gemini", "local_", "fallback"))}
+
+
+@pytest.mark.parametrize("mode", ["gemini", "auto"])
+def test_gemini_answers_and_cache_hits_are_counted(mode):
+    analyzer = make_analyzer(mode, StubProvider(), DictCache())
+
+    async def run():
+        first = await analyzer.aanalyze_page([], "Title", "Body")
+        second = await analyzer.aanalyze_page([], "Title", "Body")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["mood"] == second["mood"] == "Minimalist"
+    assert tiers(analyzer) == {"gemini": 1, "gemini_cached": 1}
+
+
+def test_coalesced_callers_each_count():
+    provider = StubProvider(delay_s=0.02)
+    analyzer = make_analyzer("gemini", provider)
+
+    async def run():
+        return await asyncio.gather(*(analyzer.aanalyze_page([], "Title", "Body") for _ in range(3)))
+
+    asyncio.run(run())
+    assert provider.calls == 1
+    assert tiers(analyzer) == {"gemini": 3}
+
+
+def test_budget_miss_counts_local_not_gemini(monkeypatch):
+    monkeypatch.setattr(rag_voyage.Config, "ANALYZER_BUDGET_MS", 5.0)
+    cache = DictCache()
+    analyzer = make_analyzer("auto", StubProvider(delay_s=0.1), cache)
+
+    async def run():
+        answer = await analyzer.aanalyze_page([], "Title", "Body")
+        await asyncio.sleep(0.2)  # The Gemini call finishes in the background
+        return answer
+
+    asyncio.run(run())
+    assert tiers(analyzer) == {"local_budget": 1}
+    assert cache.entries  # ...and fills the cache for the next request
+
+
+@pytest.mark.parametrize("mode, tier", [("gemini", "fallback"), ("auto", "local_error")])
+def test_errors_count_the_fallback_tier(mode, tier):
+    analyzer = make_analyzer(mode, StubProvider(error=RuntimeError("boom")))
+    asyncio.run(analyzer.aanalyze_page([], "Title", "Body"))
+    assert tiers(analyzer) == {tier: 1}
+
+
+def test_sync_analyze_page_counts_gemini():
+    analyzer = make_analyzer("gemini", StubProvider(), DictCache())
+    analyzer.analyze_page([], "Title", "Body")
+    analyzer.analyze_page([], "Title", "Body")
+    assert tiers(analyzer) == {"gemini": 1, "gemini_cached": 1}
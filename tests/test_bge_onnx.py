@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from bge_onnx import OnnxBGEM3Encoder
+
+CLS, PAD, EOS, UNK = 0, 1, 2, 3  # XLM-R special token ids
+DIM = 4
+
+
+class StubTokenizer:
+    cls_token_id, pad_token_id, eos_token_id, unk_token_id = CLS, PAD, EOS, UNK
+
+    @staticmethod
+    def ids(text):
+        return [CLS] + [UNK if w == "<unk>" else 10 + sum(map(ord, w)) % 40 for w in text.split()] + [EOS]
+
+    def __call__(self, texts, padding, truncation, max_length, return_tensors):
+        rows = [self.ids(t)[:max_length] for t in texts]
+        width = max(len(r) for r in rows)
+        return {
+            "input_ids": np.array([r + [PAD] * (width - len(r)) for r in rows]),
+            "attention_mask": np.array([[1] * len(r) + [0] * (width - len(r)) for r in rows]),
+        }
+
+
+def token_weight(token_id, position):
+    # Zero for some tokens, and different weights for repeats of the same token
+    return ((token_id * 7 + position) % 5) / 4
+
+
+class StubSession:
+    """Output shapes of the graph exported by scripts/export_bge_onnx.py."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, output_names, feeds):
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        self.batches.append(ids.shape)
+        batch, seq = ids.shape
+        dense = np.stack([mask.sum(axis=1), ids[:, 1], np.zeros(batch), np.ones(batch)], axis=1).astype(np.float32)
+        positions = np.arange(seq)[None, :]
+        sparse = (((ids * 7 + positions) % 5) / 4).astype(np.float32)  # (batch, sequence)
+        sparse[mask == 0] = 1.0  # Padding must not leak into the lexical weights
+        colbert = np.zeros((batch, seq - 1, DIM), dtype=np.float32)  # (batch, sequence_minus_cls, dim)
+        colbert[:, :, 0] = ids[:, 1:]
+        colbert[:, :, 1] = positions[:, 1:]
+        colbert *= mask[:, 1:, None]
+        return dense, sparse, colbert
+
+
+def reference_lexical(token_ids):
+    """BGEM3FlagModel._process_token_weights: max weight per token, special tokens and zeros dropped."""
+    result = {}
+    for position, idx in enumerate(token_ids):
+        w = token_weight(idx, position)
+        if idx not in (CLS, EOS, PAD, UNK) and w > 0 and w > result.get(str(idx), 0):
+            result[str(idx)] = w
+    return result
+
+
+@pytest.fixture
+def encoder():
+    encoder = OnnxBGEM3Encoder.__new__(OnnxBGEM3Encoder)  # Skip onnxruntime / transformers loading
+    encoder.session = StubSession()
+    encoder.tokenizer = StubTokenizer()
+    encoder.unused_tokens = {CLS, EOS, PAD, UNK}
+    return encoder
+
+
+SENTENCES = [
+    "short",
+    "a much longer sentence with several words and a repeated word word word",
+    "mid length <unk> text",
+    "",
+    "another fairly long sentence to force padding in the batch",
+]
+
+
+def test_output_dict_shape(encoder):
+    out = encoder.encode(SENTENCES, batch_size=2, return_dense=True, return_sparse=True, return_colbert_vecs=True)
+    assert set(out) == {"dense_vecs", "lexical_weights", "colbert_vecs"}
+    assert out["dense_vecs"].shape == (len(SENTENCES), DIM)
+    assert len(out["lexical_weights"]) == len(out["colbert_vecs"]) == len(SENTENCES)
+    assert all(isinstance(w, dict) for w in out["lexical_weights"])
+
+    dense_only = encoder.encode(SENTENCES[0])
+    assert dense_only["dense_vecs"].shape == (1, DIM)
+    assert dense_only["lexical_weights"] is None and dense_only["colbert_vecs"] is None
+
+
+def test_outputs_follow_input_order(encoder):
+    out = encoder.encode(SENTENCES, batch_size=2, return_dense=True, return_sparse=True)
+    for sentence, dense in zip(SENTENCES, out["dense_vecs"]):
+        ids = StubTokenizer.ids(sentence)
+        assert dense[0] == len(ids) and dense[1] == ids[1]
+    # Length-sorted batches: the longest sentences share the first batch
+    assert encoder.session.batches[0][1] == max(len(StubTokenizer.ids(s)) for s in SENTENCES)
+
+
+def test_lexical_weights_drop_unused_tokens(encoder):
+    out = encoder.encode(SENTENCES, batch_size=3, return_dense=False, return_sparse=True)
+    for sentence, weights in zip(SENTENCES, out["lexical_weights"]):
+        assert weights == reference_lexical(StubTokenizer.ids(sentence))
+        assert not {str(t) for t in (CLS, EOS, PAD, UNK)} & set(weights)
+        assert all(w > 0 for w in weights.values())
+    assert encoder.encode([""], return_dense=False, return_sparse=True)["lexical_weights"] == [{}]
+
+
+def test_colbert_vecs_exclude_cls_and_padding(encoder):
+    out = encoder.encode(SENTENCES, batch_size=2, return_dense=False, return_colbert_vecs=True)
+    for sentence, vecs in zip(SENTENCES, out["colbert_vecs"]):
+        ids = StubTokenizer.ids(sentence)
+        # BGEM3FlagModel._process_colbert_vecs: one vector per token after CLS, up to and including EOS
+        assert vecs.shape == (len(ids) - 1, DIM)
+        assert vecs[:, 0].tolist() == ids[1:]
+        assert vecs[:, 1].tolist() == list(range(1, len(ids)))
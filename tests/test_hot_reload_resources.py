@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import sharded_retriever
+from index_store import IndexStore
+from query_batcher import MicroBatchEncoder
+from sharded_retriever import ShardedRetriever
+
+
+def write_store(path, n_docs=20, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n_docs, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    doc_ids = [f"doc-{seed}-{i}" for i in range(n_docs)]
+    columns = {"type": np.asarray(["Cover", "Article"] * (n_docs // 2))}
+    IndexStore.write(path, "v1", doc_ids, columns=columns, arrays={"embeddings": vectors})
+    return IndexStore.open(path, expected_version="v1"), vectors
+
+
+def test_encoder_close_stops_worker_and_fails_waiters():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_encode(texts):
+            await release.wait()
+            return texts
+
+        encoder = MicroBatchEncoder(slow_encode, max_wait_ms=0)
+        pending = asyncio.ensure_future(encoder.encode("b"))
+        await asyncio.sleep(0.01)  # "b" is in flight
+        worker = encoder._worker
+        encoder.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            await asyncio.wait_for(pending, 1)
+        await asyncio.sleep(0)
+        assert worker.cancelled()
+        with pytest.raises(RuntimeError, match="closed"):
+            await encoder.encode("c")
+
+    asyncio.run(scenario())
+
+
+def test_reload_keeps_old_shards_until_release(tmp_path):
+    shard_root = str(tmp_path / "shards")
+    store_a, vectors = write_store(str(tmp_path / "index"), seed=0)
+    old = ShardedRetriever.for_store(store_a, shard_root, 2, vectors_name="embeddings", timeout_ms=5000)
+
+    # Same build (reload without rebuild): the shard directory is shared
+    same = ShardedRetriever.for_store(store_a, shard_root, 2, vectors_name="embeddings", timeout_ms=5000)
+    assert same.shard_dir == old.shard_dir
+
+    # A rebuild gets its own directory; the retiring workers keep answering from theirs
+    store_b, _ = write_store(str(tmp_path / "index"), seed=1)
+    new = ShardedRetriever.for_store(store_b, shard_root, 2, vectors_name="embeddings", timeout_ms=5000)
+    assert new.shard_dir != old.shard_dir and os.path.isdir(old.shard_dir)
+    dense, _ = old.search(vectors[:1], None, [None], 3)
+    assert dense[0][0][0] == "doc-0-0"
+
+    same.close(remove_files=True)  # Still mapped by `old`
+    assert os.path.isdir(old.shard_dir)
+    old.close(remove_files=True)  # Last user: removed on release
+    assert not os.path.exists(old.shard_dir)
+    assert os.path.isdir(new.shard_dir)
+
+    new.close()  # Shutdown: kept for the next start
+    assert os.path.isdir(new.shard_dir)
+    assert not any(r in sharded_retriever._open_retrievers for r in (old, same, new))
+
+
+def test_concurrent_searches_restart_a_dead_worker_once(tmp_path):
+    store, vectors = write_store(str(tmp_path / "index"))
+    shards = ShardedRetriever.for_store(store, str(tmp_path / "shards"), 2, vectors_name="embeddings", timeout_ms=5000)
+    try:
+        dead = shards._procs[0]
+        dead.terminate()
+        dead.join(5)
+
+        barrier = threading.Barrier(8)
+
+        def check():
+            barrier.wait()
+            shards._check_workers()
+
+        threads = [threading.Thread(target=check) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert shards.stats()["restarts"] == 1
+        assert shards._procs[0] is not dead
+    finally:
+        shards.close(remove_files=True)
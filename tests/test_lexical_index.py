@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from lexical_index import LexicalMatrix
+
+
+def compute_lexical_matching_score(lexical_weights_1, lexical_weights_2):
+    """BGEM3FlagModel.compute_lexical_matching_score."""
+    score = 0
+    for token, weight in lexical_weights_1.items():
+        if token in lexical_weights_2:
+            score += weight * lexical_weights_2[token]
+    return score
+
+
+def brute_force_top_k(docs, query, k, mask=None):
+    """The pre-index scan: score every candidate, stable sort by score (ties keep index order)."""
+    scored = [
+        (row, compute_lexical_matching_score(doc, query))
+        for row, doc in enumerate(docs)
+        if mask is None or mask[row]
+    ]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [row for row, _ in scored[:k]]
+
+
+def random_weights(rng, vocab, max_tokens):
+    # Multiples of 1/8: sums are exact in float32/float64, and equal scores are common
+    n = int(rng.integers(0, max_tokens + 1))
+    tokens = rng.choice(vocab, size=n, replace=False)
+    return {str(t): float(rng.integers(1, 9)) / 8 for t in tokens}
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    docs = [random_weights(rng, 60, 12) for _ in range(300)]
+    queries = [random_weights(rng, 80, 6) for _ in range(40)]  # Some tokens appear in no document
+    return rng, docs, queries
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 400])
+def test_top_k_matches_brute_force(corpus, k):
+    _, docs, queries = corpus
+    matrix = LexicalMatrix.from_weights(docs)
+    for query in queries:
+        assert matrix.top_k(query, k) == brute_force_top_k(docs, query, k)
+
+
+def test_top_k_with_mask_matches_brute_force(corpus):
+    rng, docs, queries = corpus
+    matrix = LexicalMatrix.from_weights(docs)
+    for query in queries:
+        mask = rng.random(len(docs)) < 0.3
+        assert matrix.top_k(query, 10, mask) == brute_force_top_k(docs, query, 10, mask)
+    assert matrix.top_k(queries[0], 10, np.zeros(len(docs), dtype=bool)) == []
+
+
+def test_tied_scores_keep_index_order():
+    docs = [{"1": 0.5}, {"2": 0.5}, {"1": 0.5, "3": 0.25}, {"1": 0.5}, {}]
+    matrix = LexicalMatrix.from_weights(docs)
+    query = {"1": 1.0}
+    assert matrix.top_k(query, 5) == brute_force_top_k(docs, query, 5) == [0, 2, 3, 1, 4]
+
+
+def test_empty_query_returns_candidates_in_index_order(corpus):
+    _, docs, _ = corpus
+    matrix = LexicalMatrix.from_weights(docs)
+    assert matrix.top_k({}, 7) == brute_force_top_k(docs, {}, 7) == list(range(7))
+    assert matrix.scores({}).tolist() == [0.0] * len(docs)
+
+
+def test_batch_and_memory_mapped_arrays_match(corpus, tmp_path):
+    rng, docs, queries = corpus
+    matrix = LexicalMatrix.from_weights(docs)
+    for name, array in matrix.arrays().items():
+        np.save(tmp_path / f"{name}.npy", array)
+    loaded = LexicalMatrix.from_arrays(
+        {name: np.load(tmp_path / f"{name}.npy", mmap_mode="r") for name in matrix.arrays()}
+    )
+    masks = [rng.random(len(docs)) < 0.5 if i % 2 else None for i in range(len(queries))]
+    expected = [brute_force_top_k(docs, q, 8, m) for q, m in zip(queries, masks)]
+    assert loaded.top_k_batch(queries, 8, masks) == expected
+    assert [loaded.row_weights(i) for i in range(len(docs))] == docs
+
+
+def test_loading_persisted_postings_copies_nothing(corpus, tmp_path):
+    _, docs, queries = corpus
+    matrix = LexicalMatrix.from_weights(docs)
+    for name, array in matrix.arrays().items():
+        np.save(tmp_path / f"{name}.npy", array)
+    loaded = LexicalMatrix.from_arrays(
+        {name: np.load(tmp_path / f"{name}.npy", mmap_mode="r") for name in matrix.arrays()}
+    )
+    for name in ("tokens", "token_indptr", "post_rows", "post_data"):
+        assert isinstance(getattr(loaded, name), np.memmap)
+    assert LexicalMatrix.from_arrays({k: v for k, v in matrix.arrays().items() if k != "lexical_post_rows"}) is None
+    assert loaded.top_k_batch(queries, 5) == matrix.top_k_batch(queries, 5)
+
+
+def test_zero_fill_and_signed_scores_match_brute_force(corpus):
+    rng, _, _ = corpus
+    # Few matches per query (the zero-score tail fills the top-k), and weights of both signs
+    docs = [{str(t): float(rng.integers(-4, 5)) / 8 for t in rng.choice(400, size=3, replace=False)} for _ in range(500)]
+    queries = [{str(t): float(rng.integers(-4, 5)) / 8 for t in rng.choice(400, size=4, replace=False)} for _ in range(30)]
+    matrix = LexicalMatrix.from_weights(docs)
+    for i, query in enumerate(queries):
+        mask = rng.random(len(docs)) < 0.4 if i % 2 else None
+        for k in (3, 20, 600):
+            assert matrix.top_k(query, k, mask) == brute_force_top_k(docs, query, k, mask)
+        rows, scores = matrix.top_k_batch([query], 20, [mask], with_scores=True)[0]
+        assert scores == [compute_lexical_matching_score(docs[r], query) for r in rows]
@@ -0,0 +1,123 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from providers import VoyageProvider, ProviderHTTPError, is_retryable  # noqa: E402
+
+
+class ScriptedVoyageServer:
+    """Fake Voyage embeddings endpoint answering from a script of (status, delay_s), one per request."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with server._lock:
+                    status, delay_s = server.script.pop(0) if server.script else (200, 0.0)
+                    server.requests += 1
+                    n = server.requests
+                time.sleep(delay_s)
+                if status == 200:
+                    body = {"data": [{"index": i, "embedding": [float(n), float(i)]} for i in range(len(payload["input"]))]}
+                else:
+                    body = {"detail": f"scripted {status}"}
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The losing copy of a hedged request was cancelled
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(script):
+        servers.append(ScriptedVoyageServer(script))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def embed(provider, texts):
+    async def run():
+        try:
+            return await provider.embed(texts, model="voyage-3.5")
+        finally:
+            await provider.close()
+    return asyncio.run(run())
+
+
+def test_retries_429_and_503(serve):
+    server = serve([(429, 0.0), (503, 0.0)])
+    provider = VoyageProvider("key", base_url=server.base_url, max_attempts=3, base_delay_s=0.01)
+    assert embed(provider, ["a", "b"]) == [[3.0, 0.0], [3.0, 1.0]]
+    stats = provider.stats()
+    assert (server.requests, stats["attempts"], stats["retries"], stats["failures"]) == (3, 3, 2, 0)
+
+
+def test_gives_up_after_max_attempts(serve):
+    server = serve([(503, 0.0)] * 5)
+    provider = VoyageProvider("key", base_url=server.base_url, max_attempts=2, base_delay_s=0.01)
+    with pytest.raises(ProviderHTTPError) as excinfo:
+        embed(provider, ["a"])
+    assert excinfo.value.status == 503
+    assert server.requests == 2 and provider.stats()["failures"] == 1
+
+
+@pytest.mark.parametrize("status", [400, 401, 409])
+def test_client_errors_are_not_retried(serve, status):
+    server = serve([(status, 0.0), (200, 0.0)])
+    provider = VoyageProvider("key", base_url=server.base_url, max_attempts=3, base_delay_s=0.01)
+    with pytest.raises(ProviderHTTPError) as excinfo:
+        embed(provider, ["a"])
+    assert excinfo.value.status == status
+    assert server.requests == 1 and provider.stats()["retries"] == 0
+    assert not is_retryable(excinfo.value)
+
+
+def test_hedge_wins_over_slow_primary(serve):
+    server = serve([(200, 1.5), (200, 0.0)])  # The primary stalls; the hedged copy answers at once
+    provider = VoyageProvider("key", base_url=server.base_url, hedge="50", base_delay_s=0.01)
+    start = time.perf_counter()
+    assert embed(provider, ["a"]) == [[2.0, 0.0]]
+    assert time.perf_counter() - start < 1.0
+    stats = provider.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["attempts"]) == (1, 1, 2)
+
+
+def test_fast_primary_is_not_hedged(serve):
+    server = serve([(200, 0.0)])
+    provider = VoyageProvider("key", base_url=server.base_url, hedge="500", base_delay_s=0.01)
+    assert embed(provider, ["a"]) == [[1.0, 0.0]]
+    assert provider.stats()["hedges"] == 0 and server.requests == 1
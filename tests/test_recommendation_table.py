@@ -0,0 +1,120 @@
+import hashlib
+import itertools
+import random
+
+import pytest
+
+from recommendation_table import (
+    RecommendationTable, cascade_search, filter_attempts, normalize_attribute, rag_query, table_key
+)
+
+TYPES = ["Cover", "Article"]
+MOODS = ["Minimalist", "elegant", "Vibrant "]
+CATEGORIES = ["fashion", "Lifestyle", "food"]
+
+
+class StubRetriever:
+    """search_many over a small corpus. Rankings depend on the exact query text, like an embedding search."""
+
+    def __init__(self, n_docs=40, seed=3):
+        rng = random.Random(seed)
+        self.docs = [
+            {"image_id": f"doc-{i}", "type": rng.choice(TYPES), "image_count": rng.randint(0, 3)}
+            for i in range(n_docs)
+        ]
+        self.queries = []
+
+    def search_many(self, queries, filters_list, top_k=5):
+        self.queries.extend(queries)
+        results = []
+        for query, filters in zip(queries, filters_list):
+            candidates = [d for d in self.docs if all(d.get(k) == v for k, v in (filters or {}).items())]
+            scored = [
+                (int(hashlib.sha256(f"{query}|{d['image_id']}".encode()).hexdigest()[:8], 16) / 16 ** 8, d)
+                for d in candidates
+            ]
+            scored.sort(key=lambda x: -x[0])
+            results.append([
+                {"image_id": d["image_id"], "similarity_score": round(score, 4), "type": d["type"]}
+                for score, d in scored[:top_k]
+            ])
+        return results
+
+
+def live_search(retriever, layout_type, image_count, mood, category, top_k=5):
+    """What analyze_pages runs for an analysis the table doesn't answer."""
+    return cascade_search(retriever, [rag_query(mood, category)], [filter_attempts(layout_type, image_count)], top_k)[0]
+
+
+def canonical(value):
+    """Vocabulary form the table is built from (scripts/build_recommendation_table.py)."""
+    return value.strip().title()
+
+
+@pytest.fixture
+def table_and_retriever():
+    retriever = StubRetriever()
+    table = RecommendationTable.build(
+        retriever, version="build-1", types=TYPES, image_counts=[0, 1, 2, 3, 4],
+        moods=[canonical(m) for m in MOODS],
+        categories=[canonical(c) for c in CATEGORIES],
+        top_k=5,
+    )
+    return table, retriever
+
+
+def test_lookup_equals_live_search(table_and_retriever):
+    table, retriever = table_and_retriever
+    combos = list(itertools.product(TYPES, [0, 1, 2, 3, 4], MOODS, CATEGORIES))
+    for layout_type, image_count, mood, category in random.Random(0).sample(combos, 20):
+        m, c = canonical(mood), canonical(category)
+        looked_up = table.lookup(layout_type, image_count, m, c)
+        assert looked_up is not None
+        assert looked_up == live_search(retriever, layout_type, image_count, m, c)
+        # Other casings / spacing share the entry
+        assert table.lookup(layout_type, image_count, mood.upper(), f" {category.lower()} ") == looked_up
+
+
+def test_only_keys_are_normalized(table_and_retriever):
+    table, retriever = table_and_retriever
+    assert table_key("Cover", 2, "Vibrant ", "Lifestyle") == "Cover|2|vibrant|lifestyle"
+    assert normalize_attribute(" FASHION ") == "fashion"
+    # Live queries keep the analysis' text
+    assert rag_query("Minimalist", "FASHION", "clean grid") == "Minimalist FASHION clean grid"
+    assert set(table.entries) == {
+        table_key(t, n, m, c) for t in TYPES for n in range(5) for m in MOODS for c in CATEGORIES
+    }
+
+
+def test_misses(table_and_retriever):
+    table, _ = table_and_retriever
+    assert table.lookup("Cover", 9, "minimalist", "fashion") is None
+    assert table.lookup("Cover", 1, "unknown", "fashion") is None
+    assert table.lookup("Cover", 1, "minimalist", "fashion", top_k=10) is None
+    assert table.stats()["misses"] == 3
+
+
+def test_saved_table_matches_live_search(table_and_retriever, tmp_path):
+    table, retriever = table_and_retriever
+    path = str(tmp_path / "recommendations.json")
+    table.save(path)
+    assert RecommendationTable.load(path, expected_version="build-2") is None
+    loaded = RecommendationTable.load(path, expected_version="build-1")
+    assert loaded.lookup("Article", 3, "elegant", "food", top_k=3) == live_search(retriever, "Article", 3, "Elegant", "Food", top_k=3)
+
+
+def test_retriever_searches_live_for_described_analyses(table_and_retriever, monkeypatch):
+    rag_voyage = pytest.importorskip("rag_voyage")
+    table, retriever = table_and_retriever
+    voyage = rag_voyage.VoyageRetriever.__new__(rag_voyage.VoyageRetriever)
+    voyage.recommendations = table
+    described = "A bright editorial spread with one hero image"
+
+    assert rag_voyage.Config.RECOMMENDATION_IGNORE_DESCRIPTION is False
+    assert voyage.recommend("Cover", 1, "Minimalist", "Fashion", described) is None
+    assert voyage.recommend("Cover", 1, "Minimalist", "Fashion", "Standard layout") == \
+        live_search(retriever, "Cover", 1, "Minimalist", "Fashion")
+
+    monkeypatch.setattr(rag_voyage.Config, "RECOMMENDATION_IGNORE_DESCRIPTION", True)
+    assert voyage.recommend("Cover", 1, "Minimalist", "Fashion", described) == \
+        live_search(retriever, "Cover", 1, "Minimalist", "Fashion")
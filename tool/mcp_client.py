@@ -31,7 +31,8 @@ class AURAClient:
                               layout_override: str,
                               vision_json: str,
                               design_json: str,
-                              plan_json: str) -> str:
+                              plan_json: str,
+                              image_attributes_json: str = "[]") -> str:
         
         if not MCP_AVAILABLE:
             return self._mock_generation(headline, layout_override)
@@ -59,7 +60,8 @@ class AURAClient:
                                     "layout_override": layout_override,
                                     "vision_context": vision_json,
                                     "design_spec": design_json,
-                                    "planner_intent": plan_json
+                                    "planner_intent": plan_json,
+                                    **({"image_attributes": image_attributes_json} if image_attributes_json != "[]" else {})
                                 }
                             ),
                             timeout=300.0 # 300초 타임아웃 (LLM Judge + retry loop 대응)
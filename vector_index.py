@@ -0,0 +1,234 @@
+"""
+[Vector Index]
+In-memory first-stage scorers for dense layout embeddings.
+
+The full-precision embeddings stay memory-mapped on disk (see index_store.py).
+A compact first-stage index is kept resident and scanned for every query; the
+best candidates are then rescored at full precision, touching only their rows.
+
+    exact       float32 scan, no rescoring                         (1x memory)
+    int8        per-dimension symmetric int8 codes + rescoring     (~4x smaller)
+    binary      sign bits (packed) + Hamming scan + rescoring      (~32x smaller)
+    matryoshka  truncated, renormalized prefix (e.g. 128/256 of
+                1024/2048 dims) + full-dimension rescoring         (dim/prefix smaller)
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# Rows scanned per block, bounds the float32 temporaries of the int8 scan
+SCAN_BLOCK_ROWS = 65536
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(x: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[x]
+
+
+class ExactIndex:
+    """Brute-force inner product over the full-precision vectors."""
+    mode = "exact"
+    needs_rescore = False
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        return {}
+
+    def approximate_scores(self, q_matrix: np.ndarray) -> np.ndarray:
+        return q_matrix @ np.asarray(self.vectors).T
+
+    def nbytes(self) -> int:
+        return int(np.asarray(self.vectors).nbytes)
+
+
+class Int8Index:
+    """
+    Symmetric per-dimension int8 quantization: x ~= codes * scale.
+    The query is folded into the scale, so scoring is (q * scale) @ codes.T.
+    """
+    mode = "int8"
+    needs_rescore = True
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray):
+        self.codes = codes
+        self.scale = scale.astype(np.float32)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scale = np.abs(vectors).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return {"codes": codes, "scale": scale.astype(np.float32)}
+
+    def approximate_scores(self, q_matrix: np.ndarray) -> np.ndarray:
+        q_scaled = (q_matrix * self.scale).astype(np.float32)
+        n = self.codes.shape[0]
+        out = np.empty((q_matrix.shape[0], n), dtype=np.float32)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            out[:, start:start + block.shape[0]] = q_scaled @ block.T
+        return out
+
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scale.nbytes)
+
+
+class BinaryIndex:
+    """
+    1-bit sign quantization packed 8 dims per byte.
+    Score is the number of agreeing signs (dim - Hamming distance).
+    """
+    mode = "binary"
+    needs_rescore = True
+
+    def __init__(self, bits: np.ndarray, dim: int):
+        self.bits = bits
+        self.dim = dim
+
+    @classmethod
+    def build(cls, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        return {"bits": np.packbits(np.asarray(vectors) > 0, axis=1)}
+
+    def approximate_scores(self, q_matrix: np.ndarray) -> np.ndarray:
+        q_bits = np.packbits(q_matrix > 0, axis=1)
+        n = self.bits.shape[0]
+        out = np.empty((q_matrix.shape[0], n), dtype=np.float32)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            block = np.asarray(self.bits[start:start + SCAN_BLOCK_ROWS])
+            for i, qb in enumerate(q_bits):
+                hamming = _popcount(np.bitwise_xor(block, qb)).sum(axis=1, dtype=np.int32)
+                out[i, start:start + block.shape[0]] = self.dim - hamming
+        return out
+
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes)
+
+
+class PrefixIndex:
+    """
+    Matryoshka coarse stage: Voyage embeddings keep most of their signal in
+    the leading dimensions, so the first `prefix_dim` dims (renormalized)
+    shortlist candidates cheaply and the full vectors rerank them.
+    """
+    mode = "matryoshka"
+    needs_rescore = True
+
+    def __init__(self, prefix: np.ndarray):
+        self.prefix = prefix
+        self.prefix_dim = prefix.shape[1]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, prefix_dim: int = 256) -> Dict[str, np.ndarray]:
+        prefix = np.asarray(vectors[:, :prefix_dim], dtype=np.float32)
+        norms = np.linalg.norm(prefix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return {"prefix": prefix / norms}
+
+    def approximate_scores(self, q_matrix: np.ndarray) -> np.ndarray:
+        q_prefix = q_matrix[:, :self.prefix_dim]
+        norms = np.linalg.norm(q_prefix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (q_prefix / norms) @ self.prefix.T
+
+    def nbytes(self) -> int:
+        return int(self.prefix.nbytes)
+
+
+INDEX_TYPES = {cls.mode: cls for cls in (ExactIndex, Int8Index, BinaryIndex, PrefixIndex)}
+
+
+def build_arrays(mode: str, vectors: np.ndarray, **options) -> Dict[str, np.ndarray]:
+    """Arrays to persist for `mode`, keyed '<mode>_<name>' for IndexStore."""
+    if mode not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index mode: {mode}")
+    return {f"{mode}_{name}": arr for name, arr in INDEX_TYPES[mode].build(vectors, **options).items()}
+
+
+def load_index(mode: str, vectors: np.ndarray, arrays: Dict[str, Optional[np.ndarray]], prefix_dim: int = 256):
+    """
+    Create the first-stage index for `mode` from persisted arrays.
+    Quantized codes are copied into RAM; `vectors` stays memory-mapped and is
+    only read for rescoring. Returns None if the arrays are missing.
+    """
+    if mode == "exact":
+        return ExactIndex(vectors)
+    if mode == "int8":
+        codes, scale = arrays.get("int8_codes"), arrays.get("int8_scale")
+        if codes is None or scale is None:
+            return None
+        return Int8Index(np.array(codes), np.array(scale))
+    if mode == "binary":
+        bits = arrays.get("binary_bits")
+        if bits is None:
+            return None
+        return BinaryIndex(np.array(bits), dim=vectors.shape[1])
+    if mode == "matryoshka":
+        prefix = arrays.get("matryoshka_prefix")
+        if prefix is None or prefix.shape[1] != min(prefix_dim, vectors.shape[1]):
+            # Stage size changed since indexing: derive it from the full vectors
+            prefix = PrefixIndex.build(vectors, prefix_dim)["prefix"]
+        return PrefixIndex(np.array(prefix))
+    raise ValueError(f"Unknown vector index mode: {mode}")
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest finite scores, best first."""
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def search(
+    index,
+    vectors: np.ndarray,
+    q_matrix: np.ndarray,
+    masks: List[Optional[np.ndarray]],
+    top_k: int,
+    rescore_candidates: int = 0,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Two-stage search: first-stage scan over `index`, then full-precision
+    rescoring of the best `rescore_candidates` rows per query (when the index
+    is approximate). Returns (rows, scores) per query, best first.
+    """
+    approx = index.approximate_scores(q_matrix)
+
+    results = []
+    for i, mask in enumerate(masks):
+        row = approx[i] if mask is None else np.where(mask, approx[i], -np.inf)
+        if not index.needs_rescore:
+            top = _top_rows(row, top_k)
+            results.append((top, row[top]))
+            continue
+
+        shortlist = _top_rows(row, max(top_k, rescore_candidates))
+        if len(shortlist) == 0:
+            results.append((shortlist, np.empty(0, dtype=np.float32)))
+            continue
+        # Sorted row order keeps the mmap reads sequential
+        shortlist = np.sort(shortlist)
+        exact = np.asarray(vectors[shortlist], dtype=np.float32) @ q_matrix[i]
+        order = np.argsort(-exact, kind="stable")[:top_k]
+        results.append((shortlist[order], exact[order]))
+    return results
+
+
+def recall_at_k(approx_rows: List[np.ndarray], exact_rows: List[np.ndarray]) -> float:
+    """Mean fraction of the exact top-k recovered by the approximate top-k."""
+    if not exact_rows:
+        return 1.0
+    hits = [
+        len(set(a.tolist()) & set(e.tolist())) / max(len(e), 1)
+        for a, e in zip(approx_rows, exact_rows)
+    ]
+    return float(np.mean(hits))